@@ -0,0 +1,223 @@
+from __future__ import annotations
+import asyncio
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .events import Change, on_resync, subscribe
+from .models import Match, MatchStatus, Season, Stage, StageType
+
+THIRD_PLACE = re.compile(r"third|3rd", re.I)
+# updates touching only these are patched into the cached bracket; "version" is bumped by every update
+RESULT_FIELDS = frozenset({"status", "scoreHome", "scoreAway", "pensHome", "pensAway", "kickoff", "round", "version"})
+# builds retried when changes keep landing while one reads; the last is served uncached
+BUILD_ATTEMPTS = 3
+
+
+@dataclass
+class Node:
+    match_id: int
+    stage_id: int
+    round: str | None
+    kickoff: datetime
+    status: MatchStatus
+    scoreHome: int | None
+    scoreAway: int | None
+    pensHome: int | None
+    pensAway: int | None
+    match_home_id: int
+    match_away_id: int
+    feeders: list[int | None] = field(default_factory=lambda: [None, None])
+    parent: int | None = None
+    home_team_id: int | None = None
+    away_team_id: int | None = None
+    winner_team_id: int | None = None
+
+    def load(self, m: Match):
+        self.round, self.kickoff, self.status = m.round, m.kickoff, m.status
+        self.scoreHome, self.scoreAway = m.scoreHome, m.scoreAway
+        self.pensHome, self.pensAway = m.pensHome, m.pensAway
+        self.match_home_id, self.match_away_id = m.home_team_id, m.away_team_id
+
+
+@dataclass
+class Bracket:
+    season_id: int
+    rounds: list[dict]
+    third_place: int | None
+    nodes: dict[int, Node]
+    stage_ids: set[int]
+
+    def resolve(self, node: Node):
+        """Recompute a node's teams and winner, then walk the change up to the final."""
+        while node is not None:
+            before = (node.home_team_id, node.away_team_id, node.winner_team_id)
+            home, away = (self._feeder_winner(f) for f in node.feeders)
+            node.home_team_id = home or node.match_home_id
+            node.away_team_id = away or node.match_away_id
+            node.winner_team_id = _winner(node)
+            if (node.home_team_id, node.away_team_id, node.winner_team_id) == before:
+                return
+            node = self.nodes.get(node.parent) if node.parent else None
+
+    def _feeder_winner(self, match_id: int | None) -> int | None:
+        return self.nodes[match_id].winner_team_id if match_id in self.nodes else None
+
+
+def _winner(n: Node) -> int | None:
+    if n.status != MatchStatus.FT or n.scoreHome is None or n.scoreAway is None:
+        return None
+    if n.scoreHome != n.scoreAway:
+        return n.home_team_id if n.scoreHome > n.scoreAway else n.away_team_id
+    if n.pensHome is not None and n.pensAway is not None and n.pensHome != n.pensAway:
+        return n.home_team_id if n.pensHome > n.pensAway else n.away_team_id
+    return None
+
+
+def _link(prev: list[Node], nxt: list[Node]):
+    """Attach each match in `nxt` to the two matches in `prev` that feed it.
+
+    Feeders are found by team where the later match already names a team that
+    played in the earlier round; the rest fall back to bracket position
+    (slot j is fed by slots 2j and 2j+1).
+    """
+    free = {n.match_id for n in prev}
+    for node in nxt:
+        for side, team in enumerate((node.match_home_id, node.match_away_id)):
+            f = next((p for p in prev if p.match_id in free and team in (p.match_home_id, p.match_away_id)), None)
+            if f is not None:
+                node.feeders[side] = f.match_id
+                free.discard(f.match_id)
+    for j, node in enumerate(nxt):
+        for side in (0, 1):
+            slot = 2 * j + side
+            if node.feeders[side] is None and slot < len(prev) and prev[slot].match_id in free:
+                node.feeders[side] = prev[slot].match_id
+                free.discard(prev[slot].match_id)
+    by_id = {p.match_id: p for p in prev}
+    for node in nxt:
+        for f in node.feeders:
+            if f is not None:
+                by_id[f].parent = node.match_id
+
+
+async def build(db: AsyncSession, season_id: int) -> Bracket:
+    stages = (await db.execute(
+        select(Stage).where(Stage.season_id == season_id, Stage.type == StageType.KO)
+        .order_by(Stage.sortOrder, Stage.id)
+    )).scalars().all()
+    matches = (await db.execute(
+        select(Match).where(Match.stage_id.in_([s.id for s in stages]))
+        .order_by(Match.kickoff, Match.id)
+    )).scalars().all() if stages else []
+
+    nodes: dict[int, Node] = {}
+    per_stage: dict[int, list[Node]] = {s.id: [] for s in stages}
+    third_place = None
+    for m in matches:
+        node = Node(m.id, m.stage_id, m.round, m.kickoff, m.status, m.scoreHome, m.scoreAway,
+                    m.pensHome, m.pensAway, m.home_team_id, m.away_team_id)
+        nodes[m.id] = node
+        stage = next(s for s in stages if s.id == m.stage_id)
+        if THIRD_PLACE.search(m.round or "") or THIRD_PLACE.search(stage.name):
+            third_place = m.id
+        else:
+            per_stage[m.stage_id].append(node)
+
+    rounds = [{"stage_id": s.id, "name": s.name, "nodes": per_stage[s.id]} for s in stages if per_stage[s.id]]
+    for prev, nxt in zip(rounds, rounds[1:]):
+        _link(prev["nodes"], nxt["nodes"])
+    bracket = Bracket(season_id, [{**r, "nodes": [n.match_id for n in r["nodes"]]} for r in rounds],
+                      third_place, nodes, {s.id for s in stages})
+    for r in rounds:
+        for n in r["nodes"]:
+            bracket.resolve(n)
+    if third_place is not None:
+        bracket.resolve(nodes[third_place])
+    return bracket
+
+
+class BracketCache:
+    """Season brackets kept in memory and patched in place as KO results come in."""
+
+    def __init__(self):
+        self._brackets: dict[int, Bracket] = {}
+        self._locks: dict[int, asyncio.Lock] = {}
+        # season id -> whether a change arrived while its build was reading
+        self._building: dict[int, bool] = {}
+
+    async def get(self, db: AsyncSession, season_id: int) -> Bracket:
+        bracket = self._brackets.get(season_id)
+        if bracket is not None:
+            return bracket
+        # checked before taking a lock, so ids that don't exist can't grow _locks
+        if await db.get(Season, season_id) is None:
+            raise HTTPException(status_code=404, detail="Season not found")
+        async with self._locks.setdefault(season_id, asyncio.Lock()):
+            if season_id in self._brackets:
+                return self._brackets[season_id]
+            for _ in range(BUILD_ATTEMPTS):
+                self._building[season_id] = False
+                try:
+                    bracket = await build(db, season_id)
+                    stale = self._building[season_id]
+                finally:
+                    del self._building[season_id]
+                if not stale:
+                    self._brackets[season_id] = bracket
+                    break
+            return bracket
+
+    def invalidate(self, season_id: int | None = None):
+        if season_id is None:
+            self._brackets.clear()
+            self._building = dict.fromkeys(self._building, True)
+        else:
+            self._brackets.pop(season_id, None)
+            if season_id in self._building:
+                self._building[season_id] = True
+
+    def _owner(self, match_id: int) -> Bracket | None:
+        return next((b for b in self._brackets.values() if match_id in b.nodes), None)
+
+    def on_matches(self, changes: list[Change]):
+        for c in changes:
+            if self._building:
+                # a build in flight may already have read this match; unknown or moved seasons spoil them all
+                moved = c.obj is None or c.fields is None or "season_id" in c.fields
+                for season_id in self._building:
+                    if moved or season_id == c.obj.season_id:
+                        self._building[season_id] = True
+            bracket = self._owner(c.id)
+            if bracket is None:
+                if c.obj is None:
+                    self.invalidate()
+                elif c.obj.stage_id in getattr(self._brackets.get(c.obj.season_id), "stage_ids", ()):
+                    self.invalidate(c.obj.season_id)
+            elif c.op == "update" and c.obj is not None and c.fields is not None and c.fields <= RESULT_FIELDS:
+                node = bracket.nodes[c.id]
+                node.load(c.obj)
+                bracket.resolve(node)
+            else:
+                self.invalidate(bracket.season_id)
+
+    def on_stages(self, changes: list[Change]):
+        for c in changes:
+            self.invalidate(c.obj.season_id if c.obj is not None else None)
+
+    def on_seasons(self, changes: list[Change]):
+        for c in changes:
+            if c.op == "delete":
+                self.invalidate(c.id)
+                self._locks.pop(c.id, None)
+
+
+cache = BracketCache()
+subscribe("Match")(cache.on_matches)
+subscribe("Stage")(cache.on_stages)
+subscribe("Season")(cache.on_seasons)
+on_resync(cache.invalidate)
@@ -0,0 +1,78 @@
+"""Retention for change_log, the table behind /changes.
+
+Entries older than CHANGE_LOG_RETENTION_DAYS are deleted in chunks by a
+background loop. A client whose sync token predates the oldest entry kept
+could have missed some of the deleted ones, so /changes answers it 410 and
+it resyncs from the list routes.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .db import async_session
+from .models import ChangeLog
+
+log = logging.getLogger(__name__)
+
+CHANGE_LOG_RETENTION_DAYS = int(os.getenv("CHANGE_LOG_RETENTION_DAYS", "30"))
+CHANGE_LOG_PRUNE_SECONDS = int(os.getenv("CHANGE_LOG_PRUNE_SECONDS", "3600"))
+PRUNE_CHUNK_ROWS = 10_000
+
+
+async def horizon(db: AsyncSession) -> int:
+    """The oldest token the feed can still serve completely; older ones get 410."""
+    oldest = (await db.execute(select(func.min(ChangeLog.id)))).scalar()
+    return oldest - 1 if oldest is not None else 0
+
+
+async def prune(now: datetime | None = None) -> int:
+    """Delete entries past retention, chunk by chunk; returns how many went.
+
+    The newest entry is always kept, so `horizon` stays meaningful once
+    everything else has expired.
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(days=CHANGE_LOG_RETENTION_DAYS)
+    pruned = 0
+    while True:
+        async with async_session() as db:
+            newest = select(func.max(ChangeLog.id)).scalar_subquery()
+            chunk = (select(ChangeLog.id).where(ChangeLog.createdAt < cutoff, ChangeLog.id < newest)
+                     .order_by(ChangeLog.id).limit(PRUNE_CHUNK_ROWS).scalar_subquery())
+            n = (await db.execute(
+                delete(ChangeLog).where(ChangeLog.id.in_(chunk)).execution_options(synchronize_session=False)
+            )).rowcount
+            await db.commit()
+        pruned += n
+        if n < PRUNE_CHUNK_ROWS:
+            return pruned
+
+
+_task: asyncio.Task | None = None
+
+
+async def _loop():
+    while True:
+        try:
+            n = await prune()
+            if n:
+                log.info("pruned %d change_log entries", n)
+        except Exception:
+            log.exception("change_log pruning failed")
+        await asyncio.sleep(CHANGE_LOG_PRUNE_SECONDS)
+
+
+async def start():
+    global _task
+    _task = asyncio.create_task(_loop())
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        _task = None
@@ -0,0 +1,179 @@
+from __future__ import annotations
+import asyncio
+import gzip
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Callable
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_CACHE_BYTES = int(os.getenv("COMPRESSION_CACHE_BYTES", str(64 * 1024 * 1024)))
+# bodies above this are compressed off the event loop
+COMPRESSION_THREAD_SIZE = 256 * 1024
+
+COMPRESSIBLE = ("application/json", "text/", "application/xml", "application/javascript", "image/svg+xml")
+
+# (fast, thorough) encoders per coding, in server preference order; the thorough
+# level is used for cacheable bodies since its cost is paid once per version.
+ENCODERS: dict[str, tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {}
+if brotli is not None:
+    ENCODERS["br"] = (lambda b: brotli.compress(b, quality=4), lambda b: brotli.compress(b, quality=9))
+if zstandard is not None:
+    # ZstdCompressor instances are not thread-safe, so build one per call
+    ENCODERS["zstd"] = (lambda b: zstandard.ZstdCompressor(level=3).compress(b),
+                        lambda b: zstandard.ZstdCompressor(level=12).compress(b))
+ENCODERS["gzip"] = (lambda b: gzip.compress(b, 5), lambda b: gzip.compress(b, 9))
+
+
+def negotiate(accept_encoding: str, available=None) -> str | None:
+    """Pick the best coding the client accepts (highest q, then server preference)."""
+    available = list(available or ENCODERS)
+    prefs: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            prefs[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for enc in available:
+        q = prefs.get(enc, prefs.get("*", 0.0))
+        if q > best_q:
+            best, best_q = enc, q
+    return best
+
+
+class CompressedLRU:
+    """Compressed bodies keyed by coding plus URL and ETag, or content hash; bounded by total bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = self.misses = 0
+        self._items: OrderedDict[tuple[str, bytes], bytes] = OrderedDict()
+
+    def get(self, key):
+        body = self._items.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._items.move_to_end(key)
+        return body
+
+    def put(self, key, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self._items[key] = body
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.size -= len(evicted)
+
+
+def _cache_key(scope, lookup: dict, encoding: str, body: bytes) -> tuple:
+    etag = lookup.get(b"etag")
+    if etag is not None and not etag.startswith(b"W/") and lookup.get(b"vary", b"accept-encoding").lower() == b"accept-encoding":
+        # a strong tag already names this URL's representation; no need to hash the body
+        return encoding, scope["path"], scope.get("query_string", b""), etag
+    return encoding, hashlib.blake2b(body, digest_size=16).digest()
+
+
+class CompressionMiddleware:
+    """Negotiated br/zstd/gzip compression for buffered responses over a size threshold.
+
+    Responses marked `Cache-Control: public` keep their compressed bytes in an
+    LRU, so repeat hits on unchanged content skip recompression. The key is
+    the URL and strong ETag when the response has one, otherwise the body's
+    hash. Streaming responses and responses that already carry a
+    Content-Encoding pass through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE, cache_bytes: int = COMPRESSION_CACHE_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = CompressedLRU(cache_bytes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict((k.lower(), v) for k, v in scope["headers"])
+        encoding = negotiate(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start: dict | None = None
+        chunks: list[bytes] = []
+        passthrough = False
+
+        async def wrapped_send(message):
+            nonlocal start, passthrough
+            if passthrough:
+                return await send(message)
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                return await send(message)
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                if len(chunks) == 1:
+                    # streaming response: send what we have and stop buffering
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    chunks.clear()
+                return
+            await self._finish(scope, start, b"".join(chunks), encoding, send)
+
+        await self.app(scope, receive, wrapped_send)
+
+    async def _finish(self, scope, start: dict, body: bytes, encoding: str, send):
+        headers = [(k, v) for k, v in start["headers"]]
+        lookup = {k.lower(): v for k, v in headers}
+        content_type = lookup.get(b"content-type", b"").decode("latin-1")
+        if (len(body) < self.minimum_size or b"content-encoding" in lookup
+                or not content_type.startswith(COMPRESSIBLE)):
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        cacheable = start["status"] == 200 and b"public" in lookup.get(b"cache-control", b"")
+        key = _cache_key(scope, lookup, encoding, body) if cacheable else None
+        compressed = self.cache.get(key) if cacheable else None
+        if compressed is None:
+            fn = ENCODERS[encoding][1 if cacheable else 0]
+            compressed = await asyncio.to_thread(fn, body) if len(body) > COMPRESSION_THREAD_SIZE else fn(body)
+            if cacheable:
+                self.cache.put(key, compressed)
+
+        headers = [(k, v) for k, v in headers if k.lower() not in (b"content-length", b"vary", b"etag")]
+        etag = lookup.get(b"etag")
+        if etag is not None:
+            # the encoded body is a different representation, so a strong tag no longer holds
+            headers.append((b"etag", etag if etag.startswith(b"W/") else b"W/" + etag))
+        vary = lookup.get(b"vary")
+        headers += [
+            (b"content-encoding", encoding.encode()),
+            (b"content-length", str(len(compressed)).encode()),
+            (b"vary", vary + b", Accept-Encoding" if vary and b"accept-encoding" not in vary.lower() else vary or b"Accept-Encoding"),
+        ]
+        await send({**start, "headers": headers})
+        await send({"type": "http.response.body", "body": compressed})
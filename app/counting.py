@@ -0,0 +1,91 @@
+from __future__ import annotations
+import json
+import os
+from collections import OrderedDict
+from typing import Hashable
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from .db import async_session
+from .events import Change, on_resync, subscribe
+
+COUNT_CACHE_SIZE = int(os.getenv("COUNT_CACHE_SIZE", "4096"))
+
+
+class Explain(Executable, ClauseElement):
+    """`EXPLAIN (FORMAT JSON) <stmt>`, with binds rendered as for the statement itself."""
+    inherit_cache = False
+
+    def __init__(self, stmt):
+        self.statement = stmt
+
+
+@compiles(Explain, "postgresql")
+def _explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+class Counter:
+    """Total row counts for list queries.
+
+    `exact` counts are cached per table version; any committed write to the
+    entity (local or, via app/notify.py, from another worker) bumps the
+    version. `estimate` reads planner statistics on Postgres and is exact
+    elsewhere.
+    """
+
+    def __init__(self, size: int = COUNT_CACHE_SIZE):
+        self.size = size
+        self._versions: dict[str, int] = {}
+        self._exact: OrderedDict[tuple, tuple[int, int]] = OrderedDict()
+
+    def on_change(self, changes: list[Change]):
+        for entity in {c.entity for c in changes}:
+            self._versions[entity] = self._versions.get(entity, 0) + 1
+
+    def clear(self):
+        self._exact.clear()
+
+    async def total(self, model, q, mode: str, key: Hashable) -> int | None:
+        """Count the rows `q` (an unpaged select of `model`) matches, in a session of its own."""
+        if mode == "none":
+            return None
+        async with async_session() as db:
+            if mode == "estimate" and db.bind.dialect.name == "postgresql":
+                return await self._estimate(db, model, q)
+            return await self._count_exact(db, model, q, key)
+
+    async def _count_exact(self, db, model, q, key: Hashable) -> int:
+        entity = model.__name__
+        version = self._versions.get(entity, 0)
+        ck = (entity, key)
+        hit = self._exact.get(ck)
+        if hit is not None and hit[0] == version:
+            self._exact.move_to_end(ck)
+            return hit[1]
+        n = (await db.execute(select(func.count()).select_from(q.order_by(None).subquery()))).scalar_one()
+        self._exact[ck] = (version, n)
+        self._exact.move_to_end(ck)
+        while len(self._exact) > self.size:
+            self._exact.popitem(last=False)
+        return n
+
+    async def _estimate(self, db, model, q) -> int:
+        if q.whereclause is None:
+            # the partitioned parent (outbound_clicks) keeps no stats of its own, so add up its children
+            n = (await db.execute(text(
+                "SELECT sum(reltuples) FROM pg_class WHERE reltuples >= 0 AND relkind <> 'p' AND (oid = CAST(:t AS regclass) "
+                "OR oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = CAST(:t AS regclass)))"
+            ), {"t": model.__tablename__})).scalar()
+            return int(n or 0)
+        plan = (await db.execute(Explain(q.order_by(None)))).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+
+counter = Counter()
+subscribe()(counter.on_change)
+on_resync(counter.clear)
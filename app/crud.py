@@ -1,53 +1,285 @@
 from __future__ import annotations
-from typing import TypeVar, Generic, Type, Any
+import asyncio
+import functools
+from datetime import datetime
+from typing import TypeVar, Generic, Type, Any, Callable
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import Boolean, Integer, case, cast, column, delete, select, update, values
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only
 from fastapi import HTTPException, status
+from .filtering import FilterSet, after_clause, order_columns
+from .events import Change, publish
+from . import notify
+from .counting import counter
+from .loader import loader
+from .models import ChangeLog
+
+@functools.lru_cache(maxsize=None)
+def dependents(model) -> list[tuple[Any, Any, str]]:
+    """(child model, foreign key attribute, "CASCADE" | "SET NULL") for each FK into `model` the database acts on."""
+    out = []
+    for mapper in model.registry.mappers:
+        for fk in mapper.local_table.foreign_keys:
+            if fk.column.table is model.__table__ and fk.ondelete in ("CASCADE", "SET NULL"):
+                out.append((mapper.class_, mapper.get_property_by_column(fk.parent).class_attribute, fk.ondelete))
+    return out
+
 
 ModelT = TypeVar("ModelT")
 CreateS = TypeVar("CreateS")
 UpdateS = TypeVar("UpdateS")
 
 class CRUD(Generic[ModelT, CreateS, UpdateS]):
-    def __init__(self, model: Type[ModelT]):
+    def __init__(self, model: Type[ModelT], log: bool = True):
         self.model = model
+        self.log = log  # write change_log rows; listeners are notified either way
+
+    async def _record(self, db: AsyncSession, op: str, obj, fields: frozenset[str] | None = None):
+        """Log the write to change_log and NOTIFY other workers; both commit (or roll back) with it."""
+        if self.log:
+            db.add(ChangeLog(entity=self.model.__name__, entity_id=obj.id, op=op,
+                             version=getattr(obj, "version", None), createdAt=datetime.utcnow()))
+        await notify.emit(db, self.model.__name__, obj.id, op, fields)
+
+    async def _record_many(self, db: AsyncSession, op: str, rows: list[tuple[Any, frozenset[str] | None]]):
+        """`_record` for a batch: one multi-row change_log insert and one NOTIFY statement."""
+        now = datetime.utcnow()
+        if self.log:
+            db.add_all([ChangeLog(entity=self.model.__name__, entity_id=obj.id, op=op,
+                                  version=getattr(obj, "version", None), createdAt=now) for obj, _ in rows])
+        await notify.emit_many(db, self.model.__name__, op, [(obj.id, fields) for obj, fields in rows])
+
+    def _query(self, filters: FilterSet | None = None, ids: list[int] | None = None):
+        q = select(self.model)
+        if ids is not None:
+            q = q.where(self.model.id.in_(ids))
+        if filters is not None:
+            q = filters.apply(q)
+        return q
+
+    async def list(self, db: AsyncSession, skip=0, limit=100, after: str | None = None, filters: FilterSet | None = None,
+                   ids: list[int] | None = None, columns: list[str] | None = None):
+        """A page of rows; with `columns`, only those (plus the key and sort column) are loaded.
 
-    async def list(self, db: AsyncSession, skip=0, limit=100):
-        res = await db.execute(select(self.model).offset(skip).limit(limit))
+        With `ids` every matching row is returned and `skip`/`after`/`limit` are ignored.
+        """
+        if ids is not None:
+            skip, after, limit = 0, None, len(ids)
+        q = self._query(filters, ids)
+        sort_field, desc = filters.sort_key() if filters is not None else (None, False)
+        if columns is not None:
+            keep = {*columns, *([sort_field] if sort_field else [])}
+            q = q.options(load_only(*(getattr(self.model, c) for c in sorted(keep))))
+        if after is not None:
+            q = q.where(after_clause(self.model, sort_field, desc, after))
+        else:
+            q = q.offset(skip)
+        q = q.order_by(*order_columns(self.model, sort_field, desc)).limit(limit)
+        res = await db.execute(q)
         return list(res.scalars().all())
 
+    async def list_with_total(self, db: AsyncSession, count: str = "exact", **kwargs):
+        """`list` plus the total matching rows ("exact", "estimate" or "none" -> None).
+
+        The count runs concurrently with the page query, in its own session.
+        """
+        filters, ids = kwargs.get("filters"), kwargs.get("ids")
+        key = (filters.model_dump_json(exclude={"sort"}) if filters is not None else None, tuple(ids) if ids is not None else None)
+        total = asyncio.create_task(counter.total(self.model, self._query(filters, ids), count, key))
+        try:
+            rows = await self.list(db, **kwargs)
+        except BaseException:
+            total.cancel()
+            raise
+        return rows, await total
+
     async def get(self, db: AsyncSession, id: int):
+        """Read-only lookup, batched with concurrent lookups of the same model (see app/loader.py)."""
+        # shielded: one caller going away must not cancel the batch others wait on
+        obj = await asyncio.shield(loader(self.model).load(id))
+        if not obj:
+            raise HTTPException(status_code=404, detail=f"{self.model.__name__} not found")
+        return obj
+
+    async def _get_for_write(self, db: AsyncSession, id: int):
         obj = await db.get(self.model, id)
         if not obj:
             raise HTTPException(status_code=404, detail=f"{self.model.__name__} not found")
         return obj
 
-    async def create(self, db: AsyncSession, payload: CreateS):
+    async def get_by(self, db: AsyncSession, field: str, value: Any):
+        res = await db.execute(select(self.model).where(getattr(self.model, field) == value))
+        obj = res.scalars().first()
+        if not obj:
+            raise HTTPException(status_code=404, detail=f"{self.model.__name__} not found")
+        return obj
+
+    async def create(self, db: AsyncSession, payload: CreateS, before_commit: Callable[[ModelT], None] | None = None):
+        """Insert `payload`; `before_commit` sees the flushed row (id assigned) inside the transaction."""
         obj = self.model(**payload.model_dump())
         db.add(obj)
         try:
+            await db.flush()
+            await self._record(db, "create", obj)
+            if before_commit is not None:
+                before_commit(obj)
             await db.commit()
         except IntegrityError as e:
             await db.rollback()
             raise HTTPException(status_code=400, detail=str(e.orig))
         await db.refresh(obj)
+        publish([Change(self.model.__name__, obj.id, "create", None, obj)])
         return obj
 
-    async def update(self, db: AsyncSession, id: int, payload: UpdateS):
-        obj = await self.get(db, id)
-        for k, v in payload.model_dump(exclude_unset=True).items():
-            setattr(obj, k, v)
+    async def create_many(self, db: AsyncSession, payloads: list[CreateS]):
+        """Insert all of `payloads` in one transaction; listeners get a single publish."""
+        objs = [self.model(**p.model_dump()) for p in payloads]
+        db.add_all(objs)
         try:
+            await db.flush()
+            await self._record_many(db, "create", [(obj, None) for obj in objs])
             await db.commit()
         except IntegrityError as e:
             await db.rollback()
             raise HTTPException(status_code=400, detail=str(e.orig))
-        await db.refresh(obj)
+        publish([Change(self.model.__name__, obj.id, "create", None, obj) for obj in objs])
+        return objs
+
+    async def update(self, db: AsyncSession, id: int, payload: UpdateS, expected_version: int | None = None):
+        """Apply `payload` with a single UPDATE ... RETURNING.
+
+        Models with a `version` column get it bumped in the same statement; when
+        `expected_version` is given the row only changes if it still has that
+        version, otherwise 412 is raised.
+        """
+        changes = payload.model_dump(exclude_unset=True)
+        versioned = hasattr(self.model, "version")
+        if not changes and not versioned:
+            return await self._get_for_write(db, id)
+        q = update(self.model).where(self.model.id == id).values(**changes)
+        if versioned:
+            q = q.values(version=self.model.version + 1)
+            if expected_version is not None:
+                q = q.where(self.model.version == expected_version)
+        q = q.returning(self.model).execution_options(synchronize_session=False, populate_existing=True)
+        fields = frozenset(changes) | ({"version"} if versioned else set())
+        try:
+            obj = (await db.execute(q)).scalars().first()
+            if obj is not None:
+                await self._record(db, "update", obj, fields)
+            await db.commit()
+        except IntegrityError as e:
+            await db.rollback()
+            raise HTTPException(status_code=400, detail=str(e.orig))
+        if obj is None:
+            await self._get_for_write(db, id)
+            raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail=f"{self.model.__name__} was modified concurrently")
+        publish([Change(self.model.__name__, obj.id, "update", fields, obj)])
         return obj
 
+    async def update_many(self, db: AsyncSession, deltas: list[tuple[int, dict, int | None]]):
+        """Apply many `(id, changes, expected_version)` deltas with one UPDATE ... FROM (VALUES ...) RETURNING.
+
+        Rows may change different columns: each column touched by any delta
+        travels in the VALUES list next to a flag saying whether this row sets
+        it. The batch is all or nothing -- 404 if an id doesn't exist, 412 if
+        an expected version no longer holds -- and listeners get one publish.
+        """
+        ids = [id for id, _, _ in deltas]
+        if len(set(ids)) != len(ids):
+            raise HTTPException(status_code=400, detail="Each id may appear only once per batch")
+        table = self.model.__table__
+        versioned = hasattr(self.model, "version")
+        cols = sorted({k for _, changes, _ in deltas for k in changes})
+
+        def typed(value, type_):
+            # a bare NULL in VALUES has no type, and an all-NULL column would come out as text
+            return cast(None, type_) if value is None else value
+
+        spec = [column("id", Integer)]
+        for k in cols:
+            spec += [column(f"set_{k}", Boolean), column(k, table.c[k].type)]
+        spec.append(column("expected", Integer))
+        rows = []
+        for id, changes, expected in deltas:
+            row = [id]
+            for k in cols:
+                row += [k in changes, typed(changes.get(k), table.c[k].type)]
+            rows.append((*row, typed(expected, Integer)))
+        v = values(*spec, name="v").data(rows)
+
+        q = update(self.model).where(self.model.id == v.c.id).values(
+            {k: case((v.c[f"set_{k}"], v.c[k]), else_=table.c[k]) for k in cols}
+        )
+        if versioned:
+            q = q.values(version=self.model.version + 1).where(v.c.expected.is_(None) | (self.model.version == v.c.expected))
+        q = q.returning(self.model).execution_options(synchronize_session=False, populate_existing=True)
+        fields = {id: frozenset(changes) | ({"version"} if versioned else set()) for id, changes, _ in deltas}
+        try:
+            objs = list((await db.execute(q)).scalars().all())
+            done = {obj.id for obj in objs}
+            if len(objs) == len(deltas):
+                await self._record_many(db, "update", [(obj, fields[obj.id]) for obj in objs])
+                await db.commit()
+        except IntegrityError as e:
+            await db.rollback()
+            raise HTTPException(status_code=400, detail=str(e.orig))
+        if len(objs) != len(deltas):
+            await db.rollback()
+            missed = set(ids) - done
+            found = set((await db.execute(select(self.model.id).where(self.model.id.in_(missed)))).scalars())
+            if missed - found:
+                raise HTTPException(status_code=404, detail=f"{self.model.__name__} not found: {sorted(missed - found)}")
+            raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED,
+                                detail=f"{self.model.__name__} modified concurrently: {sorted(found)}")
+        publish([Change(self.model.__name__, obj.id, "update", fields[obj.id], obj) for obj in objs])
+        order = {id: i for i, id in enumerate(ids)}
+        return sorted(objs, key=lambda obj: order[obj.id])
+
+    async def _apply_dependents(self, db: AsyncSession, ids: list[int]) -> list[Change]:
+        """Carry out the ON DELETE rules for rows `ids` of this model as logged writes, deepest first.
+
+        The database would apply them on its own, but silently: dependents
+        removed (or detached) that way never reach change_log or the change
+        listeners. Done here first, the database's own rules find nothing left.
+        Only models served as resources are tracked.
+        """
+        from .registry import resources
+        changes = []
+        for child, fk, rule in dependents(self.model):
+            if child.__name__ not in resources:
+                continue
+            crud = resources[child.__name__].crud
+            if rule == "CASCADE":
+                child_ids = list((await db.execute(select(child.id).where(fk.in_(ids)))).scalars())
+                if not child_ids:
+                    continue
+                changes += await crud._apply_dependents(db, child_ids)
+                q, op, fields = delete(child).where(fk.in_(ids)), "delete", None
+            else:
+                q, op, fields = update(child).where(fk.in_(ids)).values({fk.key: None}), "update", {fk.key}
+                if hasattr(child, "version"):
+                    q, fields = q.values(version=child.version + 1), fields | {"version"}
+                fields = frozenset(fields)
+            objs = (await db.execute(q.returning(child).execution_options(synchronize_session=False))).scalars().all()
+            if objs:
+                await crud._record_many(db, op, [(obj, fields) for obj in objs])
+                changes += [Change(child.__name__, obj.id, op, fields, obj) for obj in objs]
+        return changes
+
     async def delete(self, db: AsyncSession, id: int):
-        obj = await self.get(db, id)
-        await db.delete(obj)
-        await db.commit()
+        """One DELETE ... RETURNING, after the rows depending on it are deleted or detached as logged writes."""
+        q = delete(self.model).where(self.model.id == id).returning(self.model).execution_options(synchronize_session=False)
+        try:
+            changes = await self._apply_dependents(db, [id])
+            obj = (await db.execute(q)).scalars().first()
+            if obj is None:
+                raise HTTPException(status_code=404, detail=f"{self.model.__name__} not found")
+            await self._record(db, "delete", obj)
+            await db.commit()
+        except IntegrityError as e:
+            await db.rollback()
+            raise HTTPException(status_code=409, detail=str(e.orig))
+        publish(changes + [Change(self.model.__name__, id, "delete", None, obj)])
         return {"ok": True}
@@ -1,24 +1,104 @@
 from __future__ import annotations
+import asyncio
+import logging
 import os
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
 from contextlib import asynccontextmanager
 
+from .querylog import querylog
+
+log = logging.getLogger(__name__)
+
 DATABASE_URL = os.getenv(
     "DATABASE_URL",
     "postgresql+asyncpg://postgres:postgres@db:5432/sportshub",
 )
 
-engine = create_async_engine(DATABASE_URL, echo=False, future=True)
+# "edge" serves reads from a SQLite snapshot written by `python -m app.edge export`
+DB_MODE = os.getenv("DB_MODE", "primary")
+EDGE = DB_MODE == "edge"
+EDGE_SNAPSHOT_PATH = os.getenv("EDGE_SNAPSHOT_PATH", "./var/edge/snapshot.sqlite3")
+EDGE_RELOAD_SECONDS = float(os.getenv("EDGE_RELOAD_SECONDS", "5"))
+
+
+def _edge_engine() -> AsyncEngine:
+    path = os.path.abspath(EDGE_SNAPSHOT_PATH)
+    return create_async_engine(f"sqlite+aiosqlite:///file:{path}?mode=ro&uri=true", echo=False)
+
+
+engine = _edge_engine() if EDGE else create_async_engine(DATABASE_URL, echo=False, future=True)
+querylog.install(engine)
 async_session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
 class Base(DeclarativeBase):
     pass
 
+async def get_db():
+    async with async_session() as s:
+        yield s
+
+
+def _snapshot_id() -> tuple[int, int, int]:
+    st = os.stat(EDGE_SNAPSHOT_PATH)
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+async def _watch_snapshot():
+    """Rebind async_session to a fresh engine whenever a new snapshot is moved into place.
+
+    The exporter replaces the file atomically, so open connections keep
+    reading the old inode until they are returned; new sessions see the
+    new file. Derived in-memory state is dropped through events.resync().
+    """
+    global engine
+    from .events import resync
+    seen = _snapshot_id()
+    while True:
+        await asyncio.sleep(EDGE_RELOAD_SECONDS)
+        try:
+            current = _snapshot_id()
+        except FileNotFoundError:
+            continue
+        if current == seen:
+            continue
+        seen = current
+        old, engine = engine, _edge_engine()
+        querylog.install(engine)
+        async_session.configure(bind=engine)
+        await old.dispose()
+        resync()
+        log.info("edge snapshot reloaded from %s", EDGE_SNAPSHOT_PATH)
+
+
 @asynccontextmanager
 async def lifespan(app):
+    from . import models, indexes  # ensure models and generated indexes are imported
+    if EDGE:
+        # read-only replica: no schema changes and no background jobs
+        if not os.path.exists(EDGE_SNAPSHOT_PATH):
+            raise RuntimeError(f"DB_MODE=edge but no snapshot at {EDGE_SNAPSHOT_PATH}")
+        watcher = asyncio.create_task(_watch_snapshot())
+        try:
+            yield
+        finally:
+            watcher.cancel()
+        return
     # create tables on startup (swap to Alembic later if you want migrations)
     async with engine.begin() as conn:
-        from . import models  # ensure models are imported
         await conn.run_sync(models.Base.metadata.create_all)
-    yield
+    from . import changelog, mailer, notify, partitions, purge
+    await purge.ensure_schema()  # create_all leaves existing foreign keys as they were
+    await partitions.start()
+    await changelog.start()
+    await notify.start()
+    await mailer.start()
+    await purge.start()
+    try:
+        yield
+    finally:
+        await purge.stop()
+        await mailer.stop()
+        await notify.stop()
+        await changelog.stop()
+        await partitions.stop()
@@ -0,0 +1,117 @@
+"""Read-only SQLite snapshots of the public data, for edge nodes running with DB_MODE=edge.
+
+    python -m app.edge export [PATH]   # write a snapshot (default EDGE_SNAPSHOT_PATH) from the primary
+"""
+from __future__ import annotations
+import asyncio
+import logging
+import os
+import sys
+import time
+
+from sqlalchemy import create_engine, select
+
+from .db import EDGE_SNAPSHOT_PATH, Base, async_session
+from .models import (AffiliateOffer, AffiliatePartner, City, Competition, Match, Page, PageBlock, PageStatus, Season,
+                     Stage, Team, Venue)
+from . import indexes  # noqa: F401  (the snapshot carries the same indexes)
+
+log = logging.getLogger(__name__)
+
+EXPORT_BATCH = 5000
+
+_published = select(Page.id).where(Page.status == PageStatus.PUBLISHED)
+_active_partners = select(AffiliatePartner.id).where(AffiliatePartner.active.is_(True))
+
+# (model, filter) in foreign-key order; every other table is created empty
+EXPORTS = (
+    (City, None),
+    (Venue, None),
+    (Competition, None),
+    (Season, None),
+    (Stage, None),
+    (Team, None),
+    (Match, None),
+    (Page, Page.status == PageStatus.PUBLISHED),
+    (PageBlock, PageBlock.page_id.in_(_published)),
+    (AffiliatePartner, AffiliatePartner.active.is_(True)),
+    (AffiliateOffer, AffiliateOffer.active.is_(True) & AffiliateOffer.partner_id.in_(_active_partners)),
+)
+
+
+async def export(path: str = EDGE_SNAPSHOT_PATH) -> dict[str, int]:
+    """Copy the public rows into a new SQLite file, then move it over `path` in one rename.
+
+    The copy runs in a single repeatable-read transaction on the primary, so
+    the snapshot is consistent across tables.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    target = create_engine(f"sqlite:///{tmp}")
+    counts: dict[str, int] = {}
+    try:
+        with target.begin() as out:
+            Base.metadata.create_all(out)
+            async with async_session() as db:
+                if db.bind.dialect.name == "postgresql":
+                    await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+                for model, where in EXPORTS:
+                    table = model.__table__
+                    q = select(table).order_by(*table.primary_key.columns)
+                    if where is not None:
+                        q = q.where(where)
+                    n = 0
+                    result = await db.stream(q.execution_options(yield_per=EXPORT_BATCH))
+                    async for rows in result.mappings().partitions():
+                        out.execute(table.insert(), [dict(r) for r in rows])
+                        n += len(rows)
+                    counts[table.name] = n
+        with target.connect() as out:
+            out.exec_driver_sql("ANALYZE")
+        with target.connect().execution_options(isolation_level="AUTOCOMMIT") as out:
+            out.exec_driver_sql("VACUUM")
+    except BaseException:
+        target.dispose()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    target.dispose()
+    with open(tmp, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return counts
+
+
+class ReadOnlyMiddleware:
+    """Answers every non-read request with 405; edge nodes have nothing to write to."""
+
+    SAFE = frozenset({"GET", "HEAD", "OPTIONS"})
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in self.SAFE:
+            return await self.app(scope, receive, send)
+        body = b'{"detail":"Read-only edge node"}'
+        await send({"type": "http.response.start", "status": 405, "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"allow", b"GET, HEAD, OPTIONS"),
+        ]})
+        await send({"type": "http.response.body", "body": body})
+
+
+async def _main(path: str):
+    started = time.monotonic()
+    counts = await export(path)
+    log.info("exported %s to %s in %.1fs", counts, path, time.monotonic() - started)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) not in (2, 3) or sys.argv[1] != "export":
+        sys.exit(__doc__)
+    asyncio.run(_main(sys.argv[2] if len(sys.argv) == 3 else EDGE_SNAPSHOT_PATH))
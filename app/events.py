@@ -0,0 +1,61 @@
+from __future__ import annotations
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Change:
+    """A committed write. `fields` is None when the changed columns are unknown."""
+    entity: str
+    id: int
+    op: str  # "create" | "update" | "delete"
+    fields: frozenset[str] | None = None
+    obj: Any = None
+
+
+_listeners: list[tuple[frozenset[str] | None, Callable[[list[Change]], None]]] = []
+_resync: list[Callable[[], None]] = []
+
+
+def subscribe(*entities: str):
+    """Register a listener for committed changes to `entities` (all entities if none given).
+
+    Listeners receive every matching change of one write -- or one batch --
+    in a single call, and must not block; schedule async work as a task.
+    """
+    def deco(fn):
+        _listeners.append((frozenset(entities) or None, fn))
+        return fn
+    return deco
+
+
+def publish(changes: Iterable[Change]):
+    changes = list(changes)
+    for entities, fn in _listeners:
+        mine = [c for c in changes if entities is None or c.entity in entities]
+        if mine:
+            try:
+                fn(mine)
+            except Exception:
+                log.exception("change listener %s failed", fn.__qualname__)
+
+
+def on_resync(fn):
+    """Register a callback that drops derived state wholesale.
+
+    Called when changes may have been missed, e.g. after the cross-worker
+    notification connection (app/notify.py) was down.
+    """
+    _resync.append(fn)
+    return fn
+
+
+def resync():
+    for fn in _resync:
+        try:
+            fn()
+        except Exception:
+            log.exception("resync callback %s failed", fn.__qualname__)
@@ -0,0 +1,65 @@
+from __future__ import annotations
+import base64
+import json
+from datetime import datetime
+from typing import Any, ClassVar, Optional
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import tuple_
+
+_OPS = {
+    "eq": lambda c, v: c == v,
+    "gte": lambda c, v: c >= v,
+    "lt": lambda c, v: c < v,
+}
+
+
+class FilterSet(BaseModel):
+    """Base for the per-entity query-parameter filters generated into app/filters.py.
+
+    `columns` maps each query parameter to a (column, op) pair; `sort` takes a
+    column name, optionally prefixed with `-` for descending order. Ordering
+    always ends on `id` so results can be paged with a keyset cursor.
+    """
+    model: ClassVar[Any]
+    columns: ClassVar[dict[str, tuple[str, str]]] = {}
+
+    sort: Optional[str] = None
+
+    def apply(self, q):
+        for name, value in self.model_dump(exclude_none=True, exclude={"sort"}).items():
+            col, op = self.columns[name]
+            q = q.where(_OPS[op](getattr(self.model, col), value))
+        return q
+
+    def sort_key(self) -> tuple[Optional[str], bool]:
+        if not self.sort:
+            return None, False
+        return self.sort.lstrip("-"), self.sort.startswith("-")
+
+
+def order_columns(model, sort_field: Optional[str], desc: bool) -> list:
+    cols = [getattr(model, sort_field)] if sort_field and sort_field != "id" else []
+    cols.append(model.id)
+    return [c.desc() for c in cols] if desc else cols
+
+
+def encode_cursor(obj, sort_field: Optional[str]) -> str:
+    key = [obj.id] if not sort_field or sort_field == "id" else [getattr(obj, sort_field), obj.id]
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in key])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def after_clause(model, sort_field: Optional[str], desc: bool, cursor: str):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    cols = [model.id] if not sort_field or sort_field == "id" else [getattr(model, sort_field), model.id]
+    if not isinstance(key, list) or len(key) != len(cols):
+        raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+    if len(cols) == 2 and cols[0].type.python_type is datetime:
+        key[0] = datetime.fromisoformat(key[0])
+    lhs, rhs = tuple_(*cols), tuple_(*key)
+    return lhs < rhs if desc else lhs > rhs
@@ -0,0 +1,348 @@
+# Generated by codegen.py from sports_adda_jdl.txt -- do not edit by hand.
+from datetime import date, datetime
+from typing import ClassVar, Literal, Optional
+
+from .filtering import FilterSet
+from .models import (
+    AffiliateOffer, AffiliatePartner, AlertSubscription, City, Competition, EmailSubscriber, Match, OutboundClick, Page, PageBlock, Season, Stage, Team, Venue, MatchStatus, PageStatus, PartnerKind, StageType, TopicType,
+)
+
+
+class CityFilter(FilterSet):
+    model: ClassVar = City
+    columns: ClassVar = {
+        "name": ("name", "eq"),
+        "countryCode": ("countryCode", "eq"),
+        "slug": ("slug", "eq"),
+        "tz": ("tz", "eq"),
+        "airportCodes": ("airportCodes", "eq"),
+        "lat": ("lat", "eq"),
+        "lat_gte": ("lat", "gte"),
+        "lat_lt": ("lat", "lt"),
+        "lng": ("lng", "eq"),
+        "lng_gte": ("lng", "gte"),
+        "lng_lt": ("lng", "lt"),
+    }
+
+    name: Optional[str] = None
+    countryCode: Optional[str] = None
+    slug: Optional[str] = None
+    tz: Optional[str] = None
+    airportCodes: Optional[str] = None
+    lat: Optional[float] = None
+    lat_gte: Optional[float] = None
+    lat_lt: Optional[float] = None
+    lng: Optional[float] = None
+    lng_gte: Optional[float] = None
+    lng_lt: Optional[float] = None
+    sort: Optional[Literal["id", "-id", "slug", "-slug"]] = None
+
+
+class VenueFilter(FilterSet):
+    model: ClassVar = Venue
+    columns: ClassVar = {
+        "name": ("name", "eq"),
+        "slug": ("slug", "eq"),
+        "capacity": ("capacity", "eq"),
+        "capacity_gte": ("capacity", "gte"),
+        "capacity_lt": ("capacity", "lt"),
+        "tz": ("tz", "eq"),
+        "lat": ("lat", "eq"),
+        "lat_gte": ("lat", "gte"),
+        "lat_lt": ("lat", "lt"),
+        "lng": ("lng", "eq"),
+        "lng_gte": ("lng", "gte"),
+        "lng_lt": ("lng", "lt"),
+        "city_id": ("city_id", "eq"),
+    }
+
+    name: Optional[str] = None
+    slug: Optional[str] = None
+    capacity: Optional[int] = None
+    capacity_gte: Optional[int] = None
+    capacity_lt: Optional[int] = None
+    tz: Optional[str] = None
+    lat: Optional[float] = None
+    lat_gte: Optional[float] = None
+    lat_lt: Optional[float] = None
+    lng: Optional[float] = None
+    lng_gte: Optional[float] = None
+    lng_lt: Optional[float] = None
+    city_id: Optional[int] = None
+    sort: Optional[Literal["id", "-id", "slug", "-slug"]] = None
+
+
+class CompetitionFilter(FilterSet):
+    model: ClassVar = Competition
+    columns: ClassVar = {
+        "name": ("name", "eq"),
+        "code": ("code", "eq"),
+        "kind": ("kind", "eq"),
+        "region": ("region", "eq"),
+        "slug": ("slug", "eq"),
+    }
+
+    name: Optional[str] = None
+    code: Optional[str] = None
+    kind: Optional[str] = None
+    region: Optional[str] = None
+    slug: Optional[str] = None
+    sort: Optional[Literal["id", "-id", "code", "-code", "slug", "-slug"]] = None
+
+
+class SeasonFilter(FilterSet):
+    model: ClassVar = Season
+    columns: ClassVar = {
+        "yearStart": ("yearStart", "eq"),
+        "yearStart_gte": ("yearStart", "gte"),
+        "yearStart_lt": ("yearStart", "lt"),
+        "yearEnd": ("yearEnd", "eq"),
+        "yearEnd_gte": ("yearEnd", "gte"),
+        "yearEnd_lt": ("yearEnd", "lt"),
+        "slug": ("slug", "eq"),
+        "competition_id": ("competition_id", "eq"),
+    }
+
+    yearStart: Optional[int] = None
+    yearStart_gte: Optional[int] = None
+    yearStart_lt: Optional[int] = None
+    yearEnd: Optional[int] = None
+    yearEnd_gte: Optional[int] = None
+    yearEnd_lt: Optional[int] = None
+    slug: Optional[str] = None
+    competition_id: Optional[int] = None
+    sort: Optional[Literal["id", "-id", "yearStart", "-yearStart", "yearEnd", "-yearEnd", "slug", "-slug"]] = None
+
+
+class StageFilter(FilterSet):
+    model: ClassVar = Stage
+    columns: ClassVar = {
+        "name": ("name", "eq"),
+        "type": ("type", "eq"),
+        "sortOrder": ("sortOrder", "eq"),
+        "sortOrder_gte": ("sortOrder", "gte"),
+        "sortOrder_lt": ("sortOrder", "lt"),
+        "season_id": ("season_id", "eq"),
+    }
+
+    name: Optional[str] = None
+    type: Optional[StageType] = None
+    sortOrder: Optional[int] = None
+    sortOrder_gte: Optional[int] = None
+    sortOrder_lt: Optional[int] = None
+    season_id: Optional[int] = None
+    sort: Optional[Literal["id", "-id"]] = None
+
+
+class TeamFilter(FilterSet):
+    model: ClassVar = Team
+    columns: ClassVar = {
+        "name": ("name", "eq"),
+        "countryCode": ("countryCode", "eq"),
+        "fifaCode": ("fifaCode", "eq"),
+        "slug": ("slug", "eq"),
+    }
+
+    name: Optional[str] = None
+    countryCode: Optional[str] = None
+    fifaCode: Optional[str] = None
+    slug: Optional[str] = None
+    sort: Optional[Literal["id", "-id", "slug", "-slug"]] = None
+
+
+class MatchFilter(FilterSet):
+    model: ClassVar = Match
+    columns: ClassVar = {
+        "round": ("round", "eq"),
+        "kickoff": ("kickoff", "eq"),
+        "kickoff_gte": ("kickoff", "gte"),
+        "kickoff_lt": ("kickoff", "lt"),
+        "status": ("status", "eq"),
+        "scoreHome": ("scoreHome", "eq"),
+        "scoreHome_gte": ("scoreHome", "gte"),
+        "scoreHome_lt": ("scoreHome", "lt"),
+        "scoreAway": ("scoreAway", "eq"),
+        "scoreAway_gte": ("scoreAway", "gte"),
+        "scoreAway_lt": ("scoreAway", "lt"),
+        "pensHome": ("pensHome", "eq"),
+        "pensHome_gte": ("pensHome", "gte"),
+        "pensHome_lt": ("pensHome", "lt"),
+        "pensAway": ("pensAway", "eq"),
+        "pensAway_gte": ("pensAway", "gte"),
+        "pensAway_lt": ("pensAway", "lt"),
+        "season_id": ("season_id", "eq"),
+        "stage_id": ("stage_id", "eq"),
+        "venue_id": ("venue_id", "eq"),
+        "home_team_id": ("home_team_id", "eq"),
+        "away_team_id": ("away_team_id", "eq"),
+    }
+
+    round: Optional[str] = None
+    kickoff: Optional[datetime] = None
+    kickoff_gte: Optional[datetime] = None
+    kickoff_lt: Optional[datetime] = None
+    status: Optional[MatchStatus] = None
+    scoreHome: Optional[int] = None
+    scoreHome_gte: Optional[int] = None
+    scoreHome_lt: Optional[int] = None
+    scoreAway: Optional[int] = None
+    scoreAway_gte: Optional[int] = None
+    scoreAway_lt: Optional[int] = None
+    pensHome: Optional[int] = None
+    pensHome_gte: Optional[int] = None
+    pensHome_lt: Optional[int] = None
+    pensAway: Optional[int] = None
+    pensAway_gte: Optional[int] = None
+    pensAway_lt: Optional[int] = None
+    season_id: Optional[int] = None
+    stage_id: Optional[int] = None
+    venue_id: Optional[int] = None
+    home_team_id: Optional[int] = None
+    away_team_id: Optional[int] = None
+    sort: Optional[Literal["id", "-id", "kickoff", "-kickoff"]] = None
+
+
+class PageFilter(FilterSet):
+    model: ClassVar = Page
+    columns: ClassVar = {
+        "slug": ("slug", "eq"),
+        "title": ("title", "eq"),
+        "status": ("status", "eq"),
+        "publishedAt": ("publishedAt", "eq"),
+        "publishedAt_gte": ("publishedAt", "gte"),
+        "publishedAt_lt": ("publishedAt", "lt"),
+    }
+
+    slug: Optional[str] = None
+    title: Optional[str] = None
+    status: Optional[PageStatus] = None
+    publishedAt: Optional[datetime] = None
+    publishedAt_gte: Optional[datetime] = None
+    publishedAt_lt: Optional[datetime] = None
+    sort: Optional[Literal["id", "-id", "slug", "-slug"]] = None
+
+
+class PageBlockFilter(FilterSet):
+    model: ClassVar = PageBlock
+    columns: ClassVar = {
+        "type": ("type", "eq"),
+        "sortOrder": ("sortOrder", "eq"),
+        "sortOrder_gte": ("sortOrder", "gte"),
+        "sortOrder_lt": ("sortOrder", "lt"),
+        "page_id": ("page_id", "eq"),
+    }
+
+    type: Optional[str] = None
+    sortOrder: Optional[int] = None
+    sortOrder_gte: Optional[int] = None
+    sortOrder_lt: Optional[int] = None
+    page_id: Optional[int] = None
+    sort: Optional[Literal["id", "-id"]] = None
+
+
+class AffiliatePartnerFilter(FilterSet):
+    model: ClassVar = AffiliatePartner
+    columns: ClassVar = {
+        "name": ("name", "eq"),
+        "kind": ("kind", "eq"),
+        "program": ("program", "eq"),
+        "baseUrl": ("baseUrl", "eq"),
+        "active": ("active", "eq"),
+    }
+
+    name: Optional[str] = None
+    kind: Optional[PartnerKind] = None
+    program: Optional[str] = None
+    baseUrl: Optional[str] = None
+    active: Optional[bool] = None
+    sort: Optional[Literal["id", "-id"]] = None
+
+
+class AffiliateOfferFilter(FilterSet):
+    model: ClassVar = AffiliateOffer
+    columns: ClassVar = {
+        "name": ("name", "eq"),
+        "deeplinkPattern": ("deeplinkPattern", "eq"),
+        "active": ("active", "eq"),
+        "partner_id": ("partner_id", "eq"),
+    }
+
+    name: Optional[str] = None
+    deeplinkPattern: Optional[str] = None
+    active: Optional[bool] = None
+    partner_id: Optional[int] = None
+    sort: Optional[Literal["id", "-id"]] = None
+
+
+class OutboundClickFilter(FilterSet):
+    model: ClassVar = OutboundClick
+    columns: ClassVar = {
+        "targetUrl": ("targetUrl", "eq"),
+        "ip": ("ip", "eq"),
+        "country": ("country", "eq"),
+        "userAgent": ("userAgent", "eq"),
+        "createdAt": ("createdAt", "eq"),
+        "createdAt_gte": ("createdAt", "gte"),
+        "createdAt_lt": ("createdAt", "lt"),
+        "offer_id": ("offer_id", "eq"),
+    }
+
+    targetUrl: Optional[str] = None
+    ip: Optional[str] = None
+    country: Optional[str] = None
+    userAgent: Optional[str] = None
+    createdAt: Optional[datetime] = None
+    createdAt_gte: Optional[datetime] = None
+    createdAt_lt: Optional[datetime] = None
+    offer_id: Optional[int] = None
+    sort: Optional[Literal["id", "-id", "createdAt", "-createdAt"]] = None
+
+
+class EmailSubscriberFilter(FilterSet):
+    model: ClassVar = EmailSubscriber
+    columns: ClassVar = {
+        "email": ("email", "eq"),
+        "locale": ("locale", "eq"),
+        "doubleOptIn": ("doubleOptIn", "eq"),
+        "status": ("status", "eq"),
+        "createdAt": ("createdAt", "eq"),
+        "createdAt_gte": ("createdAt", "gte"),
+        "createdAt_lt": ("createdAt", "lt"),
+        "unsubscribedAt": ("unsubscribedAt", "eq"),
+        "unsubscribedAt_gte": ("unsubscribedAt", "gte"),
+        "unsubscribedAt_lt": ("unsubscribedAt", "lt"),
+    }
+
+    email: Optional[str] = None
+    locale: Optional[str] = None
+    doubleOptIn: Optional[bool] = None
+    status: Optional[str] = None
+    createdAt: Optional[datetime] = None
+    createdAt_gte: Optional[datetime] = None
+    createdAt_lt: Optional[datetime] = None
+    unsubscribedAt: Optional[datetime] = None
+    unsubscribedAt_gte: Optional[datetime] = None
+    unsubscribedAt_lt: Optional[datetime] = None
+    sort: Optional[Literal["id", "-id", "email", "-email", "createdAt", "-createdAt"]] = None
+
+
+class AlertSubscriptionFilter(FilterSet):
+    model: ClassVar = AlertSubscription
+    columns: ClassVar = {
+        "topicType": ("topicType", "eq"),
+        "topicRef": ("topicRef", "eq"),
+        "channel": ("channel", "eq"),
+        "createdAt": ("createdAt", "eq"),
+        "createdAt_gte": ("createdAt", "gte"),
+        "createdAt_lt": ("createdAt", "lt"),
+        "subscriber_id": ("subscriber_id", "eq"),
+    }
+
+    topicType: Optional[TopicType] = None
+    topicRef: Optional[str] = None
+    channel: Optional[str] = None
+    createdAt: Optional[datetime] = None
+    createdAt_gte: Optional[datetime] = None
+    createdAt_lt: Optional[datetime] = None
+    subscriber_id: Optional[int] = None
+    sort: Optional[Literal["id", "-id", "createdAt", "-createdAt"]] = None
@@ -0,0 +1,211 @@
+from __future__ import annotations
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import select, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from .events import Change, on_resync, subscribe
+from .models import Match, MatchStatus, Season, Team, Venue
+
+FEED_FIELDS = frozenset({"kickoff", "status", "venue_id", "home_team_id", "away_team_id", "season_id"})
+MATCH_DURATION = timedelta(hours=2)
+STATUS = {MatchStatus.CANCELED: "CANCELLED", MatchStatus.POSTPONED: "TENTATIVE"}
+SOURCES = {"team": Team, "venue": Venue, "season": Season}
+# builds retried when changes keep landing while one reads; the last is served uncached
+BUILD_ATTEMPTS = 3
+
+
+@dataclass(frozen=True)
+class Feed:
+    body: bytes
+    etag: str
+    lastModified: datetime
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _fold(line: str) -> str:
+    """Fold content lines at 75 octets as RFC 5545 requires."""
+    raw = line.encode()
+    if len(raw) <= 75:
+        return line
+    parts, start = [], 0
+    while start < len(raw):
+        end = min(start + (75 if not parts else 74), len(raw))
+        while end < len(raw) and (raw[end] & 0xC0) == 0x80:  # don't split a UTF-8 sequence
+            end -= 1
+        parts.append(raw[start:end].decode())
+        start = end
+    return "\r\n ".join(parts)
+
+
+def _dt(kickoff: datetime, tz: str | None) -> str:
+    utc = kickoff.replace(tzinfo=timezone.utc) if kickoff.tzinfo is None else kickoff.astimezone(timezone.utc)
+    if tz:
+        try:
+            return f";TZID={tz}:{utc.astimezone(ZoneInfo(tz)):%Y%m%dT%H%M%S}"
+        except (ZoneInfoNotFoundError, ValueError):
+            pass
+    return f":{utc:%Y%m%dT%H%M%SZ}"
+
+
+def render(name: str, matches: list[Match], stamp: datetime) -> bytes:
+    lines = [
+        "BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//SportsHub//Fixtures//EN",
+        "CALSCALE:GREGORIAN", "METHOD:PUBLISH", f"X-WR-CALNAME:{_escape(name)}",
+    ]
+    for m in matches:
+        tz = m.venue.tz if m.venue else None
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:match-{m.id}@sportshub",
+            f"DTSTAMP:{stamp:%Y%m%dT%H%M%SZ}",
+            f"DTSTART{_dt(m.kickoff, tz)}",
+            f"DTEND{_dt(m.kickoff + MATCH_DURATION, tz)}",
+            f"SUMMARY:{_escape(f'{m.homeTeam.name} vs {m.awayTeam.name}')}",
+            f"STATUS:{STATUS.get(m.status, 'CONFIRMED')}",
+        ]
+        if m.venue:
+            lines.append(f"LOCATION:{_escape(m.venue.name)}")
+        if m.round:
+            lines.append(f"DESCRIPTION:{_escape(m.round)}")
+        lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(_fold(l) for l in lines) + "\r\n").encode()
+
+
+class FeedCache:
+    """Rendered .ics feeds; a match change only drops the feeds that contain it."""
+
+    def __init__(self):
+        self._feeds: dict[tuple[str, int], Feed] = {}
+        self._by_match: dict[int, set[tuple[str, int]]] = {}
+        # survives invalidation, so a regenerated but identical feed keeps its Last-Modified
+        self._stamps: dict[tuple[str, int], tuple[str, datetime]] = {}
+        self._locks: dict[tuple[str, int], asyncio.Lock] = {}
+        # feed key -> whether a change arrived while its build was reading
+        self._building: dict[tuple[str, int], bool] = {}
+
+    async def get(self, db: AsyncSession, kind: str, id: int) -> Feed:
+        key = (kind, id)
+        feed = self._feeds.get(key)
+        if feed is not None:
+            return feed
+        # checked before taking a lock, so ids that don't exist can't grow _locks
+        if await db.get(SOURCES[kind], id) is None:
+            raise HTTPException(status_code=404, detail=f"{SOURCES[kind].__name__} not found")
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            if key in self._feeds:
+                return self._feeds[key]
+            for _ in range(BUILD_ATTEMPTS):
+                self._building[key] = False
+                try:
+                    feed = await self._build(db, kind, id)
+                    stale = self._building[key]
+                finally:
+                    del self._building[key]
+                if not stale:
+                    self._feeds[key] = feed
+                    break
+            return feed
+
+    async def _build(self, db: AsyncSession, kind: str, id: int) -> Feed:
+        source = await db.get(SOURCES[kind], id)
+        if source is None:
+            raise HTTPException(status_code=404, detail=f"{SOURCES[kind].__name__} not found")
+        q = select(Match).options(
+            selectinload(Match.venue), selectinload(Match.homeTeam), selectinload(Match.awayTeam),
+        ).order_by(Match.kickoff, Match.id)
+        if kind == "team":
+            q = q.where(or_(Match.home_team_id == id, Match.away_team_id == id))
+        elif kind == "venue":
+            q = q.where(Match.venue_id == id)
+        else:
+            q = q.where(Match.season_id == id)
+        matches = list((await db.execute(q)).scalars().all())
+        name = getattr(source, "name", None) or getattr(source, "slug", str(id))
+
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        body = render(f"{name} fixtures", matches, now)
+        # DTSTAMP changes on every render; leave it out so unchanged feeds keep their tag
+        stable = b"\r\n".join(l for l in body.split(b"\r\n") if not l.startswith(b"DTSTAMP"))
+        etag = hashlib.sha256(stable).hexdigest()[:20]
+        for m in matches:
+            self._by_match.setdefault(m.id, set()).add((kind, id))
+        old_etag, modified = self._stamps.get((kind, id), (None, now))
+        if old_etag != etag:
+            modified = now
+        self._stamps[(kind, id)] = (etag, modified)
+        return Feed(body, etag, modified)
+
+    def _drop(self, key):
+        self._feeds.pop(key, None)
+
+    def _spoil_builds(self):
+        # a build in flight can't tell which of its matches a change moved; don't cache any of them
+        self._building = dict.fromkeys(self._building, True)
+
+    def on_matches(self, changes: list[Change]):
+        for c in changes:
+            if c.op == "update" and c.fields is not None and not (c.fields & FEED_FIELDS):
+                continue
+            self._spoil_builds()
+            keys = self._by_match.pop(c.id, set())
+            if c.obj is not None:
+                keys |= {("team", c.obj.home_team_id), ("team", c.obj.away_team_id),
+                         ("venue", c.obj.venue_id), ("season", c.obj.season_id)}
+            else:
+                keys = set(self._feeds)
+            for key in keys:
+                self._drop(key)
+
+    def on_names(self, changes: list[Change]):
+        if all(c.op == "create" for c in changes):
+            return
+        for c in changes:
+            if c.op == "delete":
+                self._locks.pop((c.entity.lower(), c.id), None)
+        # team / venue / season renames and tz moves touch many feeds; they are rare, so start over
+        self.clear()
+
+    def clear(self):
+        self._feeds.clear()
+        self._by_match.clear()
+        self._spoil_builds()
+
+
+def respond(request: Request, feed: Feed) -> Response:
+    headers = {
+        "ETag": f'"{feed.etag}"',
+        "Last-Modified": format_datetime(feed.lastModified, usegmt=True),
+        "Cache-Control": "public, max-age=300",
+    }
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        tags = {t.strip().removeprefix("W/") for t in inm.split(",")}
+        if f'"{feed.etag}"' in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+    else:
+        ims = request.headers.get("if-modified-since")
+        if ims:
+            try:
+                if feed.lastModified <= parsedate_to_datetime(ims):
+                    return Response(status_code=304, headers=headers)
+            except (TypeError, ValueError):
+                pass
+    return Response(feed.body, media_type="text/calendar; charset=utf-8", headers=headers)
+
+
+cache = FeedCache()
+subscribe("Match")(cache.on_matches)
+subscribe("Team", "Venue", "Season")(cache.on_names)
+on_resync(cache.clear)
@@ -0,0 +1,140 @@
+from __future__ import annotations
+import asyncio
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException, Response
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .db import async_session
+from .models import IdempotencyKey
+
+log = logging.getLogger(__name__)
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+MAX_KEY_LENGTH = 255
+
+_tasks: set[asyncio.Task] = set()
+
+
+@dataclass(frozen=True)
+class Stored:
+    fingerprint: str
+    status: int
+    body: bytes
+    createdAt: datetime
+
+
+class IdempotencyStore:
+    """Replays the first response to a create for every repeat of its Idempotency-Key.
+
+    The key row is inserted in the same transaction as the created row, so
+    the two commit together. A concurrent duplicate on this worker waits for
+    the in-flight request; one on another worker fails the key's primary key,
+    rolls back and replays the winner's response. Repeats hitting the LRU
+    don't touch the database at all.
+    """
+
+    def __init__(self, size: int = IDEMPOTENCY_CACHE_SIZE):
+        self.size = size
+        self._lru: OrderedDict[str, Stored] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._last_purge: datetime | None = None
+
+    def _remember(self, k: str, stored: Stored):
+        self._lru[k] = stored
+        self._lru.move_to_end(k)
+        while len(self._lru) > self.size:
+            self._lru.popitem(last=False)
+
+    def _cached(self, k: str) -> Stored | None:
+        stored = self._lru.get(k)
+        if stored is not None and stored.createdAt < datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_TTL_SECONDS):
+            del self._lru[k]
+            return None
+        return stored
+
+    async def create(self, res, db: AsyncSession, payload, key: str) -> Response:
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+        k = f"{res.name}:{key}"
+        fingerprint = hashlib.sha256(payload.model_dump_json().encode()).hexdigest()
+
+        stored = self._cached(k)
+        if stored is not None:
+            return _replay(stored, fingerprint, replayed=True)
+        fut = self._inflight.get(k)
+        if fut is not None:
+            return _replay(await asyncio.shield(fut), fingerprint, replayed=True)
+
+        fut = self._inflight[k] = asyncio.get_running_loop().create_future()
+        try:
+            stored, replayed = await self._create(res, db, payload, k, fingerprint)
+            fut.set_result(stored)
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # waiters re-raise it; don't warn when there are none
+            raise
+        finally:
+            del self._inflight[k]
+        self._remember(k, stored)
+        self._maybe_purge()
+        return _replay(stored, fingerprint, replayed)
+
+    async def _create(self, res, db: AsyncSession, payload, k: str, fingerprint: str) -> tuple[Stored, bool]:
+        for _ in range(2):
+            made: list[Stored] = []
+
+            def record(obj):
+                stored = Stored(fingerprint, 201, res.schema.model_validate(obj).model_dump_json().encode(), datetime.utcnow())
+                db.add(IdempotencyKey(id=k, fingerprint=fingerprint, statusCode=stored.status,
+                                      body=stored.body.decode(), createdAt=stored.createdAt))
+                made.append(stored)
+
+            try:
+                await res.crud.create(db, payload, before_commit=record)
+                return made[0], False
+            except HTTPException as e:
+                if e.status_code != 400:
+                    raise
+                row = await db.get(IdempotencyKey, k)
+                if row is None:
+                    raise
+                if row.createdAt >= datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_TTL_SECONDS):
+                    return Stored(row.fingerprint, row.statusCode, row.body.encode(), row.createdAt), True
+                # an expired key that the purge hasn't reached yet: clear it and try once more
+                await db.delete(row)
+                await db.commit()
+        raise HTTPException(status_code=409, detail="Idempotency-Key conflict")
+
+    def _maybe_purge(self):
+        now = datetime.utcnow()
+        if self._last_purge is None or now - self._last_purge > timedelta(hours=1):
+            self._last_purge = now
+            task = asyncio.create_task(self._purge(now - timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)))
+            _tasks.add(task)  # the loop keeps only a weak reference
+            task.add_done_callback(_tasks.discard)
+
+    async def _purge(self, cutoff: datetime):
+        try:
+            async with async_session() as db:
+                await db.execute(delete(IdempotencyKey).where(IdempotencyKey.createdAt < cutoff))
+                await db.commit()
+        except Exception:
+            log.exception("idempotency key purge failed")
+
+
+def _replay(stored: Stored, fingerprint: str, replayed: bool) -> Response:
+    if stored.fingerprint != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request body")
+    headers = {"Idempotent-Replayed": "true"} if replayed else {}
+    return Response(stored.body, status_code=stored.status, media_type="application/json", headers=headers)
+
+
+store = IdempotencyStore()
@@ -0,0 +1,22 @@
+# Generated by codegen.py from sports_adda_jdl.txt -- do not edit by hand.
+# Importing this module attaches the indexes to the model tables, so
+# Base.metadata.create_all() builds them.
+from sqlalchemy import Index
+
+from .models import AffiliatePartner, AlertSubscription, EmailSubscriber, Match, OutboundClick, Page, Stage
+
+Index("ix_stages_type", Stage.type)
+
+Index("ix_matches_status", Match.status)
+Index("ix_matches_kickoff_id", Match.kickoff, Match.id)
+
+Index("ix_pages_status", Page.status)
+
+Index("ix_affiliate_partners_kind", AffiliatePartner.kind)
+
+Index("ix_outbound_clicks_created_at_id", OutboundClick.createdAt, OutboundClick.id)
+
+Index("ix_email_subscribers_created_at_id", EmailSubscriber.createdAt, EmailSubscriber.id)
+
+Index("ix_alert_subscriptions_topic_type", AlertSubscription.topicType)
+Index("ix_alert_subscriptions_created_at_id", AlertSubscription.createdAt, AlertSubscription.id)
@@ -0,0 +1,73 @@
+from __future__ import annotations
+import asyncio
+import os
+from typing import Any
+
+from sqlalchemy import select
+
+from .db import async_session
+
+LOADER_WINDOW_MS = float(os.getenv("LOADER_WINDOW_MS", "2"))
+LOADER_MAX_BATCH = int(os.getenv("LOADER_MAX_BATCH", "500"))
+
+
+class DataLoader:
+    """Coalesces concurrent by-id lookups of one model into a single `id IN (...)` query.
+
+    Lookups arriving within LOADER_WINDOW_MS of the first one -- from any
+    request -- share a query, run in a session of its own. The returned
+    objects are detached, so they are only suitable for reads; write paths
+    must load through their own session.
+    """
+
+    def __init__(self, model, window: float = LOADER_WINDOW_MS / 1000, max_batch: int = LOADER_MAX_BATCH):
+        self.model = model
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: dict[int, asyncio.Future] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self.batches = self.loads = 0
+
+    def load(self, id: int) -> asyncio.Future:
+        self.loads += 1
+        fut = self._pending.get(id)
+        if fut is None:
+            loop = asyncio.get_running_loop()
+            fut = self._pending[id] = loop.create_future()
+            if len(self._pending) >= self.max_batch:
+                self._dispatch()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._dispatch)
+        return fut
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            self.batches += 1
+            asyncio.create_task(self._fetch(batch))
+
+    async def _fetch(self, batch: dict[int, asyncio.Future]):
+        try:
+            async with async_session() as db:
+                rows = (await db.execute(select(self.model).where(self.model.id.in_(list(batch))))).scalars().all()
+        except Exception as e:
+            for fut in batch.values():
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        found = {obj.id: obj for obj in rows}
+        for id, fut in batch.items():
+            if not fut.done():
+                fut.set_result(found.get(id))
+
+
+_loaders: dict[Any, DataLoader] = {}
+
+
+def loader(model) -> DataLoader:
+    if model not in _loaders:
+        _loaders[model] = DataLoader(model)
+    return _loaders[model]
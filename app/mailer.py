@@ -0,0 +1,256 @@
+from __future__ import annotations
+import asyncio
+import logging
+import os
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+import aiosmtplib
+from sqlalchemy import select, update, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .db import async_session
+from .models import EmailOutbox, OutboxStatus
+
+log = logging.getLogger(__name__)
+
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "25"))
+SMTP_USER = os.getenv("SMTP_USER")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "false").lower() == "true"
+MAIL_FROM = os.getenv("MAIL_FROM", "no-reply@sportshub.local")
+
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "1"))  # per process; 0 leaves sending to other processes
+OUTBOX_BATCH = int(os.getenv("OUTBOX_BATCH", "50"))
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "8"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "2"))
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+OUTBOX_BACKOFF_SECONDS = int(os.getenv("OUTBOX_BACKOFF_SECONDS", "30"))
+# caps one SMTP exchange; keep it well under the lease so a send can't outlive it
+OUTBOX_SEND_TIMEOUT = float(os.getenv("OUTBOX_SEND_TIMEOUT", "30"))
+
+
+LEASE_LOST = "lease lost"  # _send's result for a row it no longer holds: left for whoever holds it now
+
+
+def _now() -> datetime:
+    return datetime.utcnow()
+
+
+async def enqueue(db: AsyncSession, to: str, subject: str, body: str, subscriber_id: int | None = None) -> EmailOutbox:
+    """Add a message to the outbox; it is sent once the caller's transaction commits."""
+    now = _now()
+    msg = EmailOutbox(
+        toAddress=to, subject=subject, body=body, subscriber_id=subscriber_id,
+        status=OutboxStatus.PENDING, attempts=0, nextAttemptAt=now, createdAt=now,
+    )
+    db.add(msg)
+    return msg
+
+
+class SMTPPool:
+    """Keeps up to `size` SMTP connections open and hands them out one at a time."""
+
+    def __init__(self, size: int):
+        self._sem = asyncio.Semaphore(size)
+        self._idle: list[aiosmtplib.SMTP] = []
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(hostname=SMTP_HOST, port=SMTP_PORT, start_tls=SMTP_STARTTLS,
+                                 timeout=OUTBOX_SEND_TIMEOUT)
+        await client.connect()
+        if SMTP_USER:
+            await client.login(SMTP_USER, SMTP_PASSWORD or "")
+        return client
+
+    @asynccontextmanager
+    async def connection(self):
+        async with self._sem:
+            client = None
+            while self._idle and client is None:
+                c = self._idle.pop()
+                if c.is_connected:
+                    client = c
+            if client is None:
+                client = await self._connect()
+            try:
+                yield client
+            except (aiosmtplib.SMTPResponseException, aiosmtplib.SMTPRecipientsRefused) as e:
+                # the server refused this message, and aiosmtplib reset the envelope: the
+                # session stays usable unless the server is closing it (421) or has gone
+                if getattr(e, "code", None) == 421 or not client.is_connected:
+                    client.close()
+                else:
+                    self._idle.append(client)
+                raise
+            except BaseException:
+                client.close()
+                raise
+            self._idle.append(client)
+
+    async def close(self):
+        while self._idle:
+            c = self._idle.pop()
+            try:
+                await c.quit()
+            except aiosmtplib.SMTPException:
+                c.close()
+
+
+class OutboxDispatcher:
+    """Claims due outbox rows with SKIP LOCKED and sends them over a shared SMTP pool.
+
+    Claimed rows are moved to SENDING with a lease (lockedUntil, lockedBy)
+    before anything is sent, so any number of dispatchers (in-process or in
+    other pods) can run side by side. Rows whose lease expired (a crashed
+    worker) become claimable again. The lease is renewed while a batch is
+    sending, a row whose lease this dispatcher no longer holds is not sent,
+    and results are only recorded on rows it still holds.
+    """
+
+    def __init__(self, pool: SMTPPool, batch: int = OUTBOX_BATCH):
+        self.pool = pool
+        self.batch = batch
+        self.id = uuid.uuid4().hex
+        self._held: dict[int, datetime] = {}  # claimed row id -> lease expiry
+        self._stopping = asyncio.Event()
+
+    async def claim(self) -> list[EmailOutbox]:
+        now = _now()
+        due = or_(
+            and_(EmailOutbox.status == OutboxStatus.PENDING, EmailOutbox.nextAttemptAt <= now),
+            and_(EmailOutbox.status == OutboxStatus.SENDING, EmailOutbox.lockedUntil < now),
+        )
+        ids = (select(EmailOutbox.id).where(due).order_by(EmailOutbox.nextAttemptAt).limit(self.batch)
+               .with_for_update(skip_locked=True).scalar_subquery())
+        until = now + timedelta(seconds=OUTBOX_LEASE_SECONDS)
+        async with async_session() as db:
+            # `due` is repeated so a row claimed meanwhile (no row locks on SQLite) is not taken twice
+            res = await db.execute(
+                update(EmailOutbox).where(EmailOutbox.id.in_(ids), due)
+                .values(status=OutboxStatus.SENDING, lockedUntil=until, lockedBy=self.id)
+                .returning(EmailOutbox).execution_options(synchronize_session=False)
+            )
+            rows = list(res.scalars().all())
+            await db.commit()
+        self._held = {row.id: until for row in rows}
+        return rows
+
+    async def _renew(self):
+        """Extend the lease on the rows still being sent, every third of a lease."""
+        while self._held:
+            await asyncio.sleep(OUTBOX_LEASE_SECONDS / 3)
+            until = _now() + timedelta(seconds=OUTBOX_LEASE_SECONDS)
+            async with async_session() as db:
+                kept = set((await db.execute(
+                    update(EmailOutbox)
+                    .where(EmailOutbox.id.in_(list(self._held)), EmailOutbox.lockedBy == self.id,
+                           EmailOutbox.status == OutboxStatus.SENDING)
+                    .values(lockedUntil=until).returning(EmailOutbox.id)
+                )).scalars())
+                await db.commit()
+            self._held = {id: until for id in self._held if id in kept}
+
+    def _holds(self, row: EmailOutbox) -> bool:
+        until = self._held.get(row.id)
+        return until is not None and _now() < until
+
+    async def _send(self, row: EmailOutbox) -> str | None:
+        if not self._holds(row):
+            return LEASE_LOST
+        msg = EmailMessage()
+        msg["From"] = MAIL_FROM
+        msg["To"] = row.toAddress
+        msg["Subject"] = row.subject
+        msg.set_content(row.body)
+        try:
+            async with self.pool.connection() as client:
+                await client.send_message(msg)
+        except (aiosmtplib.SMTPException, OSError) as e:
+            return str(e) or e.__class__.__name__
+        finally:
+            self._held.pop(row.id, None)
+        return None
+
+    async def _record(self, results: list[tuple[EmailOutbox, str | None]]):
+        now = _now()
+        errors = {row.id: error for row, error in results if error is not LEASE_LOST}
+        async with async_session() as db:
+            # only rows this dispatcher still holds; the others were taken over after their lease lapsed
+            held = (await db.execute(
+                select(EmailOutbox).where(EmailOutbox.id.in_(list(errors)), EmailOutbox.lockedBy == self.id,
+                                          EmailOutbox.status == OutboxStatus.SENDING).with_for_update()
+            )).scalars().all()
+            for obj in held:
+                error = errors[obj.id]
+                obj.lockedUntil = obj.lockedBy = None
+                obj.attempts += 1
+                if error is None:
+                    obj.status = OutboxStatus.SENT
+                    obj.sentAt = now
+                    obj.lastError = None
+                elif obj.attempts >= OUTBOX_MAX_ATTEMPTS:
+                    obj.status = OutboxStatus.FAILED
+                    obj.lastError = error
+                else:
+                    obj.status = OutboxStatus.PENDING
+                    obj.lastError = error
+                    obj.nextAttemptAt = now + timedelta(seconds=OUTBOX_BACKOFF_SECONDS * 2 ** (obj.attempts - 1))
+            await db.commit()
+
+    async def run_once(self) -> int:
+        rows = await self.claim()
+        if rows:
+            renew = asyncio.create_task(self._renew())
+            try:
+                errors = await asyncio.gather(*(self._send(r) for r in rows))
+            finally:
+                self._held = {}
+                renew.cancel()
+            await self._record(list(zip(rows, errors)))
+        return len(rows)
+
+    async def run(self):
+        while not self._stopping.is_set():
+            try:
+                sent = await self.run_once()
+            except Exception:
+                log.exception("outbox dispatch failed")
+                sent = 0
+            if sent < self.batch:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), OUTBOX_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+
+    def stop(self):
+        self._stopping.set()
+
+
+_pool: SMTPPool | None = None
+_workers: list[tuple[OutboxDispatcher, asyncio.Task]] = []
+
+
+async def start(workers: int = OUTBOX_WORKERS):
+    global _pool
+    if workers <= 0:
+        return
+    _pool = SMTPPool(OUTBOX_CONCURRENCY)
+    for _ in range(workers):
+        d = OutboxDispatcher(_pool)
+        _workers.append((d, asyncio.create_task(d.run())))
+
+
+async def stop():
+    global _pool
+    for d, _ in _workers:
+        d.stop()
+    await asyncio.gather(*(t for _, t in _workers), return_exceptions=True)
+    _workers.clear()
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
@@ -1,20 +1,30 @@
 from fastapi import FastAPI
-from .db import lifespan
+from .db import EDGE, lifespan
+from .compression import CompressionMiddleware
+from .edge import ReadOnlyMiddleware
+from .profiling import ProfilingMiddleware
+from .querylog import QueryLogMiddleware
 from .routers import api
 from .routers import (
     cities, venues, competitions, seasons, stages, teams, matches,
     pages, page_blocks, affiliate_partners, affiliate_offers,
-    outbound_clicks, email_subscribers, alert_subscriptions
+    outbound_clicks, email_subscribers, alert_subscriptions, changes, admin, sitemap, segments, purge_jobs
 )
 
 app = FastAPI(title="SportsHub API", version="1.0.0", lifespan=lifespan)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(QueryLogMiddleware)
+app.add_middleware(CompressionMiddleware)
+if EDGE:
+    app.add_middleware(ReadOnlyMiddleware)
 
 # mount routers
 for r in [
     cities.router, venues.router, competitions.router, seasons.router, stages.router,
     teams.router, matches.router, pages.router, page_blocks.router,
     affiliate_partners.router, affiliate_offers.router, outbound_clicks.router,
-    email_subscribers.router, alert_subscriptions.router,
+    email_subscribers.router, alert_subscriptions.router, changes.router,
+    admin.router, sitemap.router, segments.router, purge_jobs.router,
 ]:
     app.include_router(r)
 
@@ -1,6 +1,6 @@
 from __future__ import annotations
 from datetime import datetime
-from sqlalchemy import String, Integer, Float, Text, Boolean, Enum, UniqueConstraint, ForeignKey, Index
+from sqlalchemy import String, Integer, BigInteger, Float, Text, Boolean, Enum, UniqueConstraint, ForeignKey, Identity, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from .db import Base
 import enum
@@ -33,6 +33,12 @@ class TopicType(enum.Enum):
     CITY = "CITY"
     COMPETITION = "COMPETITION"
 
+class OutboxStatus(enum.Enum):
+    PENDING = "PENDING"
+    SENDING = "SENDING"
+    SENT = "SENT"
+    FAILED = "FAILED"
+
 # ===== Core locations =====
 class City(Base):
     __tablename__ = "cities"
@@ -45,7 +51,7 @@ class City(Base):
     lat: Mapped[float | None] = mapped_column(Float)
     lng: Mapped[float | None] = mapped_column(Float)
 
-    venues: Mapped[list["Venue"]] = relationship(back_populates="city", cascade="all,delete-orphan")
+    venues: Mapped[list["Venue"]] = relationship(back_populates="city", cascade="all,delete-orphan", passive_deletes=True)
 
 class Venue(Base):
     __tablename__ = "venues"
@@ -57,7 +63,7 @@ class Venue(Base):
     lat: Mapped[float | None] = mapped_column(Float)
     lng: Mapped[float | None] = mapped_column(Float)
 
-    city_id: Mapped[int] = mapped_column(ForeignKey("cities.id", ondelete="RESTRICT"), nullable=False, index=True)
+    city_id: Mapped[int] = mapped_column(ForeignKey("cities.id", ondelete="CASCADE"), nullable=False, index=True)
     city: Mapped[City] = relationship(back_populates="venues")
 
     matches: Mapped[list["Match"]] = relationship(back_populates="venue")
@@ -72,7 +78,7 @@ class Competition(Base):
     region: Mapped[str | None] = mapped_column(String)
     slug: Mapped[str] = mapped_column(String, nullable=False, unique=True, index=True)
 
-    seasons: Mapped[list["Season"]] = relationship(back_populates="competition", cascade="all,delete-orphan")
+    seasons: Mapped[list["Season"]] = relationship(back_populates="competition", cascade="all,delete-orphan", passive_deletes=True)
 
 class Season(Base):
     __tablename__ = "seasons"
@@ -81,10 +87,10 @@ class Season(Base):
     yearEnd: Mapped[int] = mapped_column(Integer, nullable=False)
     slug: Mapped[str] = mapped_column(String, nullable=False, unique=True, index=True)
 
-    competition_id: Mapped[int] = mapped_column(ForeignKey("competitions.id", ondelete="RESTRICT"), nullable=False, index=True)
+    competition_id: Mapped[int] = mapped_column(ForeignKey("competitions.id", ondelete="CASCADE"), nullable=False, index=True)
     competition: Mapped[Competition] = relationship(back_populates="seasons")
 
-    stages: Mapped[list["Stage"]] = relationship(back_populates="season", cascade="all,delete-orphan")
+    stages: Mapped[list["Stage"]] = relationship(back_populates="season", cascade="all,delete-orphan", passive_deletes=True)
     matches: Mapped[list["Match"]] = relationship(back_populates="season")
 
 class Stage(Base):
@@ -94,7 +100,7 @@ class Stage(Base):
     type: Mapped[StageType] = mapped_column(Enum(StageType), nullable=False)
     sortOrder: Mapped[int | None] = mapped_column(Integer)
 
-    season_id: Mapped[int] = mapped_column(ForeignKey("seasons.id", ondelete="RESTRICT"), nullable=False, index=True)
+    season_id: Mapped[int] = mapped_column(ForeignKey("seasons.id", ondelete="CASCADE"), nullable=False, index=True)
     season: Mapped[Season] = relationship(back_populates="stages")
 
     matches: Mapped[list["Match"]] = relationship(back_populates="stage")
@@ -120,6 +126,7 @@ class Match(Base):
     scoreAway: Mapped[int | None] = mapped_column(Integer)
     pensHome: Mapped[int | None] = mapped_column(Integer)
     pensAway: Mapped[int | None] = mapped_column(Integer)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
 
     season_id: Mapped[int] = mapped_column(ForeignKey("seasons.id", ondelete="RESTRICT"), nullable=False, index=True)
     stage_id: Mapped[int | None] = mapped_column(ForeignKey("stages.id", ondelete="SET NULL"), index=True)
@@ -143,7 +150,7 @@ class Page(Base):
     meta: Mapped[str | None] = mapped_column(Text)
     publishedAt: Mapped[datetime | None] = mapped_column()
 
-    blocks: Mapped[list["PageBlock"]] = relationship(back_populates="page", cascade="all,delete-orphan")
+    blocks: Mapped[list["PageBlock"]] = relationship(back_populates="page", cascade="all,delete-orphan", passive_deletes=True)
 
 class PageBlock(Base):
     __tablename__ = "page_blocks"
@@ -165,7 +172,7 @@ class AffiliatePartner(Base):
     geoRules: Mapped[str | None] = mapped_column(Text)
     active: Mapped[bool] = mapped_column(Boolean, nullable=False, default=True)
 
-    offers: Mapped[list["AffiliateOffer"]] = relationship(back_populates="partner", cascade="all,delete-orphan")
+    offers: Mapped[list["AffiliateOffer"]] = relationship(back_populates="partner", cascade="all,delete-orphan", passive_deletes=True)
 
 class AffiliateOffer(Base):
     __tablename__ = "affiliate_offers"
@@ -175,24 +182,31 @@ class AffiliateOffer(Base):
     params: Mapped[str | None] = mapped_column(Text)
     active: Mapped[bool] = mapped_column(Boolean, nullable=False, default=True)
 
-    partner_id: Mapped[int] = mapped_column(ForeignKey("affiliate_partners.id", ondelete="RESTRICT"), nullable=False, index=True)
+    partner_id: Mapped[int] = mapped_column(ForeignKey("affiliate_partners.id", ondelete="CASCADE"), nullable=False, index=True)
     partner: Mapped[AffiliatePartner] = relationship(back_populates="offers")
 
-    clicks: Mapped[list["OutboundClick"]] = relationship(back_populates="offer", cascade="all,delete-orphan")
+    clicks: Mapped[list["OutboundClick"]] = relationship(back_populates="offer", cascade="all,delete-orphan", passive_deletes=True)
 
 class OutboundClick(Base):
+    # Range-partitioned by month on createdAt (see app/partitions.py). Postgres
+    # needs the partition key in the primary key, so the table PK is
+    # (id, createdAt) while the ORM keeps identifying rows by id alone. The id
+    # comes from an identity column; SQLite has none, so there it must be given.
     __tablename__ = "outbound_clicks"
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    id: Mapped[int] = mapped_column(Integer, Identity(), primary_key=True)
     targetUrl: Mapped[str] = mapped_column(String, nullable=False)
     utm: Mapped[str | None] = mapped_column(Text)
     ip: Mapped[str | None] = mapped_column(String)
     country: Mapped[str | None] = mapped_column(String)
     userAgent: Mapped[str | None] = mapped_column(String)
-    createdAt: Mapped[datetime] = mapped_column(nullable=False)
+    createdAt: Mapped[datetime] = mapped_column(primary_key=True, nullable=False)
 
     offer_id: Mapped[int] = mapped_column(ForeignKey("affiliate_offers.id", ondelete="CASCADE"), nullable=False, index=True)
     offer: Mapped[AffiliateOffer] = relationship(back_populates="clicks")
 
+    __table_args__ = {"postgresql_partition_by": 'RANGE ("createdAt")'}
+    __mapper_args__ = {"primary_key": [id]}
+
 # ===== Email subscribers & alerts =====
 class EmailSubscriber(Base):
     __tablename__ = "email_subscribers"
@@ -204,7 +218,7 @@ class EmailSubscriber(Base):
     createdAt: Mapped[datetime] = mapped_column(nullable=False)
     unsubscribedAt: Mapped[datetime | None] = mapped_column()
 
-    subscriptions: Mapped[list["AlertSubscription"]] = relationship(back_populates="subscriber", cascade="all,delete-orphan")
+    subscriptions: Mapped[list["AlertSubscription"]] = relationship(back_populates="subscriber", cascade="all,delete-orphan", passive_deletes=True)
 
 class AlertSubscription(Base):
     __tablename__ = "alert_subscriptions"
@@ -216,3 +230,71 @@ class AlertSubscription(Base):
 
     subscriber_id: Mapped[int] = mapped_column(ForeignKey("email_subscribers.id", ondelete="CASCADE"), nullable=False, index=True)
     subscriber: Mapped[EmailSubscriber] = relationship(back_populates="subscriptions")
+
+# ===== Email delivery =====
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    toAddress: Mapped[str] = mapped_column(String, nullable=False)
+    subject: Mapped[str] = mapped_column(String, nullable=False)
+    body: Mapped[str] = mapped_column(Text, nullable=False)
+    status: Mapped[OutboxStatus] = mapped_column(Enum(OutboxStatus), nullable=False, default=OutboxStatus.PENDING)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    nextAttemptAt: Mapped[datetime] = mapped_column(nullable=False)
+    lockedUntil: Mapped[datetime | None] = mapped_column()
+    lockedBy: Mapped[str | None] = mapped_column(String)  # dispatcher holding the lease
+    lastError: Mapped[str | None] = mapped_column(Text)
+    createdAt: Mapped[datetime] = mapped_column(nullable=False)
+    sentAt: Mapped[datetime | None] = mapped_column()
+
+    subscriber_id: Mapped[int | None] = mapped_column(ForeignKey("email_subscribers.id", ondelete="SET NULL"), index=True)
+
+    __table_args__ = (Index("ix_email_outbox_due", "status", "nextAttemptAt"),)
+
+# ===== Change feed =====
+class ChangeLog(Base):
+    # id doubles as the client sync token, so it must only ever grow
+    __tablename__ = "change_log"
+    id: Mapped[int] = mapped_column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    entity: Mapped[str] = mapped_column(String, nullable=False)
+    entity_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    op: Mapped[str] = mapped_column(String, nullable=False)
+    version: Mapped[int | None] = mapped_column(Integer)
+    createdAt: Mapped[datetime] = mapped_column(nullable=False)
+
+    __table_args__ = (
+        Index("ix_change_log_entity_id", "entity", "id"),
+        Index("ix_change_log_entity_row", "entity", "entity_id"),
+    )
+
+# ===== Idempotency =====
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    id: Mapped[str] = mapped_column(String, primary_key=True)  # "<resource>:<Idempotency-Key>"
+    fingerprint: Mapped[str] = mapped_column(String, nullable=False)
+    statusCode: Mapped[int] = mapped_column(Integer, nullable=False)
+    body: Mapped[str] = mapped_column(Text, nullable=False)
+    createdAt: Mapped[datetime] = mapped_column(nullable=False, index=True)
+
+# ===== Background purges =====
+class PurgeJob(Base):
+    __tablename__ = "purge_jobs"
+    id: Mapped[str] = mapped_column(String, primary_key=True)
+    entity: Mapped[str] = mapped_column(String, nullable=False)
+    entity_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    status: Mapped[str] = mapped_column(String, nullable=False)  # queued | running | done | failed
+    total: Mapped[int | None] = mapped_column(Integer)  # dependent rows counted at the start
+    deleted: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    error: Mapped[str | None] = mapped_column(Text)
+    createdAt: Mapped[datetime] = mapped_column(nullable=False)
+    updatedAt: Mapped[datetime] = mapped_column(nullable=False)
+    finishedAt: Mapped[datetime | None] = mapped_column()
+    owner: Mapped[str | None] = mapped_column(String)  # worker holding the lease; updatedAt is its heartbeat
+
+    __table_args__ = (
+        Index("ix_purge_jobs_entity_row", "entity", "entity_id"),
+        # at most one queued or running job per row
+        Index("uq_purge_jobs_active_row", "entity", "entity_id", unique=True,
+              postgresql_where=text("status IN ('queued', 'running')"),
+              sqlite_where=text("status IN ('queued', 'running')")),
+    )
@@ -0,0 +1,153 @@
+"""Cross-worker change notifications over Postgres LISTEN/NOTIFY.
+
+CRUD writes call `emit` inside their transaction, so the NOTIFY goes out when
+(and only if) the write commits. Every worker keeps one dedicated asyncpg
+connection LISTENing on the channel and republishes other workers' changes to
+its local `events` listeners. Those changes carry no `obj`, so listeners fall
+back to plain invalidation. After a dropped connection the notifications sent
+in the meantime are gone, so reconnecting triggers `events.resync()`.
+"""
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .db import DATABASE_URL, engine
+from .events import Change, publish, resync
+
+log = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = os.getenv("NOTIFY_CHANNEL", "sportshub_changes")
+NOTIFY_ENABLED = os.getenv("NOTIFY_ENABLED", "true").lower() == "true" and engine.dialect.name == "postgresql"
+NOTIFY_BACKOFF_MAX_SECONDS = float(os.getenv("NOTIFY_BACKOFF_MAX_SECONDS", "30"))
+NOTIFY_PING_SECONDS = float(os.getenv("NOTIFY_PING_SECONDS", "15"))
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+# NOTIFY payloads must stay under 8000 bytes
+MAX_PAYLOAD = 7500
+
+
+async def emit(db: AsyncSession, entity: str, id: int, op: str, fields: frozenset[str] | None = None):
+    if not NOTIFY_ENABLED:
+        return
+    payload = json.dumps({"w": WORKER_ID, "e": entity, "i": id, "o": op,
+                          "f": sorted(fields) if fields is not None else None})
+    await db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": NOTIFY_CHANNEL, "payload": payload})
+
+
+async def emit_many(db: AsyncSession, entity: str, op: str, items: list[tuple[int, frozenset[str] | None]]):
+    """One write's worth of `op` changes, packed into as few notifications as fit, sent by a single statement."""
+    if not NOTIFY_ENABLED or not items:
+        return
+    payloads, batch, size = [], [], 0
+    for id, fields in items:
+        entry = [id, sorted(fields) if fields is not None else None]
+        n = len(json.dumps(entry)) + 1
+        if batch and size + n > MAX_PAYLOAD:
+            payloads.append(json.dumps({"w": WORKER_ID, "e": entity, "o": op, "b": batch}))
+            batch, size = [], 0
+        batch.append(entry)
+        size += n
+    payloads.append(json.dumps({"w": WORKER_ID, "e": entity, "o": op, "b": batch}))
+    await db.execute(text("SELECT pg_notify(:channel, p) FROM unnest(CAST(:payloads AS text[])) AS p"),
+                     {"channel": NOTIFY_CHANNEL, "payloads": payloads})
+
+
+def _dsn() -> str:
+    # asyncpg wants a plain libpq URL, not the SQLAlchemy dialect form
+    return DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+class Listener:
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+        self._lost: asyncio.Event | None = None
+        self._gap = False
+        self.connected = False
+
+    def _on_notify(self, conn, pid, channel, payload: str):
+        try:
+            msg = json.loads(payload)
+        except ValueError:
+            log.warning("ignoring malformed change notification: %r", payload)
+            return
+        if msg.get("w") == WORKER_ID:
+            return  # already published locally, with the object attached
+        if "b" in msg:
+            # a batch from emit_many: republish it as one batch too
+            publish([Change(msg["e"], id, msg["o"], frozenset(f) if f is not None else None) for id, f in msg["b"]])
+            return
+        fields = msg.get("f")
+        publish([Change(msg["e"], msg["i"], msg["o"], frozenset(fields) if fields is not None else None)])
+
+    def _on_terminate(self, conn):
+        self._lost.set()
+
+    async def _session(self):
+        """One LISTEN connection's lifetime; returns when it drops."""
+        conn = await asyncpg.connect(_dsn())
+        self._lost = asyncio.Event()
+        try:
+            conn.add_termination_listener(self._on_terminate)
+            await conn.add_listener(NOTIFY_CHANNEL, self._on_notify)
+            self.connected = True
+            if self._gap:
+                # anything sent while we weren't listening is lost, so drop all derived state
+                log.info("change notifications resumed; resyncing")
+                resync()
+                self._gap = False
+            while not self._lost.is_set():
+                try:
+                    await asyncio.wait_for(self._lost.wait(), NOTIFY_PING_SECONDS)
+                except asyncio.TimeoutError:
+                    # a half-open TCP connection never terminates on its own
+                    await asyncio.wait_for(conn.execute("SELECT 1"), NOTIFY_PING_SECONDS)
+        finally:
+            self.connected = False
+            await conn.close(timeout=5)
+
+    async def run(self):
+        delay = 0.5
+        while True:
+            try:
+                await self._session()
+                delay = 0.5
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("change notification connection failed; retrying in %.1fs", delay)
+            self._gap = True
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, NOTIFY_BACKOFF_MAX_SECONDS)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+listener = Listener()
+
+
+async def start():
+    if NOTIFY_ENABLED:
+        listener.start()
+
+
+async def stop():
+    await listener.stop()
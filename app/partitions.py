@@ -0,0 +1,296 @@
+"""Monthly partitions for outbound_clicks: creation, retention and archival.
+
+    python -m app.partitions maintain   # create upcoming partitions, archive + drop expired ones
+    python -m app.partitions migrate    # one-off: move a legacy heap table into the partitioned layout
+"""
+from __future__ import annotations
+import asyncio
+import csv
+import gzip
+import logging
+import os
+import re
+import sys
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pyarrow is optional; archives fall back to gzip CSV
+    pyarrow = None
+
+from .db import engine
+from .models import OutboundClick
+
+log = logging.getLogger(__name__)
+
+TABLE = OutboundClick.__tablename__
+DEFAULT = f"{TABLE}_default"
+PARTITION = re.compile(rf"^{TABLE}_p(\d{{4}})(\d{{2}})$")
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("CLICK_PARTITION_MONTHS_AHEAD", "3"))
+CLICK_RETENTION_MONTHS = int(os.getenv("CLICK_RETENTION_MONTHS", "13"))
+CLICK_ARCHIVE_DIR = os.getenv("CLICK_ARCHIVE_DIR", "./archive/outbound_clicks")
+PARTITION_MAINTENANCE_SECONDS = int(os.getenv("CLICK_PARTITION_MAINTENANCE_SECONDS", "86400"))
+ARCHIVE_BATCH = 10_000
+# session-level advisory lock held by whichever worker is maintaining the partitions
+MAINTENANCE_LOCK = "partitions.maintain"
+
+
+def _month(d: date, offset: int = 0) -> date:
+    m = d.year * 12 + d.month - 1 + offset
+    return date(m // 12, m % 12 + 1, 1)
+
+
+def _name(month: date) -> str:
+    return f"{TABLE}_p{month:%Y%m}"
+
+
+async def is_partitioned(conn: AsyncConnection) -> bool:
+    kind = await conn.scalar(text("SELECT relkind FROM pg_class WHERE relname = :t AND relkind IN ('p', 'r')"), {"t": TABLE})
+    return kind == "p"
+
+
+async def partitions(conn: AsyncConnection) -> dict[date, str]:
+    rows = await conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :t"
+    ), {"t": TABLE})
+    return _by_month(name for (name,) in rows)
+
+
+async def detached(conn: AsyncConnection) -> dict[date, str]:
+    """Month tables no longer attached: left behind by an expiry that failed after DETACH."""
+    rows = await conn.execute(text(
+        "SELECT c.relname FROM pg_class c WHERE c.relkind = 'r' AND c.relname LIKE :prefix "
+        "AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid)"
+    ), {"prefix": f"{TABLE}_p%"})
+    return _by_month(name for (name,) in rows)
+
+
+def _by_month(names) -> dict[date, str]:
+    out = {}
+    for name in names:
+        m = PARTITION.match(name)
+        if m:
+            out[date(int(m[1]), int(m[2]), 1)] = name
+    return out
+
+
+async def _create_partition(conn: AsyncConnection, start: date):
+    """Add the month's partition, first moving any of its rows out of the default partition.
+
+    Postgres refuses a partition whose range already has rows in DEFAULT
+    (clicks for a month that had no partition yet). Those are moved into a
+    plain table that is then attached, with DEFAULT locked against inserts
+    meanwhile so no new row of the month can land there before the attach.
+    """
+    name, end = _name(start), _month(start, 1)
+    bounds = f"FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    where = f""""createdAt" >= '{start.isoformat()}' AND "createdAt" < '{end.isoformat()}'"""
+    if not await conn.scalar(text(f'SELECT EXISTS (SELECT 1 FROM "{DEFAULT}" WHERE {where})')):
+        await conn.execute(text(f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{TABLE}" FOR VALUES {bounds}'))
+        return
+    await conn.execute(text(f'LOCK TABLE "{DEFAULT}" IN SHARE ROW EXCLUSIVE MODE'))
+    await conn.execute(text(f'CREATE TABLE "{name}" (LIKE "{TABLE}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    moved = (await conn.execute(text(
+        f'WITH moved AS (DELETE FROM "{DEFAULT}" WHERE {where} RETURNING *) INSERT INTO "{name}" SELECT * FROM moved'
+    ))).rowcount
+    await conn.execute(text(f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{name}" FOR VALUES {bounds}'))
+    log.info("moved %d rows from %s into %s", moved, DEFAULT, name)
+
+
+async def ensure_partitions(conn: AsyncConnection, today: date | None = None):
+    """Create the default partition plus one per month from last month to PARTITION_MONTHS_AHEAD,
+    and one for every month that has rows stranded in the default partition.
+
+    Each partition is added under its own savepoint: one that fails is logged
+    and retried on the next run without holding up the others.
+    """
+    today = today or date.today()
+    await conn.execute(text(f'CREATE TABLE IF NOT EXISTS "{DEFAULT}" PARTITION OF "{TABLE}" DEFAULT'))
+    months = {_month(today, offset) for offset in range(-1, PARTITION_MONTHS_AHEAD + 1)}
+    months |= set((await conn.execute(text(
+        f'SELECT DISTINCT date_trunc(\'month\', "createdAt")::date FROM "{DEFAULT}"'
+    ))).scalars())
+    existing = await partitions(conn)
+    for start in sorted(months - existing.keys()):
+        try:
+            async with conn.begin_nested():
+                await _create_partition(conn, start)
+        except Exception:
+            log.exception("could not create click partition %s", _name(start))
+
+
+async def _batches(conn: AsyncConnection, name: str, columns: list[str]):
+    select_list = ", ".join(f'"{c}"' for c in columns)
+    last = None
+    while True:
+        where = "WHERE id > :last" if last is not None else ""
+        rows = (await conn.execute(
+            text(f'SELECT {select_list} FROM "{name}" {where} ORDER BY id LIMIT {ARCHIVE_BATCH}'),
+            {"last": last},
+        )).all()
+        if not rows:
+            return
+        yield rows
+        last = rows[-1][0]
+
+
+def _arrow_schema():
+    types = {int: pyarrow.int64(), datetime: pyarrow.timestamp("us")}
+    return pyarrow.schema([
+        (c.name, types.get(c.type.python_type, pyarrow.string())) for c in OutboundClick.__table__.columns
+    ])
+
+
+async def archive(conn: AsyncConnection, name: str) -> str:
+    """Stream a detached partition to Parquet (or gzip CSV without pyarrow), keyset-paged by id."""
+    os.makedirs(CLICK_ARCHIVE_DIR, exist_ok=True)
+    columns = [c.name for c in OutboundClick.__table__.columns]
+    path = os.path.join(CLICK_ARCHIVE_DIR, f"{name}.parquet" if pyarrow else f"{name}.csv.gz")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if pyarrow is not None:
+        schema = _arrow_schema()
+        with pyarrow.parquet.ParquetWriter(tmp, schema, compression="zstd") as writer:
+            async for rows in _batches(conn, name, columns):
+                writer.write_table(pyarrow.Table.from_pylist([dict(zip(columns, r)) for r in rows], schema=schema))
+    else:
+        with gzip.open(tmp, "wt", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            async for rows in _batches(conn, name, columns):
+                writer.writerows(rows)
+    os.replace(tmp, path)
+    return path
+
+
+async def expire(conn: AsyncConnection, today: date | None = None) -> list[str]:
+    """Detach, archive and drop partitions older than CLICK_RETENTION_MONTHS.
+
+    A partition that fails is logged and skipped; if it was already detached,
+    the next run archives it from where it was left.
+    """
+    cutoff = _month(today or date.today(), -CLICK_RETENTION_MONTHS)
+    attached = {m: n for m, n in (await partitions(conn)).items() if m < cutoff}
+    left = {m: n for m, n in (await detached(conn)).items() if m < cutoff}
+    dropped = []
+    for month, name in sorted({**attached, **left}.items()):
+        try:
+            if name not in left.values():
+                await conn.execute(text(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"'))
+                await conn.commit()
+            path = await archive(conn, name)
+            await conn.execute(text(f'DROP TABLE "{name}"'))
+            await conn.commit()
+        except Exception:
+            await conn.rollback()
+            log.exception("could not expire click partition %s", name)
+            continue
+        log.info("archived %s to %s", name, path)
+        dropped.append(name)
+    return dropped
+
+
+@asynccontextmanager
+async def _maintenance():
+    """A connection holding MAINTENANCE_LOCK, or None while another worker holds it."""
+    async with engine.connect() as conn:
+        if not await conn.scalar(text("SELECT pg_try_advisory_lock(hashtext(:k))"), {"k": MAINTENANCE_LOCK}):
+            yield None
+            return
+        await conn.commit()
+        try:
+            yield conn
+        finally:
+            await conn.rollback()
+            await conn.execute(text("SELECT pg_advisory_unlock(hashtext(:k))"), {"k": MAINTENANCE_LOCK})
+            await conn.commit()
+
+
+async def maintain():
+    async with _maintenance() as conn:
+        if conn is None:
+            log.info("click partitions are being maintained by another worker")
+            return
+        if not await is_partitioned(conn):
+            log.warning("%s is not partitioned; run `python -m app.partitions migrate`", TABLE)
+            return
+        try:
+            await ensure_partitions(conn)
+            await conn.commit()
+        except Exception:
+            await conn.rollback()
+            log.exception("creating click partitions failed")
+        await expire(conn)  # retention runs even when new partitions can't be added
+
+
+async def migrate():
+    """Rename a legacy heap table aside, create the partitioned table and copy the rows over."""
+    async with engine.connect() as conn:
+        if await is_partitioned(conn):
+            return
+        legacy = f"{TABLE}_legacy"
+        await conn.execute(text(f'ALTER TABLE "{TABLE}" RENAME TO "{legacy}"'))
+        for ix in (await conn.execute(text("SELECT indexname FROM pg_indexes WHERE tablename = :t"), {"t": legacy})).scalars():
+            await conn.execute(text(f'ALTER INDEX "{ix}" RENAME TO "{ix}_legacy"'))
+        await conn.run_sync(lambda c: OutboundClick.__table__.create(c))
+        bounds = (await conn.execute(text(f'SELECT min("createdAt"), max("createdAt") FROM "{legacy}"'))).one()
+        await ensure_partitions(conn)
+        if bounds[0] is not None:
+            month = _month(bounds[0].date())
+            while month <= _month(bounds[1].date()):
+                await conn.execute(text(
+                    f'CREATE TABLE IF NOT EXISTS "{_name(month)}" PARTITION OF "{TABLE}" '
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_month(month, 1).isoformat()}')"
+                ))
+                month = _month(month, 1)
+        await conn.execute(text(f'INSERT INTO "{TABLE}" SELECT * FROM "{legacy}"'))
+        await conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('\"{TABLE}\"', 'id'), "
+            f'COALESCE((SELECT max(id) FROM "{TABLE}"), 1))'
+        ))
+        await conn.execute(text(f'DROP TABLE "{legacy}"'))
+        await conn.commit()
+
+
+_task: asyncio.Task | None = None
+
+
+async def _loop():
+    while True:
+        try:
+            await maintain()
+        except Exception:
+            log.exception("click partition maintenance failed")
+        await asyncio.sleep(PARTITION_MAINTENANCE_SECONDS)
+
+
+async def start():
+    global _task
+    if engine.dialect.name != "postgresql":
+        return
+    async with _maintenance() as conn:
+        if conn is not None and await is_partitioned(conn):
+            await ensure_partitions(conn)
+            await conn.commit()
+    _task = asyncio.create_task(_loop())
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        _task = None
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    commands = {"maintain": maintain, "migrate": migrate}
+    if len(sys.argv) != 2 or sys.argv[1] not in commands:
+        sys.exit(__doc__)
+    asyncio.run(commands[sys.argv[1]]())
@@ -0,0 +1,111 @@
+from __future__ import annotations
+import asyncio
+import os
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from itertools import count
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # listed in requirements.txt; without it profiling answers 501
+    Profiler = None
+
+PROFILE_BUFFER = int(os.getenv("PROFILE_BUFFER", "50"))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001"))
+
+
+@dataclass
+class Profile:
+    id: int
+    at: datetime
+    method: str
+    path: str
+    route: str | None
+    status: int | None
+    durationMs: float
+    profiler: str
+    report: str
+
+
+class ProfileStore:
+    def __init__(self, size: int = PROFILE_BUFFER):
+        self.entries: deque[Profile] = deque(maxlen=size)
+        self._ids = count(1)
+
+    def add(self, **kwargs) -> Profile:
+        p = Profile(next(self._ids), datetime.utcnow(), **kwargs)
+        self.entries.append(p)
+        return p
+
+    def recent(self) -> list[dict]:
+        return [{k: v for k, v in asdict(p).items() if k != "report"} for p in reversed(self.entries)]
+
+    def get(self, id: int) -> Profile | None:
+        return next((p for p in self.entries if p.id == id), None)
+
+
+profiles = ProfileStore()
+
+
+class ProfilingMiddleware:
+    """Profiles one request when it carries `X-Profile: 1` and a valid admin token.
+
+    The response is replaced by pyinstrument's text report (the original
+    status goes in X-Profiled-Status) and the report is kept in `profiles`.
+    Profiled requests are serialized, as only one profiler can own the thread.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._lock = asyncio.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict((k.lower(), v) for k, v in scope["headers"])
+        if headers.get(b"x-profile", b"").lower() not in (b"1", b"true"):
+            return await self.app(scope, receive, send)
+        from .routers.admin import is_admin
+        if not is_admin(headers.get(b"x-admin-token", b"").decode("latin-1")):
+            return await self.app(scope, receive, send)
+        if Profiler is None:
+            body = b'{"detail":"Profiling needs pyinstrument, which is not installed"}'
+            await send({"type": "http.response.start", "status": 501, "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        status = None
+
+        async def discard(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        async with self._lock:
+            started = time.perf_counter()
+            profiler = Profiler(interval=PROFILE_INTERVAL, async_mode="enabled")
+            profiler.start()
+            try:
+                await self.app(scope, receive, discard)
+            finally:
+                profiler.stop()
+            name, report = "pyinstrument", profiler.output_text(unicode=True, color=False)
+            elapsed = (time.perf_counter() - started) * 1000
+
+        route = scope.get("route")
+        p = profiles.add(method=scope["method"], path=scope["path"], route=getattr(route, "path", None),
+                         status=status, durationMs=round(elapsed, 2), profiler=name, report=report)
+        body = report.encode()
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"text/plain; charset=utf-8"),
+            (b"content-length", str(len(body)).encode()),
+            (b"cache-control", b"no-store"),
+            (b"x-profile-id", str(p.id).encode()),
+            (b"x-profiled-status", str(status).encode()),
+        ]})
+        await send({"type": "http.response.body", "body": body})
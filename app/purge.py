@@ -0,0 +1,266 @@
+"""Background purges of rows with too many dependents to delete in one statement.
+
+Deleting an affiliate offer (or a partner, and with it its offers) would
+cascade to every one of its outbound clicks in a single statement, holding
+locks for as long as that takes. Instead the DELETE route answers 202 with a
+PurgeJob; the job deletes the clicks in small chunks, each its own short
+transaction, then deletes the row itself (the remaining, small dependents go
+through CRUD.delete, which logs and publishes them). Progress is kept in the purge_jobs table, so
+any worker can report it.
+
+A job is leased to the worker running it, which bumps updatedAt with every
+chunk. A job whose lease lapsed (its worker died or was redeployed) is
+taken over by the next sweep, or by the next DELETE of the same row.
+
+Schemas created before the cascading foreign keys and leased jobs are
+brought in line at startup (`ensure_schema`, PostgreSQL only); the same
+step can be run by hand:
+
+    python -m app.purge migrate
+"""
+from __future__ import annotations
+import asyncio
+import logging
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func, select, text, update
+from sqlalchemy.exc import IntegrityError
+
+from .db import async_session, engine
+from .events import Change, publish
+from .models import AffiliateOffer, OutboundClick, PurgeJob
+
+log = logging.getLogger(__name__)
+
+PURGE_CHUNK_ROWS = int(os.getenv("PURGE_CHUNK_ROWS", "5000"))
+# pause between chunks, so a purge yields to the live traffic on the same tables
+PURGE_PAUSE_SECONDS = float(os.getenv("PURGE_PAUSE_SECONDS", "0.05"))
+# a running job's worker must show progress within this long, or the job is taken over
+PURGE_LEASE_SECONDS = int(os.getenv("PURGE_LEASE_SECONDS", "120"))
+
+ACTIVE = ("queued", "running")
+WORKER = uuid.uuid4().hex  # owner of the jobs this process runs
+
+# model name -> the (dependent model, filter for a purged row's id) deleted chunk by chunk first
+PLANS: dict[str, list[tuple[Any, Callable[[int], Any]]]] = {
+    "AffiliateOffer": [(OutboundClick, lambda id: OutboundClick.offer_id == id)],
+    "AffiliatePartner": [(OutboundClick, lambda id: OutboundClick.offer_id.in_(
+        select(AffiliateOffer.id).where(AffiliateOffer.partner_id == id)
+    ))],
+}
+
+# foreign keys that the models now declare ON DELETE CASCADE; `ensure_schema` brings older schemas in line
+CASCADES = (
+    ("venues", "city_id", "cities"),
+    ("seasons", "competition_id", "competitions"),
+    ("stages", "season_id", "seasons"),
+    ("affiliate_offers", "partner_id", "affiliate_partners"),
+)
+
+_tasks: set[asyncio.Task] = set()
+
+
+class LeaseLost(Exception):
+    """Another worker took the job over; this one stops without touching it."""
+
+
+def _spawn(res, job: PurgeJob):
+    task = asyncio.create_task(_run(res, job.id, job.entity_id))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def _claim(db, job: PurgeJob) -> bool:
+    """Take `job` over if its lease lapsed; only one claimer can win."""
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=PURGE_LEASE_SECONDS)
+    n = (await db.execute(
+        update(PurgeJob).where(PurgeJob.id == job.id, PurgeJob.status.in_(ACTIVE), PurgeJob.updatedAt < stale)
+        .values(owner=WORKER, updatedAt=now).execution_options(synchronize_session=False)
+    )).rowcount
+    await db.commit()
+    return n == 1
+
+
+async def submit(res, id: int) -> PurgeJob:
+    """Queue a purge of `res`'s row `id`, or return the one already under way."""
+    entity = res.model.__name__
+    async with async_session() as db:
+        if await db.get(res.model, id) is None:
+            raise HTTPException(status_code=404, detail=f"{entity} not found")
+        now = datetime.utcnow()
+        job = PurgeJob(id=uuid.uuid4().hex, entity=entity, entity_id=id, status="queued", deleted=0,
+                       createdAt=now, updatedAt=now, owner=WORKER)
+        db.add(job)
+        try:
+            await db.commit()
+        except IntegrityError:  # uq_purge_jobs_active_row: a job for this row is already active
+            await db.rollback()
+            job = (await db.execute(
+                select(PurgeJob).where(PurgeJob.entity == entity, PurgeJob.entity_id == id,
+                                       PurgeJob.status.in_(ACTIVE))
+            )).scalars().first()
+            if job is None:  # it finished in the meantime
+                return await submit(res, id)
+            if not await _claim(db, job):
+                return job
+            await db.refresh(job)
+    _spawn(res, job)
+    return job
+
+
+async def _progress(db, job_id: str, **values):
+    n = (await db.execute(
+        update(PurgeJob).where(PurgeJob.id == job_id, PurgeJob.owner == WORKER)
+        .values(updatedAt=datetime.utcnow(), **values)
+    )).rowcount
+    if n == 0:
+        raise LeaseLost(job_id)
+
+
+async def _run(res, job_id: str, id: int):
+    from .registry import resources
+    plan = PLANS.get(res.model.__name__, [])
+    try:
+        async with async_session() as db:
+            total = 0
+            for model, where in plan:
+                total += (await db.execute(select(func.count()).select_from(model).where(where(id)))).scalar_one()
+            await _progress(db, job_id, status="running", total=total)
+            await db.commit()
+        deleted = 0
+        for model, where in plan:
+            while True:
+                chunk = select(model.id).where(where(id)).limit(PURGE_CHUNK_ROWS).scalar_subquery()
+                async with async_session() as db:
+                    objs = (await db.execute(
+                        delete(model).where(model.id.in_(chunk)).returning(model)
+                        .execution_options(synchronize_session=False)
+                    )).scalars().all()
+                    n = len(objs)
+                    deleted += n
+                    await resources[model.__name__].crud._record_many(db, "delete", [(obj, None) for obj in objs])
+                    await _progress(db, job_id, deleted=deleted)
+                    await db.commit()
+                publish([Change(model.__name__, obj.id, "delete", None, obj) for obj in objs])
+                if n < PURGE_CHUNK_ROWS:
+                    break
+                await asyncio.sleep(PURGE_PAUSE_SECONDS)
+        async with async_session() as db:
+            try:
+                await res.crud.delete(db, id)
+            except HTTPException as e:
+                if e.status_code != 404:  # already gone is as good as deleted
+                    raise
+        async with async_session() as db:
+            await _progress(db, job_id, status="done", finishedAt=datetime.utcnow())
+            await db.commit()
+    except LeaseLost:
+        log.warning("purge %s of %s %s was taken over by another worker", job_id, res.model.__name__, id)
+    except Exception as e:
+        log.exception("purge %s of %s %s failed", job_id, res.model.__name__, id)
+        async with async_session() as db:
+            error = e.detail if isinstance(e, HTTPException) else repr(e)
+            try:
+                await _progress(db, job_id, status="failed", error=str(error), finishedAt=datetime.utcnow())
+            except LeaseLost:
+                return
+            await db.commit()
+
+
+async def get(id: str) -> PurgeJob:
+    async with async_session() as db:
+        job = await db.get(PurgeJob, id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Purge job not found")
+    return job
+
+
+async def resume() -> int:
+    """Take over every active job whose lease lapsed; returns how many were resumed."""
+    from .registry import resources
+    stale = datetime.utcnow() - timedelta(seconds=PURGE_LEASE_SECONDS)
+    resumed = 0
+    async with async_session() as db:
+        jobs = (await db.execute(
+            select(PurgeJob).where(PurgeJob.status.in_(ACTIVE), PurgeJob.updatedAt < stale)
+        )).scalars().all()
+        for job in jobs:
+            res = resources.get(job.entity)
+            if res is None or not await _claim(db, job):
+                continue
+            log.info("resuming purge %s of %s %s", job.id, job.entity, job.entity_id)
+            _spawn(res, job)
+            resumed += 1
+    return resumed
+
+
+_sweeper: asyncio.Task | None = None
+
+
+async def _sweep():
+    while True:
+        try:
+            await resume()
+        except Exception:
+            log.exception("purge sweep failed")
+        await asyncio.sleep(PURGE_LEASE_SECONDS)
+
+
+async def start():
+    global _sweeper
+    _sweeper = asyncio.create_task(_sweep())
+
+
+async def stop():
+    global _sweeper
+    if _sweeper is not None:
+        _sweeper.cancel()
+        _sweeper = None
+    for task in list(_tasks):
+        task.cancel()  # their lease lapses and another worker picks the jobs up
+    await asyncio.gather(*_tasks, return_exceptions=True)
+
+
+async def ensure_schema():
+    """Bring a schema created by older releases in line; a no-op once it is, and outside PostgreSQL."""
+    if engine.dialect.name != "postgresql":
+        return
+    async with engine.begin() as conn:
+        await conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('purge.ensure_schema'))"))  # one worker at a time
+        for table, column, parent in CASCADES:
+            fk = f"{table}_{column}_fkey"
+            rule = (await conn.execute(
+                text("SELECT confdeltype FROM pg_constraint WHERE conname = :fk"), {"fk": fk}
+            )).scalar()
+            if rule == "c":
+                continue
+            log.info("%s.%s -> ON DELETE CASCADE", table, column)
+            await conn.execute(text(
+                f'ALTER TABLE "{table}" DROP CONSTRAINT IF EXISTS "{fk}", '
+                f'ADD CONSTRAINT "{fk}" FOREIGN KEY ("{column}") REFERENCES "{parent}" (id) ON DELETE CASCADE'
+            ))
+        # purge_jobs tables created before jobs were leased
+        await conn.execute(text('ALTER TABLE "purge_jobs" ADD COLUMN IF NOT EXISTS "owner" VARCHAR'))
+        await conn.execute(text(
+            'CREATE UNIQUE INDEX IF NOT EXISTS "uq_purge_jobs_active_row" ON "purge_jobs" ("entity", "entity_id") '
+            "WHERE status IN ('queued', 'running')"
+        ))
+
+
+async def migrate():
+    if engine.dialect.name != "postgresql":
+        sys.exit("migrate only applies to PostgreSQL")
+    await ensure_schema()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if sys.argv[1:] != ["migrate"]:
+        sys.exit(__doc__)
+    asyncio.run(migrate())
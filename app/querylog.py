@@ -0,0 +1,162 @@
+from __future__ import annotations
+import asyncio
+import logging
+import os
+import random
+import re
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from itertools import count
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+log = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_BUFFER = int(os.getenv("SLOW_QUERY_BUFFER", "200"))
+# fraction of slow SELECTs that get an EXPLAIN (ANALYZE, BUFFERS); 0 switches plans off
+SLOW_QUERY_EXPLAIN_SAMPLE = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE", "0.1"))
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = int(os.getenv("SLOW_QUERY_EXPLAIN_TIMEOUT_MS", "5000"))
+MAX_STATEMENT_LENGTH = 4000
+
+# the ASGI scope of the request being served; set by QueryLogMiddleware
+current_scope: ContextVar[dict | None] = ContextVar("current_scope", default=None)
+
+# plain reads only: ANALYZE runs the statement, and a locking read would take its locks again
+EXPLAINABLE = re.compile(r"^\s*SELECT\b", re.I)
+LOCKING = re.compile(r"\bFOR\s+(NO\s+KEY\s+)?(UPDATE|SHARE|KEY\s+SHARE)\b", re.I)
+
+
+@dataclass
+class SlowQuery:
+    id: int
+    at: datetime
+    durationMs: float
+    route: str | None
+    statement: str
+    params: Any  # shapes only; values never leave the process
+    rowcount: int | None
+    plan: str | None = None
+    planError: str | None = None
+
+
+def _shape(v):
+    if v is None or isinstance(v, bool):
+        return v
+    if isinstance(v, (str, bytes, list, tuple, set, frozenset)):
+        return f"<{type(v).__name__}:{len(v)}>"
+    return f"<{type(v).__name__}>"
+
+
+def redact(params):
+    if isinstance(params, dict):
+        return {k: _shape(v) for k, v in params.items()}
+    if isinstance(params, (list, tuple)):
+        if params and isinstance(params[0], (dict, list, tuple)):
+            # executemany: the first row's shape and how many there were
+            return {"rows": len(params), "first": redact(params[0])}
+        return [_shape(v) for v in params]
+    return _shape(params)
+
+
+def _route(scope: dict | None) -> str | None:
+    if scope is None:
+        return None
+    route = scope.get("route")
+    return f"{scope.get('method', '')} {getattr(route, 'path', None) or scope.get('path', '')}".strip()
+
+
+class QueryLog:
+    """Bounded ring buffer of statements slower than SLOW_QUERY_MS.
+
+    Parameters are recorded as shapes, never values. A sample of slow plain
+    SELECTs is re-run under EXPLAIN (ANALYZE, BUFFERS) on a separate
+    connection, off the request path; at most one plan is captured at a time
+    and only on PostgreSQL.
+    """
+
+    def __init__(self, size: int = SLOW_QUERY_BUFFER):
+        self.entries: deque[SlowQuery] = deque(maxlen=size)
+        self.seen = 0
+        self._ids = count(1)
+        self._engine: AsyncEngine | None = None
+        self._explaining = False
+
+    def install(self, engine: AsyncEngine):
+        self._engine = engine
+        event.listen(engine.sync_engine, "before_cursor_execute", self._before)
+        event.listen(engine.sync_engine, "after_cursor_execute", self._after)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("querylog_start", []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["querylog_start"].pop()
+        elapsed = (time.perf_counter() - started) * 1000
+        if elapsed < SLOW_QUERY_MS or conn.get_execution_options().get("querylog") is False:
+            return
+        self.seen += 1
+        entry = SlowQuery(
+            next(self._ids), datetime.utcnow(), round(elapsed, 2), _route(current_scope.get()),
+            statement[:MAX_STATEMENT_LENGTH], redact(parameters), getattr(cursor, "rowcount", None),
+        )
+        self.entries.append(entry)
+        log.warning("slow query %.1fms on %s: %s", elapsed, entry.route or "-", entry.statement[:200])
+        if (not executemany and not self._explaining and conn.dialect.name == "postgresql"
+                and EXPLAINABLE.match(statement) and not LOCKING.search(statement)
+                and random.random() < SLOW_QUERY_EXPLAIN_SAMPLE):
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            self._explaining = True
+            loop.create_task(self._explain(entry, statement, parameters))
+
+    async def _explain(self, entry: SlowQuery, statement: str, parameters):
+        try:
+            async with self._engine.connect() as conn:
+                conn = await conn.execution_options(querylog=False)
+                async with conn.begin() as tx:
+                    await conn.exec_driver_sql("SET TRANSACTION READ ONLY")
+                    await conn.exec_driver_sql(f"SET LOCAL statement_timeout = {SLOW_QUERY_EXPLAIN_TIMEOUT_MS}")
+                    rows = await conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+                    entry.plan = "\n".join(r[0] for r in rows)
+                    await tx.rollback()
+        except Exception as e:
+            entry.planError = repr(e)
+        finally:
+            self._explaining = False
+
+    def recent(self, limit: int | None = None, min_ms: float = 0) -> list[dict]:
+        out = [asdict(e) for e in reversed(self.entries) if e.durationMs >= min_ms]
+        return out[:limit] if limit else out
+
+    def get(self, id: int) -> dict | None:
+        return next((asdict(e) for e in self.entries if e.id == id), None)
+
+    def clear(self):
+        self.entries.clear()
+
+
+querylog = QueryLog()
+
+
+class QueryLogMiddleware:
+    """Makes the request's scope visible to the engine hooks, which label slow queries with its route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = current_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_scope.reset(token)
@@ -0,0 +1,285 @@
+# NOTE: no `from __future__ import annotations` here -- FastAPI reads the
+# annotations of the generated handlers at registration time.
+import functools
+from dataclasses import dataclass, field
+from typing import Any, Callable, Literal, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from pydantic import ConfigDict, TypeAdapter, create_model
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+
+from . import idempotency, purge, swr
+from .crud import CRUD
+from .db import get_db
+from .filtering import encode_cursor
+from .schemas import PurgeJob as PurgeJobOut
+from .singleflight import singleflight
+
+
+@dataclass
+class Child:
+    """A nested collection served at `/{id}/<path>`, filtered on `fk`."""
+    path: str
+    model: Any
+    schema: Any
+    fk: str
+    # the child resource's `deferred`, left out here too unless `fields` names them
+    deferred: tuple = ()
+
+
+# every Resource, by model name; lets cross-cutting routes (e.g. /changes) find schemas
+resources: dict = {}
+
+
+@dataclass
+class Resource:
+    """Per-model config from which `build_router` generates the CRUD routes."""
+    prefix: str
+    model: Any
+    schema: Any
+    create: Any
+    update: Any
+    slug_field: Optional[str] = None
+    filters: Any = None
+    children: list = field(default_factory=list)
+    cache_max_age: Optional[int] = None
+    pagination: Literal["offset", "keyset"] = "offset"
+    max_limit: int = 1000
+    # default for the list routes' `count` parameter (X-Total-Count)
+    count: Literal["exact", "estimate", "none"] = "none"
+    # honour an Idempotency-Key header on POST (see app/idempotency.py)
+    idempotent: bool = False
+    # other entities the router's responses are built from, for response cache invalidation
+    cache_depends: tuple = ()
+    # async (items, response) run before create and update with [(id or None, new values)];
+    # raises to refuse the write (see app/scheduling.py)
+    validate: Optional[Callable] = None
+    # DELETE answers 202 and purges in the background (see app/purge.py)
+    purge: bool = False
+    # large columns the list route leaves out unless `fields` names them
+    deferred: tuple = ()
+    # writes go to change_log and /changes; off for high-volume or personal rows
+    changes: bool = True
+
+    def __post_init__(self):
+        self.crud = CRUD(self.model, log=self.changes)
+        resources[self.model.__name__] = self
+
+    @property
+    def tag(self) -> str:
+        return self.prefix.strip("/")
+
+    @property
+    def name(self) -> str:
+        return self.tag.replace("-", "_")
+
+    @property
+    def cache_policy(self) -> Optional[swr.CachePolicy]:
+        if self.cache_max_age is None:
+            return None
+        depends = {self.model.__name__, *(c.model.__name__ for c in self.children), *self.cache_depends}
+        return swr.CachePolicy(self.cache_max_age, depends=frozenset(depends))
+
+
+def _cache_headers(res: Resource, response: Response):
+    if res.cache_max_age is not None:
+        response.headers["Cache-Control"] = f"public, max-age={res.cache_max_age}"
+
+
+def _etag_version(value: Optional[str]) -> Optional[int]:
+    """`If-Match: "3"` (or `W/"3"`) -> 3; `*` or no header -> None."""
+    if value is None or value.strip() == "*":
+        return None
+    tag = value.split(",")[0].strip().removeprefix("W/").strip('"')
+    try:
+        return int(tag)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="If-Match must carry a version ETag")
+
+
+def _version_header(obj, response: Response):
+    version = getattr(obj, "version", None)
+    if version is not None:
+        response.headers["ETag"] = f'"{version}"'
+
+
+def _no_filters():
+    return None
+
+
+def _ids(res: Resource):
+    def dep(ids: Optional[str] = Query(
+        None, description=f"Comma-separated ids to fetch in one call (at most {res.max_limit}; paging is ignored)")) -> Optional[list]:
+        if ids is None:
+            return None
+        try:
+            out = list(dict.fromkeys(int(i) for i in ids.split(",") if i.strip()))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+        if len(out) > res.max_limit:
+            raise HTTPException(status_code=400, detail=f"At most {res.max_limit} ids per request")
+        return out
+    return dep
+
+
+def _fields(schema, deferred: tuple = ()):
+    names = tuple(schema.model_fields)
+
+    def dep(fields: Optional[str] = Query(
+        None, description="Comma-separated fields to return; `*` for all" + (f" (default omits {', '.join(deferred)})" if deferred else "")
+    )) -> tuple:
+        if fields is None:
+            return tuple(n for n in names if n not in deferred)
+        if fields.strip() == "*":
+            return names
+        wanted = {f.strip() for f in fields.split(",") if f.strip()}
+        unknown = wanted - set(names)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        return tuple(n for n in names if n in wanted)  # schema order keeps the cache keys canonical
+    return dep
+
+
+# keyed by the requested field set, which clients choose: bounded so they can't mint models without end
+@functools.lru_cache(maxsize=256)
+def _adapter(schema, fields: tuple, many: bool) -> TypeAdapter:
+    if fields != tuple(schema.model_fields):
+        schema = create_model(f"{schema.__name__}Fields", __config__=ConfigDict(from_attributes=True),
+                              **{f: (schema.model_fields[f].annotation, schema.model_fields[f]) for f in fields})
+    return TypeAdapter(list[schema] if many else schema)
+
+
+def _render(schema, fields: tuple, data, response: Response, many: bool = False) -> Response:
+    """Serialize `data` with only `fields` of `schema`, keeping the headers set on `response`.
+
+    Only the selected attributes are read, so columns left out by load_only are never lazily loaded.
+    """
+    adapter = _adapter(schema, fields, many)
+    out = Response(adapter.dump_json(adapter.validate_python(data, from_attributes=True)), media_type="application/json")
+    for k, v in response.headers.items():
+        if k != "content-length":
+            out.headers[k] = v
+    return out
+
+
+def _total_header(total: Optional[int], response: Response):
+    if total is not None:
+        response.headers["X-Total-Count"] = str(total)
+
+
+def _list_route(res: Resource):
+    crud, Limit = res.crud, Query(100, ge=1, le=res.max_limit)
+    Filters, Ids = Depends(res.filters or _no_filters), Depends(_ids(res))
+    Fields = Depends(_fields(res.schema, res.deferred))
+    Count = Query(res.count, description="X-Total-Count mode; `estimate` uses planner statistics")
+
+    if res.pagination == "keyset":
+        @singleflight(f"list_{res.name}")
+        async def endpoint(response: Response, after: Optional[str] = None, limit: int = Limit,
+                           skip: int = Query(0, ge=0, description="Offset paging, kept for older clients; prefer `after`"),
+                           filters: Any = Filters, ids: Optional[list] = Ids, fields: tuple = Fields,
+                           count: Literal["exact", "estimate", "none"] = Count, db: AsyncSession = Depends(get_db)):
+            if skip and after is not None:
+                raise HTTPException(status_code=400, detail="Use either `skip` or `after` (from X-Next-Cursor), not both")
+            _cache_headers(res, response)
+            rows, total = await crud.list_with_total(db, count, skip=skip, limit=limit, after=after, filters=filters,
+                                                     ids=ids, columns=list(fields))
+            _total_header(total, response)
+            if ids is None and len(rows) == limit:
+                response.headers["X-Next-Cursor"] = encode_cursor(rows[-1], filters and filters.sort_key()[0])
+            return _render(res.schema, fields, rows, response, many=True)
+    else:
+        @singleflight(f"list_{res.name}")
+        async def endpoint(response: Response, skip: int = Query(0, ge=0), limit: int = Limit,
+                           filters: Any = Filters, ids: Optional[list] = Ids, fields: tuple = Fields,
+                           count: Literal["exact", "estimate", "none"] = Count, db: AsyncSession = Depends(get_db)):
+            _cache_headers(res, response)
+            rows, total = await crud.list_with_total(db, count, skip=skip, limit=limit, filters=filters, ids=ids,
+                                                     columns=list(fields))
+            _total_header(total, response)
+            return _render(res.schema, fields, rows, response, many=True)
+    return endpoint
+
+
+def _child_route(res: Resource, child: Child):
+    fk = getattr(child.model, child.fk)
+
+    @singleflight(f"{res.name}_{child.path.replace('-', '_')}")
+    async def endpoint(item_id: int, response: Response, fields: tuple = Depends(_fields(child.schema, child.deferred)),
+                       db: AsyncSession = Depends(get_db)):
+        _cache_headers(res, response)
+        q = select(child.model).where(fk == item_id).options(load_only(*(getattr(child.model, f) for f in fields)))
+        rows = await db.execute(q)
+        return _render(child.schema, fields, rows.scalars().all(), response, many=True)
+    return endpoint
+
+
+def build_router(res: Resource) -> APIRouter:
+    router = APIRouter(prefix=res.prefix, tags=[res.tag], route_class=swr.route_class(res.cache_policy))
+    crud, name = res.crud, res.name
+    # `:int` keeps literal sub-paths added by the router modules (e.g. /batch)
+    # from being swallowed by the id routes.
+    item = "/{item_id:int}"
+
+    async def validate(item_id: Optional[int], values: dict, response: Response):
+        if res.validate is not None:
+            await res.validate([(item_id, values)], response)
+
+    if res.idempotent:
+        async def create(payload: res.create, response: Response, idempotency_key: Optional[str] = Header(None),
+                         db: AsyncSession = Depends(get_db)):
+            await validate(None, payload.model_dump(), response)
+            if idempotency_key is not None:
+                return await idempotency.store.create(res, db, payload, idempotency_key)
+            return await crud.create(db, payload)
+    else:
+        async def create(payload: res.create, response: Response, db: AsyncSession = Depends(get_db)):
+            await validate(None, payload.model_dump(), response)
+            return await crud.create(db, payload)
+
+    @singleflight(f"get_{name}")
+    async def get(item_id: int, response: Response, fields: tuple = Depends(_fields(res.schema)),
+                  db: AsyncSession = Depends(get_db)):
+        _cache_headers(res, response)
+        obj = await crud.get(db, item_id)
+        _version_header(obj, response)
+        return _render(res.schema, fields, obj, response)
+
+    async def update(item_id: int, payload: res.update, response: Response,
+                     if_match: Optional[str] = Header(None), db: AsyncSession = Depends(get_db)):
+        await validate(item_id, payload.model_dump(exclude_unset=True), response)
+        obj = await crud.update(db, item_id, payload, expected_version=_etag_version(if_match))
+        _version_header(obj, response)
+        return obj
+
+    if res.purge:
+        async def delete(item_id: int, response: Response):
+            job = await purge.submit(res, item_id)
+            response.headers["Location"] = f"/purge-jobs/{job.id}"
+            return job
+        delete_route = {"response_model": PurgeJobOut, "status_code": 202}
+    else:
+        async def delete(item_id: int, db: AsyncSession = Depends(get_db)):
+            return await crud.delete(db, item_id)
+        delete_route = {}
+
+    router.add_api_route("/", _list_route(res), methods=["GET"], response_model=list[res.schema], name=f"list_{name}")
+    router.add_api_route("/", create, methods=["POST"], response_model=res.schema, status_code=201, name=f"create_{name}")
+    router.add_api_route(item, get, methods=["GET"], response_model=res.schema, name=f"get_{name}")
+    router.add_api_route(item, update, methods=["PATCH"], response_model=res.schema, name=f"update_{name}")
+    router.add_api_route(item, delete, methods=["DELETE"], name=f"delete_{name}", **delete_route)
+
+    if res.slug_field:
+        async def get_by_slug(slug: str, response: Response, fields: tuple = Depends(_fields(res.schema)),
+                              db: AsyncSession = Depends(get_db)):
+            _cache_headers(res, response)
+            return _render(res.schema, fields, await crud.get_by(db, res.slug_field, slug), response)
+        router.add_api_route("/by-slug/{slug}", get_by_slug, methods=["GET"], response_model=res.schema,
+                             name=f"get_{name}_by_slug")
+
+    for child in res.children:
+        router.add_api_route(f"{item}/{child.path}", _child_route(res, child), methods=["GET"],
+                             response_model=list[child.schema], name=f"{name}_{child.path.replace('-', '_')}")
+    return router
@@ -0,0 +1,77 @@
+import os
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from .. import scheduling, segments, singleflight, stats, swr
+from ..profiling import profiles
+from ..querylog import querylog
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+def is_admin(token: Optional[str]) -> bool:
+    # no token configured means the admin API is switched off
+    return bool(ADMIN_TOKEN and token and secrets.compare_digest(token, ADMIN_TOKEN))
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+@router.get("/singleflight")
+async def singleflight_stats():
+    return {name: g.stats.as_dict() for name, g in sorted(singleflight.groups.items())}
+
+@router.post("/stats/rebuild")
+async def rebuild_stats():
+    return {"matches": await stats.store.rebuild()}
+
+@router.post("/schedule/rebuild")
+async def rebuild_schedule():
+    return {"matches": await scheduling.store.rebuild()}
+
+@router.post("/segments/rebuild")
+async def rebuild_segments():
+    return {"subscribers": await segments.index.rebuild()}
+
+@router.get("/response-cache")
+async def response_cache_stats():
+    return swr.cache.stats()
+
+@router.delete("/response-cache")
+async def clear_response_cache():
+    swr.cache.clear()
+    return {"ok": True}
+
+@router.get("/slow-queries")
+async def slow_queries(limit: int = Query(50, ge=1, le=1000), min_ms: float = Query(0, ge=0)):
+    return {"seen": querylog.seen, "items": querylog.recent(limit, min_ms)}
+
+@router.get("/slow-queries/{id}")
+async def slow_query(id: int):
+    entry = querylog.get(id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return entry
+
+@router.delete("/slow-queries")
+async def clear_slow_queries():
+    querylog.clear()
+    return {"ok": True}
+
+@router.get("/profiles")
+async def list_profiles():
+    return profiles.recent()
+
+@router.get("/profiles/{id}", response_class=PlainTextResponse)
+async def profile_report(id: int):
+    p = profiles.get(id)
+    if p is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return p.report
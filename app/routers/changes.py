@@ -0,0 +1,86 @@
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import changelog
+from ..db import get_db
+from ..models import ChangeLog
+from ..registry import resources
+from ..schemas import ChangeFeed
+
+# Log ids are handed out before commit, so a slow transaction can commit an id
+# below one a client has already synced past. Entries younger than this are
+# held back until any such stragglers have landed.
+CHANGES_SETTLE_SECONDS = float(os.getenv("CHANGES_SETTLE_SECONDS", "2"))
+
+router = APIRouter(tags=["changes"])
+
+
+def _types(types: Optional[str]) -> dict[str, str]:
+    """`matches,teams` -> {"Match": "matches", "Team": "teams"}; None -> every resource in the feed."""
+    by_tag = {res.tag: name for name, res in resources.items() if res.changes}
+    if not types:
+        return {name: tag for tag, name in by_tag.items()}
+    out = {}
+    for tag in filter(None, (t.strip() for t in types.split(","))):
+        if tag not in by_tag:
+            raise HTTPException(status_code=400, detail=f"Unknown type: {tag}")
+        out[by_tag[tag]] = tag
+    return out
+
+
+@router.get("/changes", response_model=ChangeFeed)
+async def changes(since: int = Query(0, ge=0), types: Optional[str] = None,
+                  limit: int = Query(1000, ge=1, le=5000), db: AsyncSession = Depends(get_db)):
+    """Compacted deltas after `since`; pass the returned token back as the next `since`.
+
+    Several writes to one row collapse into its net effect: a row created and
+    deleted within the window is left out, and live rows come with their
+    current representation. A token older than the retained log (see
+    app/changelog.py) is answered 410: the client resyncs from the list routes,
+    starting from the token in X-Changes-Token.
+    """
+    wanted = _types(types)
+    cutoff = datetime.utcnow() - timedelta(seconds=CHANGES_SETTLE_SECONDS)
+    if since < await changelog.horizon(db):
+        token = (await db.execute(select(func.max(ChangeLog.id)).where(ChangeLog.createdAt <= cutoff))).scalar()
+        raise HTTPException(status_code=410, detail="Token too old; resync and continue from X-Changes-Token",
+                            headers={"X-Changes-Token": str(token or 0)})
+    rows = (await db.execute(
+        select(ChangeLog).where(ChangeLog.id > since, ChangeLog.entity.in_(wanted), ChangeLog.createdAt <= cutoff)
+        .order_by(ChangeLog.id).limit(limit)
+    )).scalars().all()
+
+    net: dict[tuple[str, int], dict] = {}
+    for r in rows:
+        entry = net.get((r.entity, r.entity_id))
+        if entry is None:
+            net[(r.entity, r.entity_id)] = {"first": r.op, "op": r.op, "version": r.version}
+        else:
+            entry["op"], entry["version"] = r.op, r.version
+
+    live: dict[str, list[int]] = {}
+    for (entity, id), entry in net.items():
+        if entry["op"] != "delete":
+            live.setdefault(entity, []).append(id)
+    data = {}
+    for entity, ids in live.items():
+        res = resources[entity]
+        for obj in (await db.execute(select(res.model).where(res.model.id.in_(ids)))).scalars():
+            data[(entity, obj.id)] = res.schema.model_validate(obj).model_dump(mode="json")
+
+    out = []
+    for (entity, id), entry in net.items():
+        if entry["op"] == "delete":
+            if entry["first"] == "create":
+                continue
+            out.append({"type": wanted[entity], "id": id, "op": "delete", "version": entry["version"]})
+        elif (entity, id) in data:  # otherwise deleted since; the next sync reports it
+            op = "create" if entry["first"] == "create" else "update"
+            out.append({"type": wanted[entity], "id": id, "op": op,
+                        "version": entry["version"], "data": data[(entity, id)]})
+    return {"token": rows[-1].id if rows else since, "more": len(rows) == limit, "changes": out}
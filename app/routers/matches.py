@@ -1,32 +1,27 @@
-from fastapi import APIRouter, Depends
+from fastapi import Body, Depends, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from ..db import async_session
+from .. import scheduling
+from ..db import get_db
 from ..models import Match
-from ..schemas import Match as MatchOut, MatchCreate, MatchUpdate
-from ..crud import CRUD
+from ..schemas import Match as MatchOut, MatchCreate, MatchUpdate, MatchDelta
+from ..filters import MatchFilter
+from ..registry import Resource, build_router
 
-router = APIRouter(prefix="/matches", tags=["matches"])
-crud = CRUD[Match, MatchCreate, MatchUpdate](Match)
+resource = Resource(
+    prefix="/matches", model=Match, schema=MatchOut, create=MatchCreate, update=MatchUpdate,
+    filters=MatchFilter, cache_max_age=30, validate=scheduling.enforce,
+)
+router = build_router(resource)
 
-async def get_db():
-    async with async_session() as s: yield s
+@router.patch("/batch", response_model=list[MatchOut])
+async def update_matches(response: Response, deltas: list[MatchDelta] = Body(..., min_length=1, max_length=resource.max_limit),
+                         db: AsyncSession = Depends(get_db)):
+    deltas = [(d.id, d.model_dump(exclude_unset=True, exclude={"id", "version"}), d.version) for d in deltas]
+    await scheduling.enforce([(id, changes) for id, changes, _ in deltas], response)
+    return await resource.crud.update_many(db, deltas)
 
-@router.get("/", response_model=list[MatchOut])
-async def list_matches(skip:int=0, limit:int=100, db: AsyncSession = Depends(get_db)):
-    return await crud.list(db, skip, limit)
-
-@router.post("/", response_model=MatchOut, status_code=201)
-async def create_match(payload: MatchCreate, db: AsyncSession = Depends(get_db)):
-    return await crud.create(db, payload)
-
-@router.get("/{match_id}", response_model=MatchOut)
-async def get_match(match_id:int, db: AsyncSession = Depends(get_db)):
-    return await crud.get(db, match_id)
-
-@router.patch("/{match_id}", response_model=MatchOut)
-async def update_match(match_id:int, payload: MatchUpdate, db: AsyncSession = Depends(get_db)):
-    return await crud.update(db, match_id, payload)
-
-@router.delete("/{match_id}")
-async def delete_match(match_id:int, db: AsyncSession = Depends(get_db)):
-    return await crud.delete(db, match_id)
+@router.post("/import", response_model=list[MatchOut], status_code=201)
+async def import_matches(response: Response, payloads: list[MatchCreate] = Body(..., min_length=1, max_length=resource.max_limit),
+                         db: AsyncSession = Depends(get_db)):
+    await scheduling.enforce([(None, p.model_dump()) for p in payloads], response)
+    return await resource.crud.create_many(db, payloads)
@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+
+from .. import purge
+from ..schemas import PurgeJob
+
+router = APIRouter(tags=["purge-jobs"])
+
+
+@router.get("/purge-jobs/{job_id}", response_model=PurgeJob)
+async def purge_job(job_id: str):
+    return await purge.get(job_id)
@@ -1,42 +1,64 @@
-from fastapi import APIRouter, Depends
+from fastapi import Depends, HTTPException, Request, Response
+from fastapi.responses import RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from ..db import async_session
+from .. import bracket, ical, scheduling, snapshot
+from ..compression import negotiate
+from ..db import get_db
 from ..models import Season, Stage, Match
-from ..schemas import Season as SeasonOut, SeasonCreate, SeasonUpdate, Stage as StageOut, Match as MatchOut
-from ..crud import CRUD
+from ..schemas import Season as SeasonOut, SeasonCreate, SeasonUpdate, Stage as StageOut, Match as MatchOut, Bracket as BracketOut, ScheduleConflict
+from ..filters import SeasonFilter
+from ..registry import Resource, Child, build_router
 
-router = APIRouter(prefix="/seasons", tags=["seasons"])
-crud = CRUD[Season, SeasonCreate, SeasonUpdate](Season)
-async def get_db():
-    async with async_session() as s: yield s
+resource = Resource(
+    prefix="/seasons", model=Season, schema=SeasonOut, create=SeasonCreate, update=SeasonUpdate,
+    filters=SeasonFilter, slug_field="slug", cache_max_age=300,
+    cache_depends=("Competition", "Team", "Venue", "City"),
+    children=[
+        Child("stages", Stage, StageOut, "season_id"),
+        Child("matches", Match, MatchOut, "season_id"),
+    ],
+)
+router = build_router(resource)
 
-@router.get("/", response_model=list[SeasonOut])
-async def list_seasons(skip:int=0, limit:int=100, db: AsyncSession = Depends(get_db)):
-    return await crud.list(db, skip, limit)
+@router.get("/{season_id:int}/bracket", response_model=BracketOut)
+async def season_bracket(season_id:int, db: AsyncSession = Depends(get_db)):
+    b = await bracket.cache.get(db, season_id)
+    rounds = [{"stage_id": r["stage_id"], "name": r["name"], "matches": [b.nodes[i] for i in r["nodes"]]} for r in b.rounds]
+    final = rounds[-1]["matches"] if rounds else []
+    return {
+        "season_id": season_id,
+        "rounds": rounds,
+        "third_place": b.nodes.get(b.third_place),
+        "champion_team_id": final[0].winner_team_id if len(final) == 1 else None,
+    }
 
-@router.post("/", response_model=SeasonOut, status_code=201)
-async def create_season(payload: SeasonCreate, db: AsyncSession = Depends(get_db)):
-    return await crud.create(db, payload)
+@router.get("/{season_id:int}/conflicts", response_model=list[ScheduleConflict])
+async def season_conflicts(season_id:int, db: AsyncSession = Depends(get_db)):
+    await resource.crud.get(db, season_id)
+    return [c.as_dict() for c in await scheduling.store.audit(season_id)]
 
-@router.get("/{season_id}", response_model=SeasonOut)
-async def get_season(season_id:int, db: AsyncSession = Depends(get_db)):
-    return await crud.get(db, season_id)
+@router.get("/{season_id:int}/snapshot")
+async def season_snapshot(season_id:int, db: AsyncSession = Depends(get_db)):
+    snap = await snapshot.store.get(db, season_id)
+    if snap is None:
+        raise HTTPException(status_code=404, detail="Season not found")
+    return RedirectResponse(f"{router.prefix}/{season_id}/snapshot/{snap.version}", status_code=307,
+                            headers={"Cache-Control": "public, max-age=5"})
 
-@router.patch("/{season_id}", response_model=SeasonOut)
-async def update_season(season_id:int, payload: SeasonUpdate, db: AsyncSession = Depends(get_db)):
-    return await crud.update(db, season_id, payload)
+@router.get("/{season_id:int}/snapshot/{version}")
+async def season_snapshot_version(season_id:int, version:str, request: Request, db: AsyncSession = Depends(get_db)):
+    snap = await snapshot.store.get(db, season_id)
+    if snap is None:
+        raise HTTPException(status_code=404, detail="Season not found")
+    if version != snap.version:
+        return RedirectResponse(f"{router.prefix}/{season_id}/snapshot/{snap.version}", status_code=307,
+                                headers={"Cache-Control": "public, max-age=5"})
+    encoding = negotiate(request.headers.get("accept-encoding", ""), ["br", "gzip"] if snap.br else ["gzip"])
+    headers = {"Cache-Control": "public, max-age=31536000, immutable", "ETag": f'"{snap.version}"', "Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(snap.encoded(encoding or "identity"), media_type="application/json", headers=headers)
 
-@router.delete("/{season_id}")
-async def delete_season(season_id:int, db: AsyncSession = Depends(get_db)):
-    return await crud.delete(db, season_id)
-
-@router.get("/{season_id}/stages", response_model=list[StageOut])
-async def season_stages(season_id:int, db: AsyncSession = Depends(get_db)):
-    res = await db.execute(select(Stage).where(Stage.season_id == season_id))
-    return list(res.scalars().all())
-
-@router.get("/{season_id}/matches", response_model=list[MatchOut])
-async def season_matches(season_id:int, db: AsyncSession = Depends(get_db)):
-    res = await db.execute(select(Match).where(Match.season_id == season_id))
-    return list(res.scalars().all())
+@router.get("/{season_id:int}/fixtures.ics")
+async def season_fixtures_ics(season_id:int, request: Request, db: AsyncSession = Depends(get_db)):
+    return ical.respond(request, await ical.cache.get(db, "season", season_id))
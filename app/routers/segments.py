@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+
+from .. import segments
+from ..schemas import Segment, SegmentCount
+from .admin import require_admin
+
+router = APIRouter(prefix="/segments", tags=["segments"], dependencies=[Depends(require_admin)])
+
+@router.post("/count", response_model=SegmentCount)
+async def segment_count(segment: Segment):
+    return {"count": len(await segments.index.evaluate(segment))}
+
+@router.post("/export")
+async def segment_export(segment: Segment):
+    ids = await segments.index.evaluate(segment)
+    return StreamingResponse(segments.index.export(ids), media_type="text/csv",
+                             headers={"Content-Disposition": 'attachment; filename="segment.csv"'})
@@ -0,0 +1,41 @@
+import gzip
+import re
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import sitemap
+from ..compression import negotiate
+from ..db import get_db
+
+CHUNK = re.compile(r"^([a-z_]+)-(\d+)$")
+
+router = APIRouter(tags=["sitemap"])
+
+@router.get("/sitemap.xml")
+async def sitemap_index():
+    return StreamingResponse(sitemap.index(), media_type="application/xml",
+                             headers={"Cache-Control": "public, max-age=3600"})
+
+@router.get("/sitemaps/{name}.xml")
+async def sitemap_chunk(name: str, request: Request, db: AsyncSession = Depends(get_db)):
+    m = CHUNK.match(name)
+    if not m or m[1] not in sitemap.SOURCES:
+        raise HTTPException(status_code=404, detail="Sitemap not found")
+    chunk = next((c for c in await sitemap.chunk_cache.get(db, m[1]) if c.index == int(m[2])), None)
+    if chunk is None:
+        raise HTTPException(status_code=404, detail="Sitemap not found")
+    headers = {"Cache-Control": "public, max-age=3600", "ETag": f'"{chunk.fingerprint}"', "Vary": "Accept-Encoding"}
+    inm = request.headers.get("if-none-match", "")
+    if f'"{chunk.fingerprint}"' in {t.strip().removeprefix("W/") for t in inm.split(",")}:
+        return Response(status_code=304, headers=headers)
+    path = await sitemap.store.file(db, chunk)
+    if negotiate(request.headers.get("accept-encoding", ""), ["gzip"]):
+        return FileResponse(path, media_type="application/xml", headers={**headers, "Content-Encoding": "gzip"})
+
+    def plain():
+        with gzip.open(path, "rb") as f:
+            while block := f.read(64 * 1024):
+                yield block
+    return StreamingResponse(plain(), media_type="application/xml", headers=headers)
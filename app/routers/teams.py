@@ -1,38 +1,20 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import Depends, HTTPException, Query, Request, Response
 from sqlalchemy import select, or_
 from sqlalchemy.ext.asyncio import AsyncSession
-from ..db import async_session
+from .. import ical, stats
+from ..db import get_db
 from ..models import Team, Match
-from ..schemas import Team as TeamOut, TeamCreate, TeamUpdate, Match as MatchOut
-from ..crud import CRUD
+from ..schemas import Team as TeamOut, TeamCreate, TeamUpdate, Match as MatchOut, TeamForm, HeadToHead
+from ..filters import TeamFilter
+from ..registry import Resource, build_router
 
-router = APIRouter(prefix="/teams", tags=["teams"])
-crud = CRUD[Team, TeamCreate, TeamUpdate](Team)
+resource = Resource(
+    prefix="/teams", model=Team, schema=TeamOut, create=TeamCreate, update=TeamUpdate,
+    filters=TeamFilter, slug_field="slug", cache_max_age=300, cache_depends=("Match", "Venue"),
+)
+router = build_router(resource)
 
-async def get_db():
-    async with async_session() as s: yield s
-
-@router.get("/", response_model=list[TeamOut])
-async def list_teams(skip:int=0, limit:int=100, db: AsyncSession = Depends(get_db)):
-    return await crud.list(db, skip, limit)
-
-@router.post("/", response_model=TeamOut, status_code=201)
-async def create_team(payload: TeamCreate, db: AsyncSession = Depends(get_db)):
-    return await crud.create(db, payload)
-
-@router.get("/{team_id}", response_model=TeamOut)
-async def get_team(team_id:int, db: AsyncSession = Depends(get_db)):
-    return await crud.get(db, team_id)
-
-@router.patch("/{team_id}", response_model=TeamOut)
-async def update_team(team_id:int, payload: TeamUpdate, db: AsyncSession = Depends(get_db)):
-    return await crud.update(db, team_id, payload)
-
-@router.delete("/{team_id}")
-async def delete_team(team_id:int, db: AsyncSession = Depends(get_db)):
-    return await crud.delete(db, team_id)
-
-@router.get("/{team_id}/matches", response_model=list[MatchOut])
+@router.get("/{team_id:int}/matches", response_model=list[MatchOut])
 async def team_matches(team_id:int, role: str = Query("any", enum=["any","home","away"]), db: AsyncSession = Depends(get_db)):
     q = select(Match)
     if role == "home":
@@ -43,3 +25,23 @@ async def team_matches(team_id:int, role: str = Query("any", enum=["any","home",
         q = q.where(or_(Match.home_team_id == team_id, Match.away_team_id == team_id))
     res = await db.execute(q)
     return list(res.scalars().all())
+
+@router.get("/{team_id:int}/fixtures.ics")
+async def team_fixtures_ics(team_id:int, request: Request, db: AsyncSession = Depends(get_db)):
+    return ical.respond(request, await ical.cache.get(db, "team", team_id))
+
+@router.get("/{team_id:int}/form", response_model=TeamForm)
+async def team_form(team_id:int, response: Response, n: int = Query(5, ge=1, le=50), db: AsyncSession = Depends(get_db)):
+    await resource.crud.get(db, team_id)
+    response.headers["Cache-Control"] = "public, max-age=60"
+    return await stats.store.form(team_id, n)
+
+@router.get("/{team_a:int}/vs/{team_b:int}", response_model=HeadToHead)
+async def head_to_head(team_a:int, team_b:int, response: Response, last: int = Query(10, ge=1, le=100),
+                       db: AsyncSession = Depends(get_db)):
+    if team_a == team_b:
+        raise HTTPException(status_code=400, detail="A team has no head-to-head record with itself")
+    await resource.crud.get(db, team_a)
+    await resource.crud.get(db, team_b)
+    response.headers["Cache-Control"] = "public, max-age=60"
+    return await stats.store.head_to_head(team_a, team_b, last)
@@ -0,0 +1,278 @@
+from __future__ import annotations
+import asyncio
+import bisect
+import logging
+import os
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select
+
+from .db import async_session
+from .events import Change, on_resync, subscribe
+from .models import Match, MatchStatus
+
+log = logging.getLogger(__name__)
+
+VENUE_TURNAROUND_HOURS = float(os.getenv("VENUE_TURNAROUND_HOURS", "6"))
+TEAM_MIN_REST_DAYS = float(os.getenv("TEAM_MIN_REST_DAYS", "2"))
+# "reject" answers 409, "warn" lets the write through with an X-Schedule-Conflicts header, "off" skips the check
+SCHEDULE_CONFLICTS = os.getenv("SCHEDULE_CONFLICTS", "reject").lower()
+
+FIXTURE_FIELDS = frozenset({"kickoff", "status", "venue_id", "home_team_id", "away_team_id", "season_id"})
+# these don't occupy a venue or a team
+INACTIVE = frozenset({MatchStatus.CANCELED, MatchStatus.POSTPONED})
+
+
+@dataclass(frozen=True)
+class Fixture:
+    match_id: int | None  # None for a match that is yet to be created
+    kickoff: datetime
+    status: MatchStatus
+    season_id: int | None
+    venue_id: int | None
+    home_team_id: int | None
+    away_team_id: int | None
+
+    @classmethod
+    def of(cls, m) -> Fixture:
+        return cls(m.id, m.kickoff, m.status, m.season_id, m.venue_id, m.home_team_id, m.away_team_id)
+
+    @property
+    def active(self) -> bool:
+        return self.status not in INACTIVE
+
+    @property
+    def teams(self) -> set[int]:
+        return {t for t in (self.home_team_id, self.away_team_id) if t is not None}
+
+
+@dataclass(frozen=True)
+class Conflict:
+    kind: str  # "venue" | "team"
+    match_id: int | None
+    other_match_id: int
+    kickoff: datetime
+    other_kickoff: datetime
+    minHours: float
+    venue_id: int | None = None
+    team_id: int | None = None
+
+    @property
+    def gapHours(self) -> float:
+        return round(abs((self.kickoff - self.other_kickoff).total_seconds()) / 3600, 2)
+
+    def as_dict(self) -> dict:
+        return {**self.__dict__, "gapHours": self.gapHours}
+
+    def describe(self) -> str:
+        who = f"venue {self.venue_id}" if self.kind == "venue" else f"team {self.team_id}"
+        return f"{who}: {self.gapHours}h from match {self.other_match_id} (min {self.minHours}h)"
+
+
+@dataclass
+class Intervals:
+    """Kickoffs per venue and per team, each list kept sorted for range lookups.
+
+    A window is the same width for every match on a key (the turnaround or
+    the rest period), so "which windows overlap this one" is a bisect for
+    the kickoffs within one width either side.
+    """
+    venues: dict[int, list[tuple[datetime, int]]] = field(default_factory=dict)
+    teams: dict[int, list[tuple[datetime, int]]] = field(default_factory=dict)
+    fixtures: dict[int, Fixture] = field(default_factory=dict)  # every match, active or not
+
+    def _slots(self, f: Fixture):
+        if f.venue_id is not None:
+            yield self.venues, f.venue_id
+        for t in f.teams:
+            yield self.teams, t
+
+    def add(self, f: Fixture):
+        self.fixtures[f.match_id] = f
+        if f.active:
+            for index, key in self._slots(f):
+                bisect.insort(index.setdefault(key, []), (f.kickoff, f.match_id))
+
+    def remove(self, match_id: int):
+        f = self.fixtures.pop(match_id, None)
+        if f is None or not f.active:
+            return
+        for index, key in self._slots(f):
+            slots = index[key]
+            del slots[bisect.bisect_left(slots, (f.kickoff, f.match_id))]
+
+    def apply(self, match_id: int, f: Fixture | None):
+        if self.fixtures.get(match_id) == f:
+            return
+        self.remove(match_id)
+        if f is not None:
+            self.add(f)
+
+    def near(self, f: Fixture, ignore: set = frozenset()) -> list[Conflict]:
+        if not f.active:
+            return []
+        out = []
+        checks = [("venue", self.venues, f.venue_id, VENUE_TURNAROUND_HOURS)] if f.venue_id is not None else []
+        checks += [("team", self.teams, t, TEAM_MIN_REST_DAYS * 24) for t in sorted(f.teams)]
+        for kind, index, key, hours in checks:
+            slots = index.get(key)
+            if not slots:
+                continue
+            width = timedelta(hours=hours)
+            lo = bisect.bisect_right(slots, (f.kickoff - width, float("inf")))
+            hi = bisect.bisect_left(slots, (f.kickoff + width, float("-inf")))
+            for kickoff, other in slots[lo:hi]:
+                if other == f.match_id or other in ignore:
+                    continue
+                out.append(Conflict(kind, f.match_id, other, f.kickoff, kickoff, hours,
+                                    venue_id=key if kind == "venue" else None,
+                                    team_id=key if kind == "team" else None))
+        return out
+
+
+class ScheduleStore:
+    """Interval index of every match's kickoff, for conflict checks without a query per write.
+
+    Built from the matches table on first use (or by `rebuild`), then kept
+    current from Match change events like the stats store. Checks run
+    against this worker's view, so a conflicting write racing on another
+    worker can slip through; the season audit catches those.
+    """
+
+    def __init__(self):
+        self._index = Intervals()
+        self._built = False
+        self._building: set[int] | None = None
+        self._lock = asyncio.Lock()
+
+    async def ensure(self):
+        if not self._built:
+            async with self._lock:
+                if not self._built:
+                    await self._build()
+
+    async def rebuild(self) -> int:
+        async with self._lock:
+            await self._build()
+        return len(self._index.fixtures)
+
+    async def _build(self):
+        self._building = set()
+        try:
+            async with async_session() as db:
+                index = Intervals()
+                for row in await db.execute(_fixtures()):
+                    index.add(Fixture.of(row))
+                while self._building:
+                    ids, self._building = self._building, set()
+                    found = {r.id: Fixture.of(r) for r in await db.execute(_fixtures().where(Match.id.in_(ids)))}
+                    for id in ids:
+                        index.apply(id, found.get(id))
+                self._index = index
+            self._built = True
+        finally:
+            self._building = None
+
+    async def _refresh(self, ids: set[int]):
+        try:
+            async with async_session() as db:
+                found = {r.id: Fixture.of(r) for r in await db.execute(_fixtures().where(Match.id.in_(ids)))}
+            for id in ids:
+                self._index.apply(id, found.get(id))
+        except Exception:
+            log.exception("schedule refresh failed; scheduling a rebuild")
+            self.invalidate()
+
+    def invalidate(self):
+        self._built = False
+
+    def on_matches(self, changes: list[Change]):
+        remote = set()
+        for c in changes:
+            if c.op == "update" and c.fields is not None and not (c.fields & FIXTURE_FIELDS):
+                continue
+            if self._building is not None:
+                self._building.add(c.id)
+            elif not self._built:
+                continue
+            elif c.op == "delete":
+                self._index.apply(c.id, None)
+            elif c.obj is not None:
+                self._index.apply(c.id, Fixture.of(c.obj))
+            else:
+                remote.add(c.id)
+        if remote:
+            asyncio.create_task(self._refresh(remote))
+
+    async def check(self, items: list[tuple[int | None, dict]]) -> list[Conflict]:
+        """Conflicts of the given writes -- (match id or None, new values) -- with the schedule and each other."""
+        await self.ensure()
+        proposed = []
+        for pos, (id, values) in enumerate(items):
+            current = self._index.fixtures.get(id) if id is not None else None
+            if current is None and id is not None:
+                continue  # unknown match: the write itself will 404
+            fields = {k: v for k, v in values.items() if k in FIXTURE_FIELDS}
+            if current is not None:
+                f = replace(current, **fields)
+                if _slot(f) != _slot(current) or (f.active and not current.active):
+                    proposed.append((pos, f))
+                # otherwise the write doesn't move the match: conflicts it already has don't block it
+            elif "kickoff" in fields and "status" in fields:
+                proposed.append((pos, Fixture(None, **{k: fields.get(k) for k in FIXTURE_FIELDS})))
+        moving = {f.match_id for _, f in proposed if f.match_id is not None}
+        batch = Intervals()
+        out = []
+        for pos, f in proposed:
+            # new matches have no id yet: they're reported as -1, -2, ... by position in the request
+            f = f if f.match_id is not None else replace(f, match_id=-pos - 1)
+            out += self._index.near(f, ignore=moving)
+            out += batch.near(f)
+            batch.add(f)
+        return out
+
+    async def audit(self, season_id: int) -> list[Conflict]:
+        """Every conflict involving a match of the season, each pair reported once."""
+        await self.ensure()
+        mine = sorted((f for f in self._index.fixtures.values() if f.season_id == season_id),
+                      key=lambda f: (f.kickoff, f.match_id))
+        out = []
+        for f in mine:
+            for c in self._index.near(f):
+                other = self._index.fixtures[c.other_match_id]
+                if other.season_id != season_id or (other.kickoff, other.match_id) > (f.kickoff, f.match_id):
+                    out.append(c)
+        return out
+
+
+def _slot(f: Fixture) -> tuple:
+    """What a conflict depends on, besides being active."""
+    return f.kickoff, f.venue_id, f.home_team_id, f.away_team_id, f.season_id
+
+
+def _fixtures():
+    return select(Match.id, Match.kickoff, Match.status, Match.season_id, Match.venue_id,
+                  Match.home_team_id, Match.away_team_id)
+
+
+async def enforce(items: list[tuple[int | None, dict]], response: Response | None = None):
+    """Apply SCHEDULE_CONFLICTS to the writes: 409 on conflicts, or a warning header."""
+    if SCHEDULE_CONFLICTS == "off":
+        return
+    conflicts = await store.check(items)
+    if not conflicts:
+        return
+    if SCHEDULE_CONFLICTS == "reject":
+        raise HTTPException(status_code=409, detail=jsonable_encoder(
+            {"message": "Schedule conflict", "conflicts": [c.as_dict() for c in conflicts]}))
+    log.warning("schedule conflicts accepted: %s", "; ".join(c.describe() for c in conflicts))
+    if response is not None:
+        response.headers["X-Schedule-Conflicts"] = "; ".join(c.describe() for c in conflicts)
+
+
+store = ScheduleStore()
+subscribe("Match")(store.on_matches)
+on_resync(store.invalidate)
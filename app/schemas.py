@@ -1,7 +1,7 @@
 from __future__ import annotations
 from datetime import datetime
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field, model_validator
+from typing import Any, Optional
 from .models import PageStatus, StageType, MatchStatus, PartnerKind, TopicType
 
 class ORMB(BaseModel):
@@ -138,6 +138,10 @@ class MatchUpdate(ORMB):
     away_team_id: Optional[int] = None
 class Match(MatchBase):
     id: int
+    version: int
+class MatchDelta(MatchUpdate):
+    id: int
+    version: Optional[int] = None  # expected version; the row is left alone (and the batch fails) if it moved on
 
 # ---- CMS
 class PageBase(ORMB):
@@ -259,3 +263,147 @@ class AlertSubscriptionUpdate(ORMB):
     subscriber_id: Optional[int] = None
 class AlertSubscription(AlertSubscriptionBase):
     id: int
+
+# ---- Bracket
+class BracketNode(ORMB):
+    match_id: int
+    round: Optional[str] = None
+    kickoff: datetime
+    status: MatchStatus
+    scoreHome: Optional[int] = None
+    scoreAway: Optional[int] = None
+    pensHome: Optional[int] = None
+    pensAway: Optional[int] = None
+    home_team_id: Optional[int] = None
+    away_team_id: Optional[int] = None
+    winner_team_id: Optional[int] = None
+    feeders: list[Optional[int]]
+    parent: Optional[int] = None
+class BracketRound(ORMB):
+    stage_id: int
+    name: str
+    matches: list[BracketNode]
+class Bracket(ORMB):
+    season_id: int
+    rounds: list[BracketRound]
+    third_place: Optional[BracketNode] = None
+    champion_team_id: Optional[int] = None
+
+# ---- Snapshots
+class SeasonSnapshot(ORMB):
+    season: Season
+    competition: Competition
+    stages: list[Stage]
+    teams: list[Team]
+    venues: list[Venue]
+    cities: list[City]
+    matches: list[Match]
+
+# ---- Change feed
+class ChangeEntry(ORMB):
+    type: str
+    id: int
+    op: str
+    version: Optional[int] = None
+    data: Optional[dict[str, Any]] = None
+
+class ChangeFeed(ORMB):
+    token: int
+    more: bool
+    changes: list[ChangeEntry]
+
+# ---- Purge jobs
+class PurgeJob(ORMB):
+    id: str
+    entity: str
+    entity_id: int
+    status: str
+    total: Optional[int] = None
+    deleted: int
+    error: Optional[str] = None
+    createdAt: datetime
+    updatedAt: datetime
+    finishedAt: Optional[datetime] = None
+
+# ---- Stats
+class StatTotals(ORMB):
+    played: int
+    wins: int
+    draws: int
+    losses: int
+    goalsFor: int
+    goalsAgainst: int
+
+class FormMatch(ORMB):
+    match_id: int
+    kickoff: datetime
+    home: bool
+    opponent_id: int
+    goalsFor: int
+    goalsAgainst: int
+    result: str
+
+class TeamForm(StatTotals):
+    team_id: int
+    n: int
+    form: str
+    overall: StatTotals
+    matches: list[FormMatch]
+
+class Meeting(ORMB):
+    match_id: int
+    kickoff: datetime
+    home_team_id: int
+    away_team_id: int
+    scoreHome: int
+    scoreAway: int
+    pensHome: Optional[int] = None
+    pensAway: Optional[int] = None
+    winner_team_id: Optional[int] = None
+
+class HeadToHead(ORMB):
+    team_a_id: int
+    team_b_id: int
+    played: int
+    winsA: int
+    winsB: int
+    draws: int
+    goalsA: int
+    goalsB: int
+    meetings: list[Meeting]
+
+# ---- Scheduling
+class ScheduleConflict(ORMB):
+    kind: str
+    match_id: Optional[int] = None
+    other_match_id: int
+    kickoff: datetime
+    other_kickoff: datetime
+    gapHours: float
+    minHours: float
+    venue_id: Optional[int] = None
+    team_id: Optional[int] = None
+
+# ---- Segments
+class Segment(BaseModel):
+    """A boolean audience expression: exactly one of `and`, `or`, `not`, a topic, `locale` or `status`."""
+    model_config = dict(populate_by_name=True)
+    all_: Optional[list[Segment]] = Field(None, alias="and", min_length=1)
+    any_: Optional[list[Segment]] = Field(None, alias="or", min_length=1)
+    not_: Optional[Segment] = Field(None, alias="not")
+    topicType: Optional[TopicType] = None
+    topicRef: Optional[str] = None
+    locale: Optional[str] = None
+    status: Optional[str] = None
+
+    @model_validator(mode="after")
+    def _one_term(self):
+        terms = [self.all_, self.any_, self.not_, self.topicType, self.locale, self.status]
+        if sum(t is not None for t in terms) != 1:
+            raise ValueError("a segment must have exactly one of and, or, not, topicType, locale, status")
+        if self.topicRef is not None and self.topicType is None:
+            raise ValueError("topicRef requires topicType")
+        return self
+
+class SegmentCount(ORMB):
+    count: int
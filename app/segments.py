@@ -0,0 +1,195 @@
+from __future__ import annotations
+import asyncio
+import logging
+from collections import Counter
+from typing import AsyncIterator
+
+from pyroaring import BitMap
+from sqlalchemy import select
+
+from .db import async_session
+from .events import Change, on_resync, subscribe
+from .models import AlertSubscription, EmailSubscriber, TopicType
+from . import schemas
+
+log = logging.getLogger(__name__)
+
+SUBSCRIBER_FIELDS = frozenset({"locale", "status"})
+SUBSCRIPTION_FIELDS = frozenset({"topicType", "topicRef", "subscriber_id"})
+EXPORT_BATCH = 1000
+
+
+class SegmentIndex:
+    """Roaring bitmaps of subscriber ids per topic, locale and status.
+
+    Segment expressions are evaluated as bitmap algebra; `not` is taken
+    against the bitmap of all subscribers. Built on first use, then kept
+    current from EmailSubscriber and AlertSubscription change events.
+    """
+
+    def __init__(self):
+        self._reset()
+        self._built = False
+        self._building: set[tuple[str, int]] | None = None
+        self._lock = asyncio.Lock()
+
+    def _reset(self):
+        self.universe = BitMap()
+        self._topics: dict[tuple[TopicType, str], BitMap] = {}
+        self._locales: dict[str, BitMap] = {}
+        self._statuses: dict[str, BitMap] = {}
+        # subscription id -> (topic, subscriber id), and how many subscriptions link each pair
+        self._subs: dict[int, tuple[tuple[TopicType, str], int]] = {}
+        self._links: Counter[tuple[tuple[TopicType, str], int]] = Counter()
+
+    # ---- maintenance
+    def _set_subscriber(self, id: int, row: EmailSubscriber | None):
+        for bitmaps in (self._locales, self._statuses):
+            for bm in bitmaps.values():
+                bm.discard(id)
+        if row is None:
+            # topic bitmaps keep the id; every evaluation is masked by the universe
+            self.universe.discard(id)
+            return
+        self.universe.add(id)
+        self._locales.setdefault((row.locale or "").lower(), BitMap()).add(id)
+        self._statuses.setdefault((row.status or "").lower(), BitMap()).add(id)
+
+    def _set_subscription(self, id: int, row: AlertSubscription | None):
+        old = self._subs.pop(id, None)
+        if old is not None:
+            self._links[old] -= 1
+            if self._links[old] <= 0:
+                del self._links[old]
+                self._topics[old[0]].discard(old[1])
+        if row is None:
+            return
+        link = ((row.topicType, row.topicRef), row.subscriber_id)
+        self._subs[id] = link
+        self._links[link] += 1
+        self._topics.setdefault(link[0], BitMap()).add(row.subscriber_id)
+
+    async def ensure(self):
+        if not self._built:
+            async with self._lock:
+                if not self._built:
+                    await self._build()
+
+    async def rebuild(self) -> int:
+        async with self._lock:
+            await self._build()
+        return len(self.universe)
+
+    async def _build(self):
+        self._building = set()
+        try:
+            self._reset()
+            async with async_session() as db:
+                async for row in await db.stream_scalars(select(EmailSubscriber).execution_options(yield_per=5000)):
+                    self._set_subscriber(row.id, row)
+                async for row in await db.stream_scalars(select(AlertSubscription).execution_options(yield_per=5000)):
+                    self._set_subscription(row.id, row)
+                while self._building:
+                    pending, self._building = self._building, set()
+                    await self._reload(db, pending)
+            self._built = True
+        finally:
+            self._building = None
+
+    async def _reload(self, db, keys: set[tuple[str, int]]):
+        for entity, model, apply in (("EmailSubscriber", EmailSubscriber, self._set_subscriber),
+                                     ("AlertSubscription", AlertSubscription, self._set_subscription)):
+            ids = {id for e, id in keys if e == entity}
+            if not ids:
+                continue
+            found = {r.id: r for r in (await db.execute(
+                select(model).where(model.id.in_(ids)).execution_options(populate_existing=True)
+            )).scalars()}
+            for id in ids:
+                apply(id, found.get(id))
+
+    async def _refresh(self, keys: set[tuple[str, int]]):
+        try:
+            async with async_session() as db:
+                await self._reload(db, keys)
+        except Exception:
+            log.exception("segment refresh failed; scheduling a rebuild")
+            self.invalidate()
+
+    def invalidate(self):
+        self._built = False
+
+    def on_change(self, changes: list[Change]):
+        remote = set()
+        for c in changes:
+            watched = SUBSCRIBER_FIELDS if c.entity == "EmailSubscriber" else SUBSCRIPTION_FIELDS
+            if c.op == "update" and c.fields is not None and not (c.fields & watched):
+                continue
+            if self._building is not None:
+                self._building.add((c.entity, c.id))
+            elif not self._built:
+                continue
+            elif c.obj is None and c.op != "delete":
+                remote.add((c.entity, c.id))
+            else:
+                apply = self._set_subscriber if c.entity == "EmailSubscriber" else self._set_subscription
+                apply(c.id, None if c.op == "delete" else c.obj)
+        if remote:
+            asyncio.create_task(self._refresh(remote))
+
+    # ---- evaluation
+    def _eval(self, e: schemas.Segment) -> BitMap:
+        if e.all_ is not None:
+            parts = sorted((self._eval(x) for x in e.all_), key=len)
+            return BitMap.intersection(*parts) if len(parts) > 1 else parts[0]
+        if e.any_ is not None:
+            parts = [self._eval(x) for x in e.any_]
+            return BitMap.union(*parts) if len(parts) > 1 else parts[0]
+        if e.not_ is not None:
+            return self.universe - self._eval(e.not_)
+        if e.topicType is not None:
+            if e.topicRef is not None:
+                return self._topics.get((e.topicType, e.topicRef), BitMap())
+            refs = [bm for (t, _), bm in self._topics.items() if t == e.topicType]
+            return BitMap.union(*refs) if len(refs) > 1 else (refs[0] if refs else BitMap())
+        if e.locale is not None:
+            return self._locales.get(e.locale.lower(), BitMap())
+        return self._statuses.get(e.status.lower(), BitMap())
+
+    async def evaluate(self, e: schemas.Segment) -> BitMap:
+        await self.ensure()
+        return self._eval(e) & self.universe
+
+    async def export(self, ids: BitMap) -> AsyncIterator[str]:
+        """CSV of the segment's subscribers, fetched in id batches; opens its own session."""
+        yield "id,email,locale,status\n"
+        batch = []
+        async with async_session() as db:
+            for id in ids:
+                batch.append(id)
+                if len(batch) < EXPORT_BATCH:
+                    continue
+                async for line in _rows(db, batch):
+                    yield line
+                batch = []
+            if batch:
+                async for line in _rows(db, batch):
+                    yield line
+
+
+def _csv(value) -> str:
+    value = "" if value is None else str(value)
+    return '"' + value.replace('"', '""') + '"' if any(ch in value for ch in ',"\n\r') else value
+
+
+async def _rows(db, ids: list[int]) -> AsyncIterator[str]:
+    rows = await db.execute(
+        select(EmailSubscriber.id, EmailSubscriber.email, EmailSubscriber.locale, EmailSubscriber.status)
+        .where(EmailSubscriber.id.in_(ids)).order_by(EmailSubscriber.id)
+    )
+    yield "".join(",".join(_csv(v) for v in r) + "\n" for r in rows)
+
+
+index = SegmentIndex()
+subscribe("EmailSubscriber", "AlertSubscription")(index.on_change)
+on_resync(index.invalidate)
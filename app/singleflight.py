@@ -0,0 +1,106 @@
+from __future__ import annotations
+import asyncio
+import functools
+import os
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Hashable
+
+from fastapi import HTTPException, Response
+from pydantic import BaseModel
+
+from .db import async_session
+
+SINGLEFLIGHT_TIMEOUT_SECONDS = float(os.getenv("SINGLEFLIGHT_TIMEOUT_SECONDS", "10"))
+
+
+@dataclass
+class Stats:
+    calls: int = 0
+    executions: int = 0
+    shared: int = 0
+    errors: int = 0
+    timeouts: int = 0
+
+    def as_dict(self) -> dict:
+        return {**self.__dict__, "coalescing_ratio": round(self.shared / self.calls, 4) if self.calls else 0.0}
+
+
+class Group:
+    """At most one in-flight call per key; concurrent callers with the same key share its outcome.
+
+    The call runs as its own task, so a caller that times out or disconnects
+    doesn't cancel it for the others. Exceptions reach every caller.
+    """
+
+    def __init__(self, name: str, timeout: float = SINGLEFLIGHT_TIMEOUT_SECONDS):
+        self.name = name
+        self.timeout = timeout
+        self.stats = Stats()
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]):
+        self.stats.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.stats.executions += 1
+            task = self._inflight[key] = asyncio.create_task(fn())
+            task.add_done_callback(functools.partial(self._done, key))
+        else:
+            self.stats.shared += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), self.timeout)
+        except asyncio.TimeoutError:
+            self.stats.timeouts += 1
+            raise HTTPException(status_code=504, detail="Upstream computation timed out")
+
+    def _done(self, key, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.stats.errors += 1
+
+
+groups: dict[str, Group] = {}
+
+
+def _freeze(value) -> Hashable:
+    if isinstance(value, BaseModel):
+        return value.model_dump_json()
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def singleflight(name: str, timeout: float = SINGLEFLIGHT_TIMEOUT_SECONDS):
+    """Coalesce concurrent identical calls of a route handler.
+
+    The key is the handler's arguments minus `db` and `response`. The shared
+    call gets a session of its own, so it outlives any single request. Headers
+    it sets on `response` are copied to every caller's response.
+    """
+    group = groups.setdefault(name, Group(name, timeout))
+
+    def deco(fn):
+        @functools.wraps(fn)
+        async def wrapper(**kwargs):
+            response: Response | None = kwargs.get("response")
+            key = tuple(sorted((k, _freeze(v)) for k, v in kwargs.items() if k not in ("db", "response")))
+
+            async def call():
+                scratch = Response()
+                async with async_session() as db:
+                    args = {**kwargs, "db": db} if "db" in kwargs else dict(kwargs)
+                    if response is not None:
+                        args["response"] = scratch
+                    return await fn(**args), scratch.headers
+
+            result, headers = await group.do(key, call)
+            if response is not None:
+                for k, v in headers.items():
+                    if k != "content-length":
+                        response.headers[k] = v
+            return result
+        return wrapper
+    return deco
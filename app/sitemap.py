@@ -0,0 +1,195 @@
+from __future__ import annotations
+import asyncio
+import glob
+import gzip
+import hashlib
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, AsyncIterator
+from xml.sax.saxutils import escape
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .db import async_session
+from .events import Change, on_resync, subscribe
+from .models import ChangeLog, City, Match, Page, PageStatus, Season, Team, Venue
+
+SITE_BASE_URL = os.getenv("SITE_BASE_URL", "https://sportshub.example").rstrip("/")
+SITEMAP_BASE_URL = os.getenv("SITEMAP_BASE_URL", SITE_BASE_URL).rstrip("/")
+SITEMAP_DIR = os.getenv("SITEMAP_DIR", "./var/sitemaps")
+# the protocol's cap; chunks are id ranges this wide, so none can exceed it
+SITEMAP_CHUNK_SIZE = int(os.getenv("SITEMAP_CHUNK_SIZE", "50000"))
+
+XMLNS = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+
+
+@dataclass(frozen=True)
+class Source:
+    kind: str
+    model: Any
+    path: str  # formatted with the row's `key` column
+    key: str = "slug"
+    where: Any = None
+
+
+SOURCES = {s.kind: s for s in (
+    Source("pages", Page, "/{}", where=Page.status == PageStatus.PUBLISHED),
+    Source("teams", Team, "/teams/{}"),
+    Source("cities", City, "/cities/{}"),
+    Source("venues", Venue, "/venues/{}"),
+    Source("seasons", Season, "/seasons/{}"),
+    Source("matches", Match, "/matches/{}", key="id"),
+)}
+KINDS = {s.model.__name__: s.kind for s in SOURCES.values()}
+
+
+@dataclass(frozen=True)
+class Chunk:
+    kind: str
+    index: int
+    fingerprint: str
+    lastmod: datetime | None
+
+    @property
+    def name(self) -> str:
+        return f"{self.kind}-{self.index}"
+
+    @property
+    def path(self) -> str:
+        return os.path.join(SITEMAP_DIR, f"{self.name}-{self.fingerprint}.xml.gz")
+
+
+def _w3c(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%S+00:00")
+
+
+def _rows(src: Source):
+    q = select(src.model.id)
+    return q.where(src.where) if src.where is not None else q
+
+
+async def chunks(db: AsyncSession, kind: str) -> list[Chunk]:
+    """One entry per non-empty id range of `kind`, fingerprinted from its rows and change log."""
+    src = SOURCES[kind]
+    n = SITEMAP_CHUNK_SIZE
+    ids = _rows(src).subquery()
+    k = (ids.c.id // n).label("k")
+    counts = {r.k: (r.count, r.max) for r in await db.execute(
+        select(k, func.count().label("count"), func.max(ids.c.id).label("max")).group_by(k)
+    )}
+    lk = ChangeLog.entity_id // n
+    logs = {r.k: (r.last, r.lastmod) for r in await db.execute(
+        select(lk.label("k"), func.max(ChangeLog.id).label("last"), func.max(ChangeLog.createdAt).label("lastmod"))
+        .where(ChangeLog.entity == src.model.__name__).group_by(lk)
+    )}
+    out = []
+    for index in sorted(counts):
+        last, lastmod = logs.get(index, (None, None))
+        seed = f"{kind}:{index}:{counts[index]}:{last}:{n}:{SITE_BASE_URL}".encode()
+        out.append(Chunk(kind, int(index), hashlib.sha256(seed).hexdigest()[:16], lastmod))
+    return out
+
+
+class ChunkCache:
+    """`chunks()` per kind, kept until a row of that kind changes, so requests don't rescan change_log."""
+
+    def __init__(self):
+        self._chunks: dict[str, list[Chunk]] = {}
+        # bumped by every change of the kind; a scan that raced with one isn't kept
+        self._generation: dict[str, int] = {}
+
+    async def get(self, db: AsyncSession, kind: str) -> list[Chunk]:
+        found = self._chunks.get(kind)
+        if found is None:
+            generation = self._generation.get(kind, 0)
+            found = await chunks(db, kind)
+            if self._generation.get(kind, 0) == generation:
+                self._chunks[kind] = found
+        return found
+
+    def on_change(self, changes: list[Change]):
+        for kind in {KINDS[c.entity] for c in changes}:
+            self._generation[kind] = self._generation.get(kind, 0) + 1
+            self._chunks.pop(kind, None)
+
+    def clear(self):
+        for kind in SOURCES:
+            self._generation[kind] = self._generation.get(kind, 0) + 1
+        self._chunks.clear()
+
+
+async def _urls(db: AsyncSession, chunk: Chunk) -> AsyncIterator[str]:
+    src = SOURCES[chunk.kind]
+    lo, hi = chunk.index * SITEMAP_CHUNK_SIZE, (chunk.index + 1) * SITEMAP_CHUNK_SIZE
+    changed = (
+        select(ChangeLog.entity_id, func.max(ChangeLog.createdAt).label("lastmod"))
+        .where(ChangeLog.entity == src.model.__name__, ChangeLog.entity_id >= lo, ChangeLog.entity_id < hi)
+        .group_by(ChangeLog.entity_id).subquery()
+    )
+    lastmod = changed.c.lastmod
+    if src.model is Page:
+        lastmod = func.coalesce(changed.c.lastmod, Page.publishedAt)
+    q = (select(getattr(src.model, src.key), lastmod)
+         .outerjoin(changed, changed.c.entity_id == src.model.id)
+         .where(src.model.id >= lo, src.model.id < hi).order_by(src.model.id))
+    if src.where is not None:
+        q = q.where(src.where)
+    async for key, modified in await db.stream(q.execution_options(yield_per=2000)):
+        loc = escape(SITE_BASE_URL + src.path.format(key))
+        yield f"<url><loc>{loc}</loc><lastmod>{_w3c(modified)}</lastmod></url>" if modified else f"<url><loc>{loc}</loc></url>"
+
+
+class SitemapStore:
+    """Gzipped chunk files named by fingerprint; an unchanged chunk is never regenerated."""
+
+    def __init__(self):
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    async def file(self, db: AsyncSession, chunk: Chunk) -> str:
+        if os.path.exists(chunk.path):
+            return chunk.path
+        async with self._locks.setdefault(chunk.name, asyncio.Lock()):
+            if not os.path.exists(chunk.path):
+                await self._write(db, chunk)
+        return chunk.path
+
+    async def _write(self, db: AsyncSession, chunk: Chunk):
+        os.makedirs(SITEMAP_DIR, exist_ok=True)
+        tmp = f"{chunk.path}.{os.getpid()}.tmp"
+        buf: list[str] = [f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset {XMLNS}>\n']
+        with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=9) as f:
+            async for line in _urls(db, chunk):
+                buf.append(line + "\n")
+                if len(buf) >= 1000:
+                    f.write("".join(buf))
+                    buf.clear()
+            buf.append("</urlset>\n")
+            f.write("".join(buf))
+        os.replace(tmp, chunk.path)
+        for old in glob.glob(os.path.join(SITEMAP_DIR, f"{chunk.name}-*.xml.gz")):
+            if old != chunk.path:
+                try:
+                    os.remove(old)
+                except FileNotFoundError:
+                    pass
+
+
+async def index() -> AsyncIterator[str]:
+    """The sitemap index, streamed; it opens its own session as it outlives the request's."""
+    yield f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex {XMLNS}>\n'
+    for kind in SOURCES:
+        async with async_session() as db:
+            found = await chunk_cache.get(db, kind)
+        for chunk in found:
+            loc = escape(f"{SITEMAP_BASE_URL}/sitemaps/{chunk.name}.xml")
+            mod = f"<lastmod>{_w3c(chunk.lastmod)}</lastmod>" if chunk.lastmod else ""
+            yield f"<sitemap><loc>{loc}</loc>{mod}</sitemap>\n"
+    yield "</sitemapindex>\n"
+
+
+store = SitemapStore()
+chunk_cache = ChunkCache()
+subscribe(*KINDS)(chunk_cache.on_change)
+on_resync(chunk_cache.clear)
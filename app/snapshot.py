@@ -0,0 +1,156 @@
+from __future__ import annotations
+import asyncio
+import gzip
+import hashlib
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; snapshots are then served as gzip or identity
+    brotli = None
+
+from .db import async_session
+from .events import Change, on_resync, subscribe
+from .models import City, Competition, Match, Season, Stage, Team, Venue
+from . import schemas
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR")
+SNAPSHOT_DEBOUNCE_SECONDS = float(os.getenv("SNAPSHOT_DEBOUNCE_SECONDS", "2"))
+SNAPSHOT_MAX_DELAY_SECONDS = float(os.getenv("SNAPSHOT_MAX_DELAY_SECONDS", "30"))
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    season_id: int
+    version: str
+    raw: bytes
+    gzip: bytes
+    br: bytes | None
+    builtAt: datetime
+
+    def encoded(self, encoding: str) -> bytes:
+        return {"br": self.br, "gzip": self.gzip}.get(encoding) or self.raw
+
+
+async def build(db: AsyncSession, season_id: int) -> Snapshot | None:
+    season = await db.get(Season, season_id)
+    if season is None:
+        return None
+    competition = await db.get(Competition, season.competition_id)
+    stages = (await db.execute(select(Stage).where(Stage.season_id == season_id).order_by(Stage.sortOrder, Stage.id))).scalars().all()
+    matches = (await db.execute(select(Match).where(Match.season_id == season_id).order_by(Match.kickoff, Match.id))).scalars().all()
+    team_ids = {m.home_team_id for m in matches} | {m.away_team_id for m in matches}
+    venue_ids = {m.venue_id for m in matches if m.venue_id is not None}
+    teams = (await db.execute(select(Team).where(Team.id.in_(team_ids)).order_by(Team.id))).scalars().all() if team_ids else []
+    venues = (await db.execute(select(Venue).where(Venue.id.in_(venue_ids)).order_by(Venue.id))).scalars().all() if venue_ids else []
+    city_ids = {v.city_id for v in venues}
+    cities = (await db.execute(select(City).where(City.id.in_(city_ids)).order_by(City.id))).scalars().all() if city_ids else []
+
+    doc = schemas.SeasonSnapshot(
+        season=season, competition=competition, stages=stages, teams=teams,
+        venues=venues, cities=cities, matches=matches,
+    )
+    return await asyncio.to_thread(_encode, season_id, doc.model_dump_json().encode())
+
+
+def _encode(season_id: int, raw: bytes) -> Snapshot:
+    snap = Snapshot(
+        season_id, hashlib.sha256(raw).hexdigest()[:16], raw, gzip.compress(raw, 9),
+        brotli.compress(raw, quality=11) if brotli else None, datetime.utcnow(),
+    )
+    if SNAPSHOT_DIR:
+        _write_files(snap)
+    return snap
+
+
+def _write_files(snap: Snapshot):
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    base = os.path.join(SNAPSHOT_DIR, f"season-{snap.season_id}-{snap.version}.json")
+    for suffix, body in (("", snap.raw), (".gz", snap.gzip), (".br", snap.br)):
+        if body is not None and not os.path.exists(base + suffix):
+            tmp = f"{base}{suffix}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(body)
+            os.replace(tmp, base + suffix)
+
+
+class SnapshotStore:
+    """Latest snapshot per season, rebuilt in the background after writes.
+
+    Rebuilds are debounced: a burst of writes triggers one rebuild once things
+    have been quiet for SNAPSHOT_DEBOUNCE_SECONDS, and never later than
+    SNAPSHOT_MAX_DELAY_SECONDS after the first write of the burst.
+    """
+
+    def __init__(self):
+        self._snaps: dict[int, Snapshot] = {}
+        self._locks: dict[int, asyncio.Lock] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._dirty_since: float | None = None
+        self._task: asyncio.Task | None = None
+        self._pending = False
+
+    async def get(self, db: AsyncSession, season_id: int) -> Snapshot | None:
+        snap = self._snaps.get(season_id)
+        if snap is not None:
+            return snap
+        async with self._locks.setdefault(season_id, asyncio.Lock()):
+            if season_id not in self._snaps:
+                snap = await build(db, season_id)
+                if snap is None:
+                    return None
+                self._snaps[season_id] = snap
+            return self._snaps[season_id]
+
+    def invalidate(self):
+        self._snaps.clear()
+
+    def on_change(self, changes: list[Change]):
+        if not self._snaps:
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        if self._dirty_since is None:
+            self._dirty_since = now
+        if self._timer is not None:
+            self._timer.cancel()
+        delay = min(SNAPSHOT_DEBOUNCE_SECONDS, max(0.0, self._dirty_since + SNAPSHOT_MAX_DELAY_SECONDS - now))
+        self._timer = loop.call_later(delay, self._kick)
+
+    def _kick(self):
+        self._timer, self._dirty_since = None, None
+        # a running rebuild may already have read pre-change rows, so it goes round again
+        self._pending = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while self._pending:
+            self._pending = False
+            await self.rebuild()
+
+    async def rebuild(self):
+        async with async_session() as db:
+            for season_id in list(self._snaps):
+                try:
+                    snap = await build(db, season_id)
+                except Exception:
+                    log.exception("snapshot rebuild failed for season %s", season_id)
+                    continue
+                if snap is None:
+                    self._snaps.pop(season_id, None)
+                else:
+                    self._snaps[season_id] = snap
+
+
+store = SnapshotStore()
+subscribe("Competition", "Season", "Stage", "Team", "Venue", "City", "Match")(store.on_change)
+on_resync(store.invalidate)
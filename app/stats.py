@@ -0,0 +1,226 @@
+from __future__ import annotations
+import asyncio
+import bisect
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from sqlalchemy import select
+
+from .db import async_session
+from .events import Change, on_resync, subscribe
+from .models import Match, MatchStatus
+
+log = logging.getLogger(__name__)
+
+RESULT_FIELDS = frozenset({"status", "scoreHome", "scoreAway", "pensHome", "pensAway", "kickoff",
+                           "home_team_id", "away_team_id"})
+
+
+@dataclass(frozen=True, order=True)
+class Result:
+    """A finished match; ordered by kickoff so team histories stay sorted."""
+    kickoff: datetime
+    match_id: int
+    home_team_id: int
+    away_team_id: int
+    scoreHome: int
+    scoreAway: int
+    pensHome: int | None = None
+    pensAway: int | None = None
+
+    @classmethod
+    def of(cls, m: Match) -> Result | None:
+        if m.status != MatchStatus.FT or m.scoreHome is None or m.scoreAway is None:
+            return None
+        return cls(m.kickoff, m.id, m.home_team_id, m.away_team_id, m.scoreHome, m.scoreAway, m.pensHome, m.pensAway)
+
+    def goals(self, team_id: int) -> tuple[int, int]:
+        return (self.scoreHome, self.scoreAway) if team_id == self.home_team_id else (self.scoreAway, self.scoreHome)
+
+    def outcome(self, team_id: int) -> str:
+        gf, ga = self.goals(team_id)
+        return "W" if gf > ga else "L" if gf < ga else "D"
+
+    @property
+    def winner_team_id(self) -> int | None:
+        if self.scoreHome != self.scoreAway:
+            return self.home_team_id if self.scoreHome > self.scoreAway else self.away_team_id
+        if self.pensHome is not None and self.pensAway is not None and self.pensHome != self.pensAway:
+            return self.home_team_id if self.pensHome > self.pensAway else self.away_team_id
+        return None
+
+
+@dataclass
+class Totals:
+    played: int = 0
+    wins: int = 0
+    draws: int = 0
+    losses: int = 0
+    goalsFor: int = 0
+    goalsAgainst: int = 0
+
+    def add(self, r: Result, team_id: int, sign: int = 1):
+        gf, ga = r.goals(team_id)
+        outcome = r.outcome(team_id)
+        self.played += sign
+        self.wins += sign * (outcome == "W")
+        self.draws += sign * (outcome == "D")
+        self.losses += sign * (outcome == "L")
+        self.goalsFor += sign * gf
+        self.goalsAgainst += sign * ga
+
+
+@dataclass
+class TeamStats:
+    results: list[Result] = field(default_factory=list)  # sorted by (kickoff, match_id)
+    totals: Totals = field(default_factory=Totals)
+
+
+def _pair(a: int, b: int) -> tuple[int, int]:
+    return (a, b) if a <= b else (b, a)
+
+
+class StatsStore:
+    """Per-team results and per-pair meetings of finished matches, kept in memory.
+
+    Built from the matches table on first use (or by `rebuild`), then kept
+    current from Match change events: a match entering FT is added, a
+    corrected or un-finished one replaced or removed.
+    """
+
+    def __init__(self):
+        self._teams: dict[int, TeamStats] = {}
+        self._pairs: dict[tuple[int, int], list[Result]] = {}
+        self._by_match: dict[int, Result] = {}
+        self._built = False
+        self._building: set[int] | None = None  # match ids changed while a build is reading
+        self._lock = asyncio.Lock()
+
+    def _add(self, r: Result):
+        self._by_match[r.match_id] = r
+        for team_id in (r.home_team_id, r.away_team_id):
+            ts = self._teams.setdefault(team_id, TeamStats())
+            bisect.insort(ts.results, r)
+            ts.totals.add(r, team_id)
+        bisect.insort(self._pairs.setdefault(_pair(r.home_team_id, r.away_team_id), []), r)
+
+    def _remove(self, match_id: int):
+        r = self._by_match.pop(match_id, None)
+        if r is None:
+            return
+        for team_id in (r.home_team_id, r.away_team_id):
+            ts = self._teams[team_id]
+            ts.results.remove(r)
+            ts.totals.add(r, team_id, -1)
+        self._pairs[_pair(r.home_team_id, r.away_team_id)].remove(r)
+
+    def apply(self, match_id: int, r: Result | None):
+        if self._by_match.get(match_id) == r:
+            return
+        self._remove(match_id)
+        if r is not None:
+            self._add(r)
+
+    async def ensure(self):
+        if not self._built:
+            async with self._lock:
+                if not self._built:
+                    await self._build()
+
+    async def rebuild(self) -> int:
+        async with self._lock:
+            await self._build()
+        return len(self._by_match)
+
+    async def _build(self):
+        self._building = set()
+        try:
+            async with async_session() as db:
+                rows = (await db.execute(
+                    select(Match).where(Match.status == MatchStatus.FT).order_by(Match.kickoff, Match.id)
+                )).scalars().all()
+                self._teams, self._pairs, self._by_match = {}, {}, {}
+                for m in rows:
+                    r = Result.of(m)
+                    if r is not None:
+                        self._add(r)
+                # the select may have missed writes that landed while it ran
+                while self._building:
+                    ids, self._building = self._building, set()
+                    for m in (await db.execute(select(Match).where(Match.id.in_(ids)).execution_options(populate_existing=True))).scalars():
+                        self.apply(m.id, Result.of(m))
+                        ids.discard(m.id)
+                    for gone in ids:
+                        self.apply(gone, None)
+            self._built = True
+        finally:
+            self._building = None
+
+    async def _refresh(self, ids: set[int]):
+        try:
+            async with async_session() as db:
+                found = {m.id: m for m in (await db.execute(select(Match).where(Match.id.in_(ids)))).scalars()}
+            for id in ids:
+                self.apply(id, Result.of(found[id]) if id in found else None)
+        except Exception:
+            log.exception("stats refresh failed; scheduling a rebuild")
+            self.invalidate()
+
+    def invalidate(self):
+        self._built = False
+
+    def on_matches(self, changes: list[Change]):
+        remote = set()
+        for c in changes:
+            if c.op == "update" and c.fields is not None and not (c.fields & RESULT_FIELDS):
+                continue
+            if self._building is not None:
+                self._building.add(c.id)
+            elif not self._built:
+                continue
+            elif c.op == "delete":
+                self.apply(c.id, None)
+            elif c.obj is not None:
+                self.apply(c.id, Result.of(c.obj))
+            else:
+                remote.add(c.id)
+        if remote:
+            asyncio.create_task(self._refresh(remote))
+
+    async def form(self, team_id: int, n: int) -> dict:
+        await self.ensure()
+        ts = self._teams.get(team_id, TeamStats())
+        recent = ts.results[-n:][::-1]
+        last = Totals()
+        for r in recent:
+            last.add(r, team_id)
+        return {
+            "team_id": team_id, "n": n, **last.__dict__,
+            "form": "".join(r.outcome(team_id) for r in recent),
+            "overall": ts.totals,
+            "matches": [
+                {"match_id": r.match_id, "kickoff": r.kickoff, "home": r.home_team_id == team_id,
+                 "opponent_id": r.away_team_id if r.home_team_id == team_id else r.home_team_id,
+                 "goalsFor": r.goals(team_id)[0], "goalsAgainst": r.goals(team_id)[1], "result": r.outcome(team_id)}
+                for r in recent
+            ],
+        }
+
+    async def head_to_head(self, a: int, b: int, last: int) -> dict:
+        await self.ensure()
+        meetings = self._pairs.get(_pair(a, b), [])
+        totals = Totals()
+        for r in meetings:
+            totals.add(r, a)
+        return {
+            "team_a_id": a, "team_b_id": b, "played": totals.played,
+            "winsA": totals.wins, "winsB": totals.losses, "draws": totals.draws,
+            "goalsA": totals.goalsFor, "goalsB": totals.goalsAgainst,
+            "meetings": [{**r.__dict__, "winner_team_id": r.winner_team_id} for r in meetings[-last:][::-1]],
+        }
+
+
+store = StatsStore()
+subscribe("Match")(store.on_matches)
+on_resync(store.invalidate)
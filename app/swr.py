@@ -0,0 +1,203 @@
+from __future__ import annotations
+import asyncio
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable
+
+from fastapi import HTTPException, Request, Response
+from fastapi.routing import APIRoute
+from starlette.responses import StreamingResponse
+
+from .events import Change, on_resync, subscribe
+
+log = logging.getLogger(__name__)
+
+SWR_CACHE_BYTES = int(os.getenv("SWR_CACHE_BYTES", str(64 * 1024 * 1024)))
+SWR_STALE_WHILE_REVALIDATE = int(os.getenv("SWR_STALE_WHILE_REVALIDATE", "60"))
+SWR_STALE_IF_ERROR = int(os.getenv("SWR_STALE_IF_ERROR", "600"))
+
+# requests carrying these get a fresh, uncached response
+BYPASS_HEADERS = ("if-none-match", "if-modified-since", "authorization", "x-admin-token")
+DROP_HEADERS = {"content-length", "date", "age"}
+MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    ttl: int  # used when the response doesn't carry a max-age of its own
+    stale_while_revalidate: int = SWR_STALE_WHILE_REVALIDATE
+    stale_if_error: int = SWR_STALE_IF_ERROR
+    # entities whose changes drop the cached responses
+    depends: frozenset[str] = frozenset()
+
+    def cache_control(self, ttl: int) -> str:
+        return (f"public, max-age={ttl}, stale-while-revalidate={self.stale_while_revalidate}, "
+                f"stale-if-error={self.stale_if_error}")
+
+
+@dataclass
+class Entry:
+    status: int
+    headers: list[tuple[str, str]]
+    body: bytes
+    storedAt: float
+    ttl: int
+    policy: CachePolicy
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(k) + len(v) for k, v in self.headers) + 128
+
+    def age(self, now: float) -> float:
+        return now - self.storedAt
+
+    def response(self, now: float) -> Response:
+        r = Response(self.body, status_code=self.status)
+        r.raw_headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in self.headers]
+        r.headers["content-length"] = str(len(self.body))
+        r.headers["Age"] = str(int(self.age(now)))
+        return r
+
+
+class ResponseCache:
+    """Byte-bounded LRU of rendered GET responses with stale-while-revalidate and stale-if-error."""
+
+    def __init__(self, max_bytes: int = SWR_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = self.stale_hits = self.error_hits = self.misses = 0
+        self._entries: OrderedDict[tuple, Entry] = OrderedDict()
+        self._by_entity: dict[str, set[tuple]] = {}
+        self._refreshing: set[tuple] = set()
+
+    def get(self, key) -> Entry | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry: Entry):
+        if entry.size > self.max_bytes:
+            return
+        self.drop(key)
+        self._entries[key] = entry
+        self.size += entry.size
+        for entity in entry.policy.depends:
+            self._by_entity.setdefault(entity, set()).add(key)
+        while self.size > self.max_bytes:
+            self.drop(next(iter(self._entries)))
+
+    def drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.size -= entry.size
+        for entity in entry.policy.depends:
+            keys = self._by_entity.get(entity)
+            if keys is not None:
+                keys.discard(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._by_entity.clear()
+        self.size = 0
+
+    def on_change(self, changes: list[Change]):
+        for entity in {c.entity for c in changes}:
+            for key in list(self._by_entity.pop(entity, ())):
+                self.drop(key)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "bytes": self.size, "hits": self.hits,
+                "stale_hits": self.stale_hits, "error_hits": self.error_hits, "misses": self.misses}
+
+
+cache = ResponseCache()
+subscribe()(cache.on_change)
+on_resync(cache.clear)
+
+
+def _cacheable(response: Response) -> bool:
+    return (response.status_code == 200 and not isinstance(response, StreamingResponse)
+            and "public" in response.headers.get("cache-control", "")
+            and "content-encoding" not in response.headers)
+
+
+def _entry(response: Response, policy: CachePolicy) -> Entry:
+    m = MAX_AGE.search(response.headers.get("cache-control", ""))
+    ttl = int(m[1]) if m else policy.ttl
+    headers = [(k, v) for k, v in response.headers.items() if k not in DROP_HEADERS and k != "cache-control"]
+    headers.append(("cache-control", policy.cache_control(ttl)))
+    return Entry(response.status_code, headers, bytes(response.body), time.monotonic(), ttl, policy)
+
+
+def route_class(policy: CachePolicy | None) -> type[APIRoute]:
+    """An APIRoute subclass whose GET routes are served through `cache` under `policy`.
+
+    Only 200 responses the handler marks `Cache-Control: public` are stored,
+    so routes opt in the same way they opt in to CDN caching.
+    """
+    if policy is None:
+        return APIRoute
+
+    class CachedRoute(APIRoute):
+        def get_route_handler(self) -> Callable:
+            handler = super().get_route_handler()
+
+            async def refresh(key, scope):
+                async def receive():
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                try:
+                    response = await handler(Request(scope, receive))
+                    if _cacheable(response):
+                        cache.put(key, _entry(response, policy))
+                except Exception:
+                    log.warning("background refresh of %s failed", scope["path"], exc_info=True)
+                finally:
+                    cache._refreshing.discard(key)
+
+            async def cached_handler(request: Request) -> Response:
+                if request.method != "GET" or any(h in request.headers for h in BYPASS_HEADERS) \
+                        or "no-cache" in request.headers.get("cache-control", ""):
+                    return await handler(request)
+                key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+                now = time.monotonic()
+                entry = cache.get(key)
+                if entry is not None:
+                    age = entry.age(now)
+                    if age < entry.ttl:
+                        cache.hits += 1
+                        return entry.response(now)
+                    if age < entry.ttl + policy.stale_while_revalidate:
+                        cache.stale_hits += 1
+                        if key not in cache._refreshing:
+                            cache._refreshing.add(key)
+                            asyncio.create_task(refresh(key, dict(request.scope)))
+                        return entry.response(now)
+                cache.misses += 1
+                try:
+                    response = await handler(request)
+                except Exception as e:
+                    if isinstance(e, HTTPException) and e.status_code < 500:
+                        raise
+                    if entry is not None and entry.age(now) < entry.ttl + policy.stale_if_error:
+                        cache.error_hits += 1
+                        log.warning("serving stale %s after error: %r", request.url.path, e)
+                        return entry.response(now)
+                    raise
+                if response.status_code >= 500 and entry is not None and entry.age(now) < entry.ttl + policy.stale_if_error:
+                    cache.error_hits += 1
+                    return entry.response(now)
+                if _cacheable(response):
+                    fresh = _entry(response, policy)
+                    cache.put(key, fresh)
+                    return fresh.response(time.monotonic())
+                return response
+
+            return cached_handler
+
+    return CachedRoute
@@ -0,0 +1,87 @@
+"""CPU per request of CompressionMiddleware, with and without the compressed-response cache.
+
+    python -m bench.compression_cpu [--requests 200] [--matches 10 100 1000]
+
+Drives the middleware directly with a match-list payload shaped like
+/matches/?limit=N. Each coding is measured at the thorough level used for
+cacheable responses both ways: recompressed on every request (cache
+disabled) and served from the cache, keyed by body hash or by ETag. The
+fast level used for uncacheable responses and the cost of hashing the body
+alone are listed alongside. CPU is process time, so the worker threads used
+for large bodies are counted.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+
+from app.compression import ENCODERS, CompressionMiddleware
+
+
+def payload(n: int) -> bytes:
+    return json.dumps([{
+        "id": i, "round": f"Round {i % 7 + 1}", "kickoff": f"2026-06-{i % 28 + 1:02d}T18:00:00", "status": "SCHEDULED",
+        "scoreHome": None, "scoreAway": None, "pensHome": None, "pensAway": None, "season_id": 1,
+        "stage_id": i % 12 + 1, "venue_id": i % 16 + 1, "home_team_id": i % 48 + 1, "away_team_id": (i * 7) % 48 + 1,
+        "version": 1,
+    } for i in range(n)], separators=(",", ":")).encode()
+
+
+def endpoint(body: bytes, *headers: tuple[bytes, bytes]):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *headers,
+        ]})
+        await send({"type": "http.response.body", "body": body})
+    return app
+
+
+async def run(mw, encoding: str, requests: int) -> tuple[float, int]:
+    scope = {"type": "http", "method": "GET", "path": "/matches/", "query_string": b"",
+             "headers": [(b"accept-encoding", encoding.encode())]}
+    size = 0
+
+    async def send(message):
+        nonlocal size
+        if message["type"] == "http.response.body":
+            size = len(message["body"])
+    await mw(scope, None, send)  # warm-up; fills the cache when caching applies
+    started = time.process_time()
+    for _ in range(requests):
+        await mw(scope, None, send)
+    return (time.process_time() - started) / requests * 1000, size
+
+
+def hash_cost(body: bytes, requests: int) -> float:
+    started = time.process_time()
+    for _ in range(requests):
+        hashlib.blake2b(body, digest_size=16).digest()
+    return (time.process_time() - started) / requests * 1000
+
+
+async def main(requests: int, sizes: list[int]):
+    public, no_store, etag = (b"cache-control", b"public, max-age=60"), (b"cache-control", b"no-store"), (b"etag", b'"42"')
+    print(f"{'payload':>10} {'coding':>6} {'mode':>24} {'cpu ms/req':>11} {'bytes':>9}")
+    for n in sizes:
+        body = payload(n)
+        print(f"{len(body):>10} {'-':>6} {'hash only':>24} {hash_cost(body, requests * 10):>11.4f} {'-':>9}")
+        variants = [("identity", CompressionMiddleware(endpoint(body, no_store)), "identity")]
+        for enc in ENCODERS:
+            variants += [
+                ("fast, uncached", CompressionMiddleware(endpoint(body, no_store)), enc),
+                ("thorough, uncached", CompressionMiddleware(endpoint(body, public), cache_bytes=0), enc),
+                ("thorough, hit by hash", CompressionMiddleware(endpoint(body, public)), enc),
+                ("thorough, hit by etag", CompressionMiddleware(endpoint(body, public, etag)), enc),
+            ]
+        for mode, mw, enc in variants:
+            ms, size = await run(mw, enc, requests)
+            print(f"{len(body):>10} {enc:>6} {mode:>24} {ms:>11.4f} {size:>9}")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--requests", type=int, default=200)
+    p.add_argument("--matches", type=int, nargs="+", default=[10, 100, 1000])
+    a = p.parse_args()
+    asyncio.run(main(a.requests, a.matches))
@@ -0,0 +1,73 @@
+"""Outbox delivery throughput, in messages per second, against a local aiosmtpd sink.
+
+    python -m bench.outbox_throughput [--messages 2000] [--workers 2] [--concurrency 8] [--batch 50]
+
+Uses DATABASE_URL when set (run it against PostgreSQL for numbers that
+mean anything), otherwise a scratch SQLite file.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import tempfile
+import time
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='outbox-bench-')}/bench.sqlite3"
+
+from aiosmtpd.controller import Controller
+from sqlalchemy import delete
+
+from app import mailer
+from app.db import Base, async_session, engine
+from app.models import EmailOutbox
+
+
+class Sink:
+    def __init__(self):
+        self.count = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.count += 1
+        return "250 OK"
+
+
+async def main(messages: int, workers: int, concurrency: int, batch: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(delete(EmailOutbox))
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    sink = Sink()
+    controller = Controller(sink, hostname="127.0.0.1", port=port)
+    controller.start()
+    mailer.SMTP_HOST, mailer.SMTP_PORT = "127.0.0.1", port
+    try:
+        async with async_session() as db:
+            for i in range(messages):
+                await mailer.enqueue(db, f"fan{i}@example.com", "Full time", "BRA 2-1 ARG")
+            await db.commit()
+        pool = mailer.SMTPPool(concurrency)
+
+        async def drain(d: mailer.OutboxDispatcher):
+            while await d.run_once():
+                pass
+        started = time.perf_counter()
+        await asyncio.gather(*(drain(mailer.OutboxDispatcher(pool, batch)) for _ in range(workers)))
+        elapsed = time.perf_counter() - started
+        await pool.close()
+    finally:
+        controller.stop()
+    print(f"{engine.dialect.name}: {sink.count}/{messages} messages in {elapsed:.2f}s = {sink.count / elapsed:.0f} msg/s "
+          f"(workers={workers}, concurrency={concurrency}, batch={batch})")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--messages", type=int, default=2000)
+    p.add_argument("--workers", type=int, default=2)
+    p.add_argument("--concurrency", type=int, default=mailer.OUTBOX_CONCURRENCY)
+    p.add_argument("--batch", type=int, default=mailer.OUTBOX_BATCH)
+    a = p.parse_args()
+    asyncio.run(main(a.messages, a.workers, a.concurrency, a.batch))
@@ -1,239 +1,389 @@
-import re, os
+"""Generate app/enums.py, app/filters.py and app/indexes.py from sports_adda_jdl.txt.
+
+    python codegen.py            # regenerate outputs whose inputs changed
+    python codegen.py --force    # regenerate everything
+
+Models and schemas are hand-written in app/models.py / app/schemas.py; codegen
+reports where they drift from the JDL instead of overwriting them.
+"""
+import hashlib, json, os, re, sys
+from dataclasses import dataclass, field, asdict
 from jinja2 import Template
 
-# === Templates ===
-model_tpl = Template("""
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Enum, Text
-from sqlalchemy.orm import relationship
-from app.db import Base
-from app.enums import *
-
-class {{ class_name }}(Base):
-    __tablename__ = "{{ table_name }}"
-
-    id = Column(Integer, primary_key=True, index=True)
-    {%- for f in fields %}
-    {{ f }}
-    {%- endfor %}
+JDL_PATH = "sports_adda_jdl.txt"
+MANIFEST_PATH = ".codegen.json"
 
-    {%- for rel in relationships %}
-    {{ rel }}
-    {%- endfor %}
-""")
+# === Parsing ===
+TOKEN = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<str>"[^"]*"|'[^']*')
+  | (?P<name>[A-Za-z_][\w.-]*|\d+)
+  | (?P<punct>[{}()\[\],*])
+""", re.X | re.S)
 
-schema_tpl = Template("""
-from pydantic import BaseModel
-from typing import Optional
-from app.enums import *
+VALIDATIONS = {"required", "unique", "min", "max", "minlength", "maxlength", "minbytes", "maxbytes", "pattern"}
+OPTIONS = {"dto", "service", "paginate", "filter", "search", "microservice", "angularSuffix", "clientRootFolder", "readOnly", "skipClient", "skipServer", "noFluentMethod"}
 
-class {{ class_name }}Base(BaseModel):
-    {%- for f in fields %}
-    {{ f }}
-    {%- endfor %}
 
-class {{ class_name }}Create({{ class_name }}Base):
-    pass
+@dataclass
+class Field:
+    name: str
+    type: str
+    validations: list[str] = field(default_factory=list)
+
+    @property
+    def required(self): return "required" in self.validations
+
+    @property
+    def unique(self): return "unique" in self.validations
 
-class {{ class_name }}Update({{ class_name }}Base):
+
+@dataclass
+class Relationship:
+    kind: str
+    source: str
+    field: str
+    target: str
+    display: str | None = None
+    required: bool = False
+
+    @property
+    def fk(self): return snake(self.field) + "_id"
+
+
+@dataclass
+class Entity:
+    name: str
+    fields: list[Field] = field(default_factory=list)
+    relationships: list[Relationship] = field(default_factory=list)
+
+
+@dataclass
+class Jdl:
+    enums: dict[str, list[str]] = field(default_factory=dict)
+    entities: dict[str, Entity] = field(default_factory=dict)
+    options: dict[str, dict[str, str]] = field(default_factory=dict)  # option -> entity -> value
+
+
+class JdlError(Exception):
     pass
 
-class {{ class_name }}Out({{ class_name }}Base):
-    id: int
-    class Config:
-        orm_mode = True
-""")
-
-crud_tpl = Template("""
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from app.models.{{ module }} import {{ class_name }}
-from app.schemas.{{ module }} import {{ class_name }}Create, {{ class_name }}Update
-
-async def get_all(db: AsyncSession):
-    result = await db.execute(select({{ class_name }}))
-    return result.scalars().all()
-
-async def get_by_id(db: AsyncSession, item_id: int):
-    return await db.get({{ class_name }}, item_id)
-
-async def create(db: AsyncSession, obj_in: {{ class_name }}Create):
-    db_obj = {{ class_name }}(**obj_in.dict())
-    db.add(db_obj)
-    await db.commit()
-    await db.refresh(db_obj)
-    return db_obj
-
-async def update(db: AsyncSession, db_obj: {{ class_name }}, obj_in: {{ class_name }}Update):
-    for field, value in obj_in.dict(exclude_unset=True).items():
-        setattr(db_obj, field, value)
-    await db.commit()
-    await db.refresh(db_obj)
-    return db_obj
-
-async def delete(db: AsyncSession, db_obj: {{ class_name }}):
-    await db.delete(db_obj)
-    await db.commit()
-""")
-
-router_tpl = Template("""
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.db import get_db
-from app.schemas.{{ module }} import {{ class_name }}Out, {{ class_name }}Create, {{ class_name }}Update
-from app.crud import {{ module }} as crud_{{ module }}
-from app.models.{{ module }} import {{ class_name }}
-
-router = APIRouter(prefix="/{{ table_name }}", tags=["{{ class_name }}"])
-
-@router.get("/", response_model=list[{{ class_name }}Out])
-async def list_items(db: AsyncSession = Depends(get_db)):
-    return await crud_{{ module }}.get_all(db)
-
-@router.get("/{item_id}", response_model={{ class_name }}Out)
-async def get_item(item_id: int, db: AsyncSession = Depends(get_db)):
-    obj = await crud_{{ module }}.get_by_id(db, item_id)
-    if not obj:
-        raise HTTPException(status_code=404, detail="{{ class_name }} not found")
-    return obj
-
-@router.post("/", response_model={{ class_name }}Out)
-async def create_item(item: {{ class_name }}Create, db: AsyncSession = Depends(get_db)):
-    return await crud_{{ module }}.create(db, item)
-
-@router.put("/{item_id}", response_model={{ class_name }}Out)
-async def update_item(item_id: int, item: {{ class_name }}Update, db: AsyncSession = Depends(get_db)):
-    db_obj = await crud_{{ module }}.get_by_id(db, item_id)
-    if not db_obj:
-        raise HTTPException(status_code=404, detail="{{ class_name }} not found")
-    return await crud_{{ module }}.update(db, db_obj, item)
-
-@router.delete("/{item_id}")
-async def delete_item(item_id: int, db: AsyncSession = Depends(get_db)):
-    db_obj = await crud_{{ module }}.get_by_id(db, item_id)
-    if not db_obj:
-        raise HTTPException(status_code=404, detail="{{ class_name }} not found")
-    await crud_{{ module }}.delete(db, db_obj)
-    return {"ok": True}
-""")
-
-
-enum_tpl = Template("""
-import enum
 
-{% for name, values in enums.items() %}
-class {{ name }}(str, enum.Enum):
-    {% for v in values %}
-    {{ v }} = "{{ v }}"
-    {% endfor %}
-
-{% endfor %}
-""")
-
-# === Read JDL ===
-with open("sports_adda_jdl.txt") as f:
-    jdl = f.read()
-
-# --- Enums ---
-enums = {}
-for match in re.findall(r"enum\s+(\w+)\s*\{([^}]*)\}", jdl, re.DOTALL):
-    name, body = match
-    values = [v.strip() for v in body.split(",") if v.strip()]
-    enums[name] = values
-
-print("📦 Enums found:", enums)
-
-os.makedirs("app", exist_ok=True)
-with open("app/enums.py", "w") as f:
-    f.write(enum_tpl.render(enums=enums))
-print("✅ Wrote app/enums.py")
-
-# --- Entities ---
-entities = re.findall(r"entity\s+(\w+)\s*\{([^}]*)\}", jdl, re.DOTALL)
-print("📦 Entities found:", [e[0] for e in entities])
-
-# --- Relationships ---
-rels = re.findall(r"relationship\s+ManyToOne\s*\{([^}]*)\}", jdl, re.DOTALL)
-rel_map = []
-for r in rels:
-    parts = r.split(" to ")
-    if len(parts) != 2:
-        continue
-    left, right = parts[0].strip(), parts[1].strip()
-    entity = left.split("{")[0].strip()
-    field = left.split("{")[1].split("}")[0].split("(")[0].strip()
-    rel_map.append((entity, field, right))
-
-print("📦 Relationships found:", rel_map)
-
-# --- Ensure dirs ---
-for d in ["app/models", "app/schemas", "app/crud", "app/routers"]:
-    os.makedirs(d, exist_ok=True)
-
-# --- Generate code ---
-for name, body in entities:
-    fields, schema_fields, relationships = [], [], []
-
-    for line in body.strip().splitlines():
-        parts = line.strip().split()
-        if not parts:
+def snake(name: str) -> str:
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
+
+
+def tokenize(text: str) -> list[str]:
+    out, pos = [], 0
+    while pos < len(text):
+        m = TOKEN.match(text, pos)
+        if not m:
+            raise JdlError(f"unexpected character {text[pos]!r} at offset {pos}")
+        if m.lastgroup not in ("ws", "comment"):
+            out.append(m.group())
+        pos = m.end()
+    return out
+
+
+class Parser:
+    def __init__(self, tokens: list[str]):
+        self.toks, self.i = tokens, 0
+
+    def peek(self, k=0):
+        j = self.i + k
+        return self.toks[j] if j < len(self.toks) else None
+
+    def next(self):
+        tok = self.peek()
+        if tok is None:
+            raise JdlError("unexpected end of input")
+        self.i += 1
+        return tok
+
+    def expect(self, tok):
+        got = self.next()
+        if got != tok:
+            raise JdlError(f"expected {tok!r}, got {got!r}")
+
+    def skip_block(self):
+        self.expect("{")
+        depth = 1
+        while depth:
+            tok = self.next()
+            depth += {"{": 1, "}": -1}.get(tok, 0)
+
+    def skip_parens(self):
+        if self.peek() == "(":
+            while self.next() != ")":
+                pass
+
+    def parse(self) -> Jdl:
+        jdl = Jdl()
+        while self.peek() is not None:
+            kw = self.next()
+            if kw == "application":
+                self.skip_block()
+            elif kw == "enum":
+                name = self.next()
+                self.expect("{")
+                values = []
+                while self.peek() != "}":
+                    tok = self.next()
+                    if tok != ",":
+                        values.append(tok)
+                        self.skip_parens()
+                self.expect("}")
+                jdl.enums[name] = values
+            elif kw == "entity":
+                ent = Entity(self.next())
+                self.skip_parens()
+                self.expect("{")
+                while self.peek() != "}":
+                    f = Field(self.next(), self.next())
+                    while self.peek() in VALIDATIONS:
+                        f.validations.append(self.next())
+                        self.skip_parens()
+                    ent.fields.append(f)
+                self.expect("}")
+                jdl.entities[ent.name] = ent
+            elif kw == "relationship":
+                kind = self.next()
+                self.expect("{")
+                while self.peek() != "}":
+                    rel = self.relationship(kind)
+                    if rel.source not in jdl.entities:
+                        raise JdlError(f"relationship on unknown entity {rel.source}")
+                    jdl.entities[rel.source].relationships.append(rel)
+                self.expect("}")
+            elif kw in OPTIONS:
+                targets = self.targets()
+                value = "true"
+                if self.peek() == "with":
+                    self.next()
+                    value = self.next()
+                excluded = set()
+                if self.peek() == "except":
+                    self.next()
+                    excluded = set(self.targets())
+                names = jdl.entities if targets == ["*"] or targets == ["all"] else targets
+                jdl.options.setdefault(kw, {}).update({n: value for n in names if n not in excluded})
+            else:
+                raise JdlError(f"unexpected token {kw!r}")
+        return jdl
+
+    def targets(self) -> list[str]:
+        names = [self.next()]
+        while self.peek() == ",":
+            self.next()
+            names.append(self.next())
+        return names
+
+    def relationship(self, kind: str) -> Relationship:
+        source = self.next()
+        self.expect("{")
+        fname, display, required = self.next(), None, False
+        if self.peek() == "(":
+            self.next()
+            display = self.next()
+            self.expect(")")
+        while self.peek() != "}":
+            required |= self.next() == "required"
+        self.expect("}")
+        self.expect("to")
+        target = self.next()
+        if self.peek() == "{":
+            self.skip_block()
+        return Relationship(kind, source, fname, target, display, required)
+
+
+def parse_jdl(text: str) -> Jdl:
+    return Parser(tokenize(text)).parse()
+
+
+# === Planning ===
+PY_TYPES = {"String": "str", "UUID": "str", "Integer": "int", "Long": "int", "Float": "float", "Double": "float",
+            "BigDecimal": "float", "Boolean": "bool", "Instant": "datetime", "ZonedDateTime": "datetime",
+            "LocalDate": "date"}
+RANGE_TYPES = {"Integer", "Long", "Float", "Double", "BigDecimal", "Instant", "ZonedDateTime", "LocalDate"}
+TIME_TYPES = {"Instant", "ZonedDateTime", "LocalDate"}
+
+
+def plan_filters(jdl: Jdl, ent: Entity) -> dict:
+    params, columns = [], {}
+
+    def add(param, col, op, typ):
+        params.append((param, typ))
+        columns[param] = (col, op)
+
+    for f in ent.fields:
+        if f.type == "TextBlob":
             continue
-        fname, ftype = parts[0], parts[1]
-
-        if ftype == "String":
-            fields.append(f"{fname} = Column(String, nullable=True)")
-            schema_fields.append(f"{fname}: Optional[str] = None")
-        elif ftype == "Integer":
-            fields.append(f"{fname} = Column(Integer, nullable=True)")
-            schema_fields.append(f"{fname}: Optional[int] = None")
-        elif ftype == "Double":
-            fields.append(f"{fname} = Column(Float, nullable=True)")
-            schema_fields.append(f"{fname}: Optional[float] = None")
-        elif ftype == "Boolean":
-            fields.append(f"{fname} = Column(Boolean, nullable=True)")
-            schema_fields.append(f"{fname}: Optional[bool] = None")
-        elif ftype == "Instant":
-            fields.append(f"{fname} = Column(DateTime, nullable=True)")
-            schema_fields.append(f"{fname}: Optional[str] = None")
-        elif ftype in enums:
-            fields.append(f"{fname} = Column(Enum({ftype}, name='{ftype.lower()}_enum'), nullable=False)")
-            schema_fields.append(f"{fname}: {ftype}")
-        else:
-            fields.append(f"{fname} = Column(String, nullable=True)")
-            schema_fields.append(f"{fname}: Optional[str] = None")
-
-    for ent, field, target in rel_map:
-        if ent == name:
-            fk_col = f"{field}_id"
-            fields.append(f"{fk_col} = Column(Integer, ForeignKey('{target.lower()}s.id'))")
-            relationships.append(f"{field} = relationship('{target}')")
-            schema_fields.append(f"{fk_col}: Optional[int] = None")
-
-    ctx = {
-        "class_name": name,
-        "module": name.lower(),
-        "table_name": name.lower() + "s",
-        "fields": fields,
-        "relationships": relationships,
-    }
+        typ = f.type if f.type in jdl.enums else PY_TYPES.get(f.type, "str")
+        add(f.name, f.name, "eq", typ)
+        if f.type in RANGE_TYPES:
+            add(f"{f.name}_gte", f.name, "gte", typ)
+            add(f"{f.name}_lt", f.name, "lt", typ)
+    for r in ent.relationships:
+        add(r.fk, r.fk, "eq", "int")
+    sortable = ["id"] + [f.name for f in ent.fields if sortable_field(f)]
+    return {"params": params, "columns": columns, "sortable": sortable}
+
+
+def sortable_field(f: Field) -> bool:
+    return f.required and (f.type in RANGE_TYPES or (f.type == "String" and f.unique))
+
+
+def plan_indexes(jdl: Jdl, ent: Entity, table: str, existing: set[tuple[str, ...]]) -> list[tuple[str, tuple[str, ...]]]:
+    """Indexes backing the generated filters: FKs, enum columns, and (timestamp, id) for keyset sorts."""
+    wanted = [(r.fk,) for r in ent.relationships]
+    wanted += [(f.name,) for f in ent.fields if f.type in jdl.enums]
+    if ent.name in jdl.options.get("paginate", {}):
+        wanted += [(f.name, "id") for f in ent.fields
+                   if sortable_field(f) and f.type in TIME_TYPES]
+    out = []
+    for cols in wanted:
+        if any(ix[:len(cols)] == cols for ix in existing) or cols in [c for _, c in out]:
+            continue
+        out.append((f"ix_{table}_{'_'.join(snake(c) for c in cols)}", cols))
+    return out
 
-    # write files
-    with open(f"app/models/{name.lower()}.py", "w") as f:
-        f.write(model_tpl.render(**ctx))
-    print("✅ Wrote model:", f"app/models/{name.lower()}.py")
 
-    ctx["fields"] = schema_fields
-    with open(f"app/schemas/{name.lower()}.py", "w") as f:
-        f.write(schema_tpl.render(**ctx))
-    print("✅ Wrote schema:", f"app/schemas/{name.lower()}.py")
+def existing_indexes(model) -> set[tuple[str, ...]]:
+    table = model.__table__
+    out = {tuple(c.name for c in ix.columns) for ix in table.indexes}
+    out |= {tuple(c.name for c in uc.columns) for uc in table.constraints if hasattr(uc, "columns") and uc.columns}
+    out |= {(c.name,) for c in table.columns if c.index or c.unique}
+    return out
 
-    with open(f"app/crud/{name.lower()}.py", "w") as f:
-        f.write(crud_tpl.render(**ctx))
-    print("✅ Wrote crud:", f"app/crud/{name.lower()}.py")
 
-    with open(f"app/routers/{name.lower()}.py", "w") as f:
-        f.write(router_tpl.render(**ctx))
-    print("✅ Wrote router:", f"app/routers/{name.lower()}.py")
+def drift(jdl: Jdl, models) -> list[str]:
+    notes = []
+    for ent in jdl.entities.values():
+        model = getattr(models, ent.name, None)
+        if model is None:
+            notes.append(f"{ent.name}: no model in app/models.py")
+            continue
+        cols = model.__table__.columns
+        for f in ent.fields:
+            if f.name not in cols:
+                notes.append(f"{ent.name}.{f.name}: missing column")
+            elif f.required == cols[f.name].nullable:
+                notes.append(f"{ent.name}.{f.name}: JDL required={f.required} but column nullable={cols[f.name].nullable}")
+            elif f.unique and not cols[f.name].unique:
+                notes.append(f"{ent.name}.{f.name}: JDL unique but column is not")
+        for r in ent.relationships:
+            if r.fk not in cols:
+                notes.append(f"{ent.name}.{r.fk}: missing foreign key column")
+            elif r.required == cols[r.fk].nullable:
+                notes.append(f"{ent.name}.{r.fk}: JDL required={r.required} but column nullable={cols[r.fk].nullable}")
+    return notes
 
-print("\n🎉 Codegen complete with relationships + enums!")
+
+# === Templates ===
+HEADER = "# Generated by codegen.py from sports_adda_jdl.txt -- do not edit by hand.\n"
+
+ENUM_SRC = HEADER + """import enum
+{% for name, values in enums.items() %}
+
+class {{ name }}(str, enum.Enum):
+{%- for v in values %}
+    {{ v }} = "{{ v }}"
+{%- endfor %}
+{% endfor %}"""
+
+FILTERS_SRC = HEADER + """from datetime import date, datetime
+from typing import ClassVar, Literal, Optional
+
+from .filtering import FilterSet
+from .models import (
+    {{ imports | join(", ") }},
+)
+{% for name, p in plans.items() %}
+
+class {{ name }}Filter(FilterSet):
+    model: ClassVar = {{ name }}
+    columns: ClassVar = {
+    {%- for param, col in p.columns.items() %}
+        "{{ param }}": ("{{ col[0] }}", "{{ col[1] }}"),
+    {%- endfor %}
+    }
+{% for param, typ in p.params %}
+    {{ param }}: Optional[{{ typ }}] = None
+{%- endfor %}
+    sort: Optional[Literal[{% for s in p.sortable %}"{{ s }}", "-{{ s }}"{{ ", " if not loop.last }}{% endfor %}]] = None
+{% endfor %}"""
+
+INDEXES_SRC = HEADER + """# Importing this module attaches the indexes to the model tables, so
+# Base.metadata.create_all() builds them.
+from sqlalchemy import Index
+
+from .models import {{ imports | join(", ") }}
+{% for name, idx in indexes.items() if idx %}
+{% for ix_name, cols in idx -%}
+Index("{{ ix_name }}", {% for c in cols %}{{ name }}.{{ c }}{{ ", " if not loop.last }}{% endfor %})
+{% endfor -%}
+{% endfor %}"""
+
+enum_tpl, filters_tpl, indexes_tpl = Template(ENUM_SRC), Template(FILTERS_SRC), Template(INDEXES_SRC)
+
+
+# === Output ===
+def digest(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def main(force: bool = False):
+    with open(JDL_PATH) as f:
+        jdl = parse_jdl(f.read())
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from app import models
+
+    print("📦 Enums found:", list(jdl.enums))
+    print("📦 Entities found:", list(jdl.entities))
+    for note in drift(jdl, models):
+        print("⚠️  drift:", note)
+
+    entities = [asdict(e) for e in jdl.entities.values()]
+    filtered = [e for e in jdl.entities.values() if e.name in jdl.options.get("filter", {})]
+    plans = {e.name: plan_filters(jdl, e) for e in filtered}
+    indexes = {}
+    for e in jdl.entities.values():
+        model = getattr(models, e.name)
+        indexes[e.name] = plan_indexes(jdl, e, model.__tablename__, existing_indexes(model))
+    enum_imports = sorted({t for p in plans.values() for _, t in p["params"] if t in jdl.enums})
+
+    outputs = {
+        "app/enums.py": (
+            digest(jdl.enums, ENUM_SRC),
+            lambda: enum_tpl.render(enums=jdl.enums),
+        ),
+        "app/filters.py": (
+            digest(entities, jdl.options, jdl.enums, FILTERS_SRC),
+            lambda: filters_tpl.render(plans=plans, imports=sorted(plans) + enum_imports),
+        ),
+        "app/indexes.py": (
+            digest(entities, jdl.options, indexes, INDEXES_SRC),
+            lambda: indexes_tpl.render(indexes=indexes, imports=sorted(n for n, i in indexes.items() if i)),
+        ),
+    }
+
+    manifest = {}
+    if os.path.exists(MANIFEST_PATH):
+        with open(MANIFEST_PATH) as f:
+            manifest = json.load(f)
+    for path, (h, render) in outputs.items():
+        if not force and manifest.get(path) == h and os.path.exists(path):
+            print("⏭️  Unchanged:", path)
+            continue
+        with open(path, "w") as f:
+            f.write(render())
+        manifest[path] = h
+        print("✅ Wrote", path)
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
 
 
+if __name__ == "__main__":
+    main(force="--force" in sys.argv)
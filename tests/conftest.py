@@ -0,0 +1,63 @@
+import os
+import socket
+import tempfile
+
+# app.db binds its engine at import time: point it at a scratch SQLite file first
+_db = os.path.join(tempfile.mkdtemp(prefix="sportshub-tests-"), "test.sqlite3")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_db}")
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from app import mailer
+from app.db import Base, engine
+from app import models  # noqa: F401  (registers the tables)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Inbox:
+    """aiosmtpd handler keeping every message it accepts; recipients in `refuse` get a 550."""
+
+    def __init__(self):
+        self.messages = []
+        self.refuse: set[str] = set()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.refuse:
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    inbox = Inbox()
+    controller = Controller(inbox, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    monkeypatch.setattr(mailer, "SMTP_HOST", controller.hostname)
+    monkeypatch.setattr(mailer, "SMTP_PORT", controller.port)
+    yield inbox
+    controller.stop()
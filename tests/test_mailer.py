@@ -0,0 +1,110 @@
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from app import mailer
+from app.db import async_session
+from app.models import EmailOutbox, OutboxStatus
+
+from .conftest import free_port
+
+pytestmark = pytest.mark.anyio
+
+
+async def _enqueue(n: int):
+    async with async_session() as db:
+        for i in range(n):
+            await mailer.enqueue(db, f"fan{i}@example.com", f"Alert {i}", "Kickoff soon")
+        await db.commit()
+
+
+async def _rows() -> list[EmailOutbox]:
+    async with async_session() as db:
+        return list((await db.execute(select(EmailOutbox).order_by(EmailOutbox.id))).scalars())
+
+
+async def test_dispatch_sends_and_marks_sent(db, smtp):
+    await _enqueue(20)
+    pool = mailer.SMTPPool(4)
+    try:
+        assert await mailer.OutboxDispatcher(pool).run_once() == 20
+    finally:
+        await pool.close()
+    assert sorted(e.rcpt_tos[0] for e in smtp.messages) == sorted(f"fan{i}@example.com" for i in range(20))
+    rows = await _rows()
+    assert {r.status for r in rows} == {OutboxStatus.SENT}
+    assert all(r.attempts == 1 and r.lockedBy is None and r.sentAt is not None for r in rows)
+
+
+async def test_parallel_dispatchers_do_not_double_send(db, smtp):
+    await _enqueue(60)
+    pool = mailer.SMTPPool(8)
+    dispatchers = [mailer.OutboxDispatcher(pool, batch=10) for _ in range(4)]
+
+    async def drain(d):
+        while await d.run_once():
+            pass
+    try:
+        await asyncio.gather(*(drain(d) for d in dispatchers))
+    finally:
+        await pool.close()
+    sent = Counter(e.rcpt_tos[0] for e in smtp.messages)
+    assert len(sent) == 60 and set(sent.values()) == {1}
+    assert {r.status for r in await _rows()} == {OutboxStatus.SENT}
+
+
+async def test_failed_send_backs_off(db, monkeypatch):
+    monkeypatch.setattr(mailer, "SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(mailer, "SMTP_PORT", free_port())  # nothing listens there
+    await _enqueue(1)
+    pool = mailer.SMTPPool(1)
+    assert await mailer.OutboxDispatcher(pool).run_once() == 1
+    [row] = await _rows()
+    assert row.status == OutboxStatus.PENDING and row.attempts == 1 and row.lastError
+    assert row.nextAttemptAt > datetime.utcnow() + timedelta(seconds=mailer.OUTBOX_BACKOFF_SECONDS - 5)
+    assert row.lockedBy is None
+
+
+async def test_lapsed_lease_is_neither_sent_nor_recorded(db, smtp):
+    await _enqueue(1)
+    pool = mailer.SMTPPool(1)
+    first, second = mailer.OutboxDispatcher(pool), mailer.OutboxDispatcher(pool)
+    try:
+        [row] = await first.claim()
+        # the first dispatcher stalls past its lease; the second takes the row over and sends it
+        async with async_session() as s:
+            await s.execute(update(EmailOutbox).values(lockedUntil=datetime.utcnow() - timedelta(seconds=1)))
+            await s.commit()
+        first._held[row.id] = datetime.utcnow() - timedelta(seconds=1)
+        assert await second.run_once() == 1
+        # the stalled dispatcher neither sends nor overwrites the outcome
+        assert await first._send(row) is mailer.LEASE_LOST
+        await first._record([(row, "421 try again later")])
+    finally:
+        await pool.close()
+    assert len(smtp.messages) == 1
+    [row] = await _rows()
+    assert row.status == OutboxStatus.SENT and row.attempts == 1 and row.lastError is None
+
+
+async def test_refused_recipient_keeps_the_connection(db, smtp):
+    smtp.refuse.add("fan0@example.com")
+    await _enqueue(3)
+    pool = mailer.SMTPPool(1)
+    connect, connects = pool._connect, []
+
+    async def counted():
+        connects.append(1)
+        return await connect()
+    pool._connect = counted
+    try:
+        assert await mailer.OutboxDispatcher(pool).run_once() == 3
+    finally:
+        await pool.close()
+    assert len(connects) == 1
+    refused, *sent = await _rows()
+    assert refused.status == OutboxStatus.PENDING and "550" in refused.lastError
+    assert {r.status for r in sent} == {OutboxStatus.SENT}
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app import scheduling
+from app.db import async_session
+from app.models import City, Competition, Match, MatchStatus, Season, Team, Venue
+
+pytestmark = pytest.mark.anyio
+
+KICKOFF = datetime(2026, 6, 12, 18)
+
+
+@pytest.fixture
+async def clash(db, monkeypatch):
+    """Matches 1 and 2 share a venue two hours apart: a conflict already in the schedule."""
+    async with async_session() as s:
+        s.add_all([
+            City(id=1, name="Miami", countryCode="US", slug="miami"),
+            Competition(id=1, name="World Cup", code="WC", kind="INTL", slug="world-cup"),
+            Team(id=1, name="Brazil", slug="brazil"), Team(id=2, name="Argentina", slug="argentina"),
+            Team(id=3, name="France", slug="france"), Team(id=4, name="Spain", slug="spain"),
+        ])
+        await s.flush()
+        s.add_all([Venue(id=1, name="Hard Rock", slug="hard-rock", city_id=1),
+                   Season(id=1, yearStart=2026, yearEnd=2026, slug="wc-2026", competition_id=1)])
+        await s.flush()
+        s.add_all([
+            Match(id=1, kickoff=KICKOFF, status=MatchStatus.LIVE, season_id=1, venue_id=1, home_team_id=1, away_team_id=2),
+            Match(id=2, kickoff=KICKOFF + timedelta(hours=2), status=MatchStatus.SCHEDULED, season_id=1, venue_id=1,
+                  home_team_id=3, away_team_id=4),
+        ])
+        await s.commit()
+    store = scheduling.ScheduleStore()
+    monkeypatch.setattr(scheduling, "store", store)
+    monkeypatch.setattr(scheduling, "SCHEDULE_CONFLICTS", "reject")
+    return store
+
+
+async def test_score_update_of_conflicting_match_is_not_blocked(clash):
+    assert await clash.audit(1)  # the clash is in the schedule
+    await scheduling.enforce([(1, {"scoreHome": 1, "scoreAway": 0})])
+    await scheduling.enforce([(1, {"status": MatchStatus.FT, "scoreHome": 2})])
+    await scheduling.enforce([(1, {"kickoff": KICKOFF, "venue_id": 1})])  # unchanged values
+
+
+async def test_moving_a_match_is_still_checked(clash):
+    with pytest.raises(HTTPException) as e:
+        await scheduling.enforce([(1, {"kickoff": KICKOFF + timedelta(hours=1)})])
+    assert e.value.status_code == 409
+    await scheduling.enforce([(1, {"kickoff": KICKOFF - timedelta(days=1)})])
+
+
+async def test_reactivating_a_match_is_checked(clash, monkeypatch):
+    await clash.ensure()
+    clash._index.apply(2, scheduling.Fixture(2, KICKOFF + timedelta(hours=2), MatchStatus.POSTPONED, 1, 1, 3, 4))
+    await scheduling.enforce([(1, {"scoreHome": 1})])
+    with pytest.raises(HTTPException):
+        await scheduling.enforce([(2, {"status": MatchStatus.SCHEDULED})])
+
+
+async def test_new_matches_are_numbered_by_request_position(clash):
+    conflicts = await clash.check([
+        (1, {"scoreHome": 1}),
+        (None, {"kickoff": KICKOFF + timedelta(hours=1), "status": MatchStatus.SCHEDULED, "venue_id": 1,
+                "home_team_id": None, "away_team_id": None, "season_id": 1}),
+    ])
+    assert {c.match_id for c in conflicts} == {-2}